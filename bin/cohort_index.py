@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+"""
+Write the partition of one sample to the cohort index.
+
+The index is a set of parquet tables partitioned by sample (and parameter
+set with --analysis_sweep) in the hive layout, so all samples of a run or of
+several runs can be read with one scan:
+
+    cohort_index/<table>/sample=<id>[/set=<name>]/part-0.parquet
+
+Tables:
+- counts: component, marker, count. Only non-zero counts are stored.
+- components: the component metrics of the dataset (`adata.obs`).
+- markers: the marker metrics of the dataset (`adata.var`).
+- polarization: the polarization scores, one row per component and marker.
+- colocalization: the colocalization scores, one row per component and marker pair.
+- qc: stage, metric, value for every numeric value of the stage report JSONs,
+  with list items keyed by their index (`<key>.<index>.<key>`).
+
+The dataset is opened through the pixelator file backend, which only reads
+the members of the pxl file that are used, never the edgelist.
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pixelator import read
+from scipy import sparse
+
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            yield from flatten(v, f"{prefix}{k}.")
+    elif isinstance(value, list):
+        # e.g. per-marker or per-chunk entries of a report
+        for i, v in enumerate(value):
+            yield from flatten(v, f"{prefix}{i}.")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix.rstrip("."), value
+
+
+def counts_table(adata) -> pd.DataFrame:
+    matrix = sparse.coo_matrix(adata.X)
+    return pd.DataFrame(
+        {
+            "component": np.asarray(adata.obs_names)[matrix.row],
+            "marker": np.asarray(adata.var_names)[matrix.col],
+            "count": matrix.data.astype(np.int64),
+        }
+    )
+
+
+def qc_table(reports) -> pd.DataFrame:
+    rows = []
+    for stage, path in reports:
+        with open(path) as f:
+            report = json.load(f)
+        rows.extend((stage, key, float(value)) for key, value in flatten(report))
+    return pd.DataFrame(rows, columns=["stage", "metric", "value"])
+
+
+def write_table(df, output: Path, table: str, partition: str) -> Path:
+    path = output / table / partition / "part-0.parquet"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(path, index=False)
+    return path
+
+
+def main(args):
+    partition = f"sample={args.sample}" + (f"/set={args.set}" if args.set else "")
+    reports = [r.split("=", 1) for r in args.report]
+
+    dataset = read(args.dataset)
+    adata = dataset.adata
+
+    tables = {
+        "counts": counts_table(adata),
+        "components": adata.obs.rename_axis("component").reset_index(),
+        "markers": adata.var.rename_axis("marker").reset_index(),
+        "qc": qc_table(reports),
+    }
+    for name in ("polarization", "colocalization"):
+        scores = getattr(dataset, name)
+        if scores is not None and len(scores) > 0:
+            tables[name] = scores.reset_index(drop=True)
+
+    for name, df in tables.items():
+        path = write_table(df, args.output, name, partition)
+        print(f"Wrote {len(df)} rows to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--sample", dest="sample", type=str, required=True)
+    parser.add_argument("--set", dest="set", type=str, default=None)
+    parser.add_argument(
+        "--output", dest="output", type=Path, default=Path("cohort_index")
+    )
+    parser.add_argument(
+        "--report",
+        dest="report",
+        action="append",
+        default=[],
+        help="<stage>=<report.json>",
+    )
+    parser.add_argument("dataset", type=Path)
+    args = parser.parse_args()
+
+    main(args)
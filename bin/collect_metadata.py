@@ -9,6 +9,7 @@ Copyright (c) 2023 Pixelgen Technologies AB.
 
 import sys
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import importlib.metadata
 import json
@@ -16,14 +17,21 @@ import argparse
 import ruamel.yaml as yaml
 
 
-installed_packages = {d.name: d.version for d in importlib.metadata.distributions()}
+def installed_packages():
+    return {d.name: d.version for d in importlib.metadata.distributions()}
 
 
 def subtool_versions():
-    cutadapt_proc = subprocess.run(
-        ["cutadapt", "--version"], capture_output=True, text=True
-    )
-    fastp_proc = subprocess.run(["fastp", "--version"], capture_output=True, text=True)
+    # The probes are independent, run them concurrently
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        cutadapt = pool.submit(
+            subprocess.run, ["cutadapt", "--version"], capture_output=True, text=True
+        )
+        fastp = pool.submit(
+            subprocess.run, ["fastp", "--version"], capture_output=True, text=True
+        )
+        cutadapt_proc = cutadapt.result()
+        fastp_proc = fastp.result()
 
     cutadapt_version = cutadapt_proc.stdout.strip("\n")
     fastp_version = fastp_proc.stderr.strip("\n").split(" ")[-1]
@@ -43,7 +51,7 @@ def main(args):
                 "releaselevel": sys.version_info.releaselevel,
                 "serial": sys.version_info.serial,
             },
-            "packages": installed_packages,
+            "packages": installed_packages(),
         },
         "fastp": {"version": dep_versions["fastp_version"]},
         "cutadapt": {"version": dep_versions["cutadapt_version"]},
@@ -57,7 +65,7 @@ def main(args):
     if workflow_data:
         root = {**root, **workflow_data}
 
-    with open("metadata.json", "w") as f:
+    with open(args.output, "w") as f:
         json.dump(root, f, indent=4)
 
     with open("versions.yml", "w") as f:
@@ -78,6 +86,9 @@ if __name__ == "__main__":
     parser.add_argument(
         "--workflow-data", dest="workflow_data", type=Path, default=None
     )
+    parser.add_argument(
+        "--output", dest="output", type=Path, default=Path("metadata.json")
+    )
     args = parser.parse_args()
 
     main(args)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+"""
+Merge the per-chunk outputs of a pixelator step back into per-sample outputs.
+
+- FASTQ files are concatenated (concatenated gzip members are valid gzip).
+- `*.report.json` statistics are merged: integer counts are summed, rates
+  are recomputed from the summed counts where the numerator and denominator
+  are known and otherwise averaged weighted by the number of input reads of
+  each chunk. Settings and read geometry are taken from the first chunk.
+- `*.meta.json` command metadata is taken from the first chunk.
+
+The reports are the ones pixelator writes for the chunked stages: the fastp
+JSON of preqc and the cutadapt JSON of adapterqc and demux. Pixelator reads
+the read counts of the stage from them (`summary.before_filtering`,
+`filtering_result`, `read_counts`, `adapters_read1[].total_matches`) and
+derives the discarded and per-antibody fractions from those counts.
+
+Chunk file names carry a `-chunkNNN` token (see split_fastq.py) which is
+removed from the merged file names and from string values in the JSON files.
+"""
+
+import argparse
+import json
+import re
+import shutil
+from collections import defaultdict
+from pathlib import Path
+
+CHUNK_TOKEN = re.compile(r"-chunk\d+")
+
+# Paths (in report json) holding the number of input reads of a chunk, used
+# to weight rates that can not be recomputed from counts
+READ_COUNT_PATHS = [
+    ("summary", "before_filtering", "total_reads"),  # fastp (preqc)
+    ("read_counts", "input"),  # cutadapt (adapterqc, demux)
+]
+
+# rate key -> (numerator key, denominator key), looked up in the same object
+RATES = {
+    "q20_rate": ("q20_bases", "total_bases"),
+    "q30_rate": ("q30_bases", "total_bases"),
+    "read1_mean_length": ("total_bases", "total_reads"),
+    "read2_mean_length": ("total_bases", "total_reads"),
+}
+
+# Keys of settings and read geometry, the same in every chunk
+CONSTANTS = {
+    "schema_version",  # cutadapt
+    "cores",  # cutadapt
+    "error_rate",  # cutadapt, per adapter
+    "error_lengths",  # cutadapt, per adapter
+    "total_cycles",  # fastp
+}
+
+# Floats that are expected counts rather than rates
+SUMMED = {"expect"}  # cutadapt trimmed_lengths
+
+# Lists of records matched by a key rather than by position: the antibodies of
+# demux and the trimmed lengths found in each chunk differ
+KEYED_LISTS = {
+    "adapters_read1": "name",
+    "adapters_read2": "name",
+    "trimmed_lengths": "len",
+}
+
+
+def read_count(report):
+    for path in READ_COUNT_PATHS:
+        value = report
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def strip_token(value):
+    return CHUNK_TOKEN.sub("", value)
+
+
+def merge_keyed(values_present, key):
+    """Merge lists of records by the value of `key` in each record"""
+    order = []
+    records = defaultdict(lambda: [None] * len(values_present))
+    for i, (v, _) in enumerate(values_present):
+        for record in v if isinstance(v, list) else []:
+            if record[key] not in records:
+                order.append(record[key])
+            records[record[key]][i] = record
+
+    weights = [w for _, w in values_present]
+    merged = []
+    for k in order:
+        record = merge_values(records[k], weights)
+        record[key] = k
+        merged.append(record)
+    if key == "len":
+        merged.sort(key=lambda r: r[key])
+    return merged
+
+
+def merge_values(values, weights, key=None):
+    values_present = [(v, w) for v, w in zip(values, weights) if v is not None]
+    if not values_present:
+        return None
+
+    first = values_present[0][0]
+
+    if isinstance(first, bool) or key in CONSTANTS:
+        return first
+
+    if key in KEYED_LISTS and isinstance(first, list):
+        return merge_keyed(values_present, KEYED_LISTS[key])
+
+    if isinstance(first, int) and all(
+        isinstance(v, int) and not isinstance(v, bool) for v, _ in values_present
+    ):
+        return sum(v for v, _ in values_present)
+
+    if isinstance(first, (int, float)) and key in SUMMED:
+        return sum(v for v, _ in values_present)
+
+    if isinstance(first, (int, float)):
+        total_weight = sum(w for _, w in values_present)
+        if total_weight == 0:
+            return sum(v for v, _ in values_present) / len(values_present)
+        return sum(v * w for v, w in values_present) / total_weight
+
+    if isinstance(first, str):
+        return strip_token(first)
+
+    if isinstance(first, dict):
+        keys = []
+        for v, _ in values_present:
+            keys.extend(k for k in v if k not in keys)
+
+        merged = {}
+        for k in keys:
+            merged[k] = merge_values(
+                [v.get(k) if isinstance(v, dict) else None for v, _ in values_present],
+                [w for _, w in values_present],
+                key=k,
+            )
+
+        for rate, (num, den) in RATES.items():
+            if (
+                rate in merged
+                and isinstance(merged.get(num), (int, float))
+                and merged.get(den)
+            ):
+                value = merged[num] / merged[den]
+                # fastp writes the mean read length as an integer
+                merged[rate] = round(value) if isinstance(merged[rate], int) else value
+
+        return merged
+
+    if isinstance(first, list):
+        length = max(len(v) for v, _ in values_present if isinstance(v, list))
+        return [
+            merge_values(
+                [
+                    v[i] if isinstance(v, list) and i < len(v) else None
+                    for v, _ in values_present
+                ],
+                [w for _, w in values_present],
+                key=key,
+            )
+            for i in range(length)
+        ]
+
+    return first
+
+
+def merge_reports(paths):
+    reports = [json.loads(p.read_text()) for p in paths]
+    weights = [read_count(r) for r in reports]
+    if any(w is None for w in weights):
+        weights = [1] * len(reports)
+    return merge_values(reports, weights)
+
+
+def merge_metadata(paths):
+    return merge_values([json.loads(paths[0].read_text())], [1])
+
+
+def main(args):
+    groups = defaultdict(list)
+    for path in sorted(args.chunks):
+        if path.is_dir():
+            continue
+        groups[strip_token(path.name)].append(path)
+
+    args.output.mkdir(parents=True, exist_ok=True)
+
+    for name, paths in sorted(groups.items()):
+        dst = args.output / name
+
+        if name.endswith(".report.json"):
+            dst.write_text(json.dumps(merge_reports(paths), indent=4))
+        elif name.endswith(".meta.json"):
+            dst.write_text(json.dumps(merge_metadata(paths), indent=4))
+        else:
+            with open(dst, "wb") as out:
+                for path in paths:
+                    with open(path, "rb") as f:
+                        shutil.copyfileobj(f, out, length=1 << 20)
+
+        print(f"Merged {len(paths)} chunks into {dst}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--output", dest="output", type=Path, required=True)
+    parser.add_argument("chunks", type=Path, nargs="+")
+    args = parser.parse_args()
+
+    main(args)
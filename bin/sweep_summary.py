@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""
+Compare the analysis and layout reports of the --analysis_sweep parameter sets.
+
+The input has one JSON object per line with the parameter set name, sample,
+stage, the parameters of the set and the stage report.json. The numeric
+report values are flattened to dotted keys, with list items keyed by their
+index, and written as one row per set and sample, next to the parameters of
+the set.
+"""
+
+import argparse
+import csv
+import json
+from collections import OrderedDict
+from pathlib import Path
+
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            yield from flatten(v, f"{prefix}{k}.")
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            yield from flatten(v, f"{prefix}{i}.")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix.rstrip("."), value
+
+
+def main(args):
+    rows = OrderedDict()
+    parameters = OrderedDict()
+
+    with open(args.reports) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+
+    for entry in sorted(entries, key=lambda e: (e["set"], e["sample"], e["stage"])):
+        row = rows.setdefault((entry["set"], entry["sample"]), OrderedDict())
+        parameters[entry["set"]] = entry["parameters"]
+        for key, value in flatten(entry["report"]):
+            row[f"{entry['stage']}.{key}"] = value
+
+    param_keys = sorted({k for p in parameters.values() for k in p})
+    metric_keys = sorted({k for row in rows.values() for k in row})
+
+    with open(f"{args.output_prefix}.tsv", "w", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(["set", "sample", *param_keys, *metric_keys])
+        for (name, sample), row in rows.items():
+            writer.writerow(
+                [
+                    name,
+                    sample,
+                    *(parameters[name].get(k, "") for k in param_keys),
+                    *(row.get(k, "") for k in metric_keys),
+                ]
+            )
+
+    summary = {
+        "parameter_sets": parameters,
+        "samples": sorted({sample for _, sample in rows}),
+        "metrics": {f"{name}:{sample}": row for (name, sample), row in rows.items()},
+    }
+    with open(f"{args.output_prefix}.json", "w") as f:
+        json.dump(summary, f, indent=4)
+
+    print(
+        f"Compared {len(parameters)} parameter sets over {len(summary['samples'])} samples"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--output-prefix", dest="output_prefix", type=str, default="sweep_summary"
+    )
+    parser.add_argument("reports", type=Path)
+    args = parser.parse_args()
+
+    main(args)
@@ -1,3 +1,4 @@
+import os
 
 from latch.types.metadata import (
     NextflowMetadata,
@@ -6,7 +7,14 @@ from latch.types.metadata import (
 )
 from latch.types.directory import LatchDir
 
-from .parameters import generated_parameters
+from wf.head import DEFAULT_HEAD
+
+# Latch reads the parameters at registration, the tasks of an execution only
+# need the workflow definitions
+if "FLYTE_INTERNAL_EXECUTION_ID" in os.environ:
+    generated_parameters = {}
+else:
+    from .parameters import generated_parameters
 
 NextflowMetadata(
     display_name='nf-core/pixelator',
@@ -14,9 +22,10 @@ NextflowMetadata(
         name="Your Name",
     ),
     parameters=generated_parameters,
+    # Other head sizes of wf/head.py are picked per run
     runtime_resources=NextflowRuntimeResources(
-        cpus=4,
-        memory=8,
+        cpus=DEFAULT_HEAD.cpus,
+        memory=DEFAULT_HEAD.memory_gib,
         storage_gib=100,
     ),
     log_dir=LatchDir("latch:///your_log_dir"),
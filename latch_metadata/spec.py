@@ -0,0 +1,223 @@
+"""
+Compact spec of the pipeline parameters set from the Latch UI, compiled from
+`nextflow_schema.json`.
+
+The spec has the name, schema type, default, section and description of every
+parameter of the schema that is not hidden, in schema order. It is cached in
+`parameter_spec.json` with the hash of the schema it was compiled from, so the
+parameters of the metadata and the flags passed to Nextflow follow the schema
+without a second list to keep in sync. The image build writes the cached
+spec. `load_spec` only reads it: the schema is read to hash it and compiled
+in memory if it changed since, and the spec is parsed once per process.
+
+The task and workflow signatures in `wf/entrypoint.py` are read by Flyte and
+Latch at registration and stay explicit. `check_signature` checks a
+signature against the spec at import, and running this file checks all of
+them and refreshes the cached spec:
+
+    python latch_metadata/spec.py [--check]
+"""
+
+import argparse
+import ast
+import hashlib
+import inspect
+import json
+import sys
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMA = ROOT / "nextflow_schema.json"
+SPEC = Path(__file__).resolve().parent / "parameter_spec.json"
+ENTRYPOINT = ROOT / "wf" / "entrypoint.py"
+
+# Schema parameters without a Latch UI input: the sweep workflow writes
+# `analysis_sweep` from its typed parameter sets
+EXCLUDED = ("analysis_sweep",)
+
+# Functions of the entrypoint that take every parameter of the spec, the
+# workflows also with the schema defaults
+SIGNATURES = ("run_nextflow", "sized_nextflow_runtime", "per_sample_fan_out")
+WORKFLOWS = (
+    "nf_nf_core_pixelator",
+    "nf_nf_core_pixelator_per_sample",
+    "nf_nf_core_pixelator_sweep",
+)
+
+
+class SpecMismatch(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class ParameterSpec:
+    name: str
+    type: str
+    format: Optional[str] = None
+    default: Any = None
+    required: bool = False
+    # Title of the schema section, on the first parameter of each section only
+    section: Optional[str] = None
+    description: Optional[str] = None
+
+
+def schema_sha(schema: Path = SCHEMA) -> str:
+    return hashlib.sha256(schema.read_bytes()).hexdigest()
+
+
+def compile_spec(schema: dict) -> List[ParameterSpec]:
+    definitions = schema.get("definitions") or schema.get("$defs") or {}
+    order = [
+        ref["$ref"].rsplit("/", 1)[-1]
+        for ref in schema.get("allOf", [])
+        if "$ref" in ref
+    ]
+
+    res: List[ParameterSpec] = []
+    for group in order:
+        definition = definitions[group]
+        required = set(definition.get("required", []))
+        section = definition.get("title")
+        for name, prop in definition.get("properties", {}).items():
+            if prop.get("hidden") or name in EXCLUDED:
+                continue
+            res.append(
+                ParameterSpec(
+                    name=name,
+                    type=prop.get("type", "string"),
+                    format=prop.get("format"),
+                    default=prop.get("default"),
+                    required=name in required,
+                    section=section,
+                    description=prop.get("description"),
+                )
+            )
+            section = None
+    return res
+
+
+def write_spec(schema: Path = SCHEMA, spec: Path = SPEC) -> List[ParameterSpec]:
+    params = compile_spec(json.loads(schema.read_text()))
+    spec.write_text(
+        json.dumps(
+            {
+                "schema_sha256": schema_sha(schema),
+                # Fields at their defaults are left out
+                "parameters": [
+                    {
+                        k: v
+                        for k, v in asdict(p).items()
+                        if v != ParameterSpec.__dataclass_fields__[k].default
+                    }
+                    for p in params
+                ],
+            },
+            indent=1,
+        )
+        + "\n"
+    )
+    return params
+
+
+@lru_cache(maxsize=None)
+def load_spec() -> Tuple[ParameterSpec, ...]:
+    """Parameters of the cached spec, compiled from the schema instead if it changed"""
+    try:
+        cached = json.loads(SPEC.read_text())
+    except (OSError, ValueError):
+        cached = None
+
+    if SCHEMA.exists() and (
+        cached is None or cached.get("schema_sha256") != schema_sha()
+    ):
+        return tuple(compile_spec(json.loads(SCHEMA.read_text())))
+
+    if cached is None:
+        raise FileNotFoundError(f"Neither {SPEC} nor {SCHEMA} exist")
+    return tuple(ParameterSpec(**p) for p in cached["parameters"])
+
+
+def parameter_names() -> Tuple[str, ...]:
+    return tuple(p.name for p in load_spec())
+
+
+def check_signature(fn: Callable, extra: Iterable[str] = ()) -> None:
+    """Raise SpecMismatch if `fn` does not take exactly the spec parameters and `extra`"""
+    _check_names(fn.__name__, list(inspect.signature(fn).parameters), extra)
+
+
+def _check_names(name: str, args: List[str], extra: Iterable[str]) -> None:
+    expected = set(parameter_names()) | set(extra)
+    missing = sorted(expected - set(args))
+    unknown = sorted(set(args) - expected)
+    if missing or unknown:
+        raise SpecMismatch(
+            f"{name}: parameters missing from the signature {missing}, not in nextflow_schema.json {unknown}"
+        )
+
+
+def check_entrypoint(path: Path = ENTRYPOINT) -> List[str]:
+    """Differences between the signatures of the entrypoint and the spec"""
+    functions = {
+        n.name: n
+        for n in ast.parse(path.read_text()).body
+        if isinstance(n, ast.FunctionDef)
+    }
+    names = set(parameter_names())
+    defaults = {p.name: p.default for p in load_spec()}
+    errors: List[str] = []
+
+    for fn_name in SIGNATURES + WORKFLOWS:
+        fn = functions.get(fn_name)
+        if fn is None:
+            errors.append(f"{fn_name}: not found in {path}")
+            continue
+        args = [a.arg for a in fn.args.args]
+        missing = sorted(names - set(args))
+        if missing:
+            errors.append(f"{fn_name}: parameters missing from the signature {missing}")
+
+        if fn_name not in WORKFLOWS:
+            continue
+        arg_defaults: Dict[str, Any] = {}
+        for arg, node in zip(
+            fn.args.args[len(fn.args.args) - len(fn.args.defaults) :], fn.args.defaults
+        ):
+            try:
+                arg_defaults[arg.arg] = ast.literal_eval(node)
+            except ValueError:
+                pass
+        for arg in sorted(names & set(args)):
+            if arg_defaults.get(arg) != defaults[arg]:
+                errors.append(
+                    f"{fn_name}: default of {arg} is {arg_defaults.get(arg)!r}, the schema has {defaults[arg]!r}"
+                )
+    return errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only check, exit 1 if the cached spec is stale",
+    )
+    args = parser.parse_args()
+
+    cached = json.loads(SPEC.read_text()) if SPEC.exists() else {}
+    if cached.get("schema_sha256") != schema_sha():
+        if args.check:
+            print(f"{SPEC.name} is stale, run `python latch_metadata/spec.py`")
+            sys.exit(1)
+        write_spec()
+        print(f"Wrote {SPEC}")
+
+    errors = check_entrypoint()
+    for error in errors:
+        print(error)
+    sys.exit(1 if errors else 0)
@@ -0,0 +1,62 @@
+// Writes the partitions of one sample (and parameter set) to the cohort index, see
+// bin/cohort_index.py. All tasks publish into the same `cohort_index` directory.
+process PIXELATOR_COHORT_INDEX {
+    tag "$meta.id"
+    label 'process_low'
+
+    conda "bioconda::pixelator=0.17.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/pixelator:0.17.1--pyhdfd78af_0' :
+        'biocontainers/pixelator:0.17.1--pyhdfd78af_0' }"
+
+    input:
+    tuple val(meta), path(dataset, stageAs: "dataset/*"), val(stages), path(reports, stageAs: "reports/?/*")
+
+    output:
+    tuple val(meta), path("cohort_index/**/*.parquet"), emit: parquet
+    path "versions.yml"                               , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+    def report_args = [stages, [reports].flatten()].transpose().collect { stage, report -> "--report ${stage}=${report}" }.join(' ')
+    def set_arg = meta.sweep ? "--set ${meta.sweep}" : ''
+
+    """
+    cohort_index.py \\
+        --sample ${meta.id} \\
+        ${set_arg} \\
+        --output cohort_index \\
+        ${report_args} \\
+        $args \\
+        ${dataset}
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+        pixelator: \$(echo \$(pixelator --version 2>/dev/null) | sed 's/pixelator, version //g' )
+    END_VERSIONS
+    """
+}
+
+//
+// Input of PIXELATOR_COHORT_INDEX from the per stage data of a report (see GENERATE_REPORTS):
+// the last dataset of the run and the report JSON of every stage, with the stage names in
+// the same order as the reports.
+//
+// The layout dataset only adds the layout coordinates, which are not indexed, so the
+// analysis dataset is read, or the annotate dataset with --skip_analysis.
+//
+def cohortIndexInput(Map data) {
+    def files = { stage -> data[stage] ? [data[stage]].flatten() : [] }
+    def dataset = ['analysis', 'annotate']
+        .collect { stage -> files(stage).find { it.name.endsWith('dataset.pxl') } }
+        .find { it != null }
+    def reports = data.keySet()
+        .findAll { it != 'panel' }
+        .collectMany { stage -> files(stage).findAll { it.name.endsWith('report.json') }.collect { [stage, it] } }
+
+    return [ data.panel[0], dataset, reports.collect { it[0] }, reports.collect { it[1] } ]
+}
@@ -1,10 +1,13 @@
 import groovy.json.JsonOutput
+import groovy.json.JsonSlurper
 
 
 
+// The environment (python packages and tool versions) only depends on the
+// container image, set params.metadata_cache to store it across runs (see
+// conf/modules.config). The run data is merged in by `mergeWorkflowMetadata`.
 process PIXELATOR_COLLECT_METADATA {
     label 'process_single'
-    cache false
 
     conda "bioconda::pixelator=0.17.1"
     container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
@@ -14,14 +17,22 @@ process PIXELATOR_COLLECT_METADATA {
     input:
 
     output:
-    path "metadata.json", emit: metadata
-    path "versions.yml" , emit: versions
+    path "environment.json", emit: environment
+    path "versions.yml"    , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
 
     script:
+    """
+    collect_metadata.py --process-name ${task.process} --output environment.json
+    """
+}
 
+//
+// Merge the per-run workflow data into the (cached) environment metadata
+//
+def mergeWorkflowMetadata(environment) {
     Map nextflow_dict = [
         version: workflow.nextflow.version,
         build: workflow.nextflow.build,
@@ -70,10 +81,6 @@ process PIXELATOR_COLLECT_METADATA {
         parameters: params
     ]
 
-    def nextflowJson = JsonOutput.toJson(metadata)
-
-    """
-    echo '${nextflowJson}' > nextflow-metadata.json
-    collect_metadata.py --process-name ${task.process} --workflow-data "nextflow-metadata.json"
-    """
+    def root = new JsonSlurper().parseText(environment.text) + metadata
+    return JsonOutput.prettyPrint(JsonOutput.toJson(root))
 }
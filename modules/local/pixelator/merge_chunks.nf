@@ -0,0 +1,35 @@
+process PIXELATOR_MERGE_CHUNKS {
+    tag "$meta.id"
+    label 'process_single'
+
+
+    conda "bioconda::pixelator=0.17.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/pixelator:0.17.1--pyhdfd78af_0' :
+        'biocontainers/pixelator:0.17.1--pyhdfd78af_0' }"
+
+    input:
+    tuple val(meta), val(stage), path(chunk_files, stageAs: "chunks/*")
+
+    output:
+    tuple val(meta), path("${stage}/*processed*.{fq,fastq}.gz"), emit: processed, optional: true
+    tuple val(meta), path("${stage}/*failed*.{fq,fastq}.gz")   , emit: failed   , optional: true
+    tuple val(meta), path("${stage}/*.report.json")            , emit: report_json
+    tuple val(meta), path("${stage}/*.meta.json")              , emit: metadata
+    path "versions.yml"                                        , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    """
+    merge_chunks.py \\
+        --output ${stage} \\
+        chunks/*
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+}
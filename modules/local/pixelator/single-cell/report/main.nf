@@ -22,7 +22,7 @@ process PIXELATOR_REPORT {
 
 
     output:
-    path "report/*.html"        , emit: reports
+    tuple val(meta), path("report/*.html"), emit: reports
     path "versions.yml"         , emit: versions
     path "*pixelator-*.log"     , emit: log
 
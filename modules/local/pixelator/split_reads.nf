@@ -0,0 +1,40 @@
+process PIXELATOR_SPLIT_READS {
+    tag "$meta.id"
+    label 'process_single'
+
+
+    conda "bioconda::pixelator=0.17.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/pixelator:0.17.1--pyhdfd78af_0' :
+        'biocontainers/pixelator:0.17.1--pyhdfd78af_0' }"
+
+    input:
+    tuple val(meta), path(reads)
+    val chunks
+
+    output:
+    tuple val(meta), path("chunks/*.{fq,fastq}.gz"), emit: chunks
+    path "versions.yml"                            , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def prefix = task.ext.prefix ?: "${meta.id}"
+    def args = task.ext.args ?: ''
+
+    """
+    split_fastq.py \\
+        --chunks ${chunks} \\
+        --prefix ${prefix} \\
+        --output-dir chunks \\
+        --stats ${prefix}.codec.json \\
+        $args \\
+        ${reads}
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+}
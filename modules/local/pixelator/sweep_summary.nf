@@ -0,0 +1,35 @@
+process PIXELATOR_SWEEP_SUMMARY {
+    label 'process_single'
+
+
+    conda "bioconda::pixelator=0.17.1"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://depot.galaxyproject.org/singularity/pixelator:0.17.1--pyhdfd78af_0' :
+        'biocontainers/pixelator:0.17.1--pyhdfd78af_0' }"
+
+    input:
+    path reports
+
+    output:
+    path "sweep_summary.tsv" , emit: tsv
+    path "sweep_summary.json", emit: json
+    path "versions.yml"      , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    def args = task.ext.args ?: ''
+
+    """
+    sweep_summary.py \\
+        --output-prefix sweep_summary \\
+        $args \\
+        ${reports}
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+}
@@ -4,9 +4,97 @@
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 */
 
+import groovy.json.JsonOutput
+import groovy.json.JsonSlurper
+
 include { PIXELATOR_REPORT            } from '../../modules/local/pixelator/single-cell/report/main'
 
 
+//
+// Reports are generated per sample, and per parameter set with --analysis_sweep
+//
+def reportKey(meta) {
+    return meta.sweep ? "${meta.id}:${meta.sweep}".toString() : meta.id
+}
+
+
+//
+// Stages with outputs for the report in this run; analysis and layout can be skipped
+//
+def reportStages() {
+    def stages = ['amplicon', 'preqc', 'adapterqc', 'demux', 'collapse', 'graph', 'annotate']
+    if (!params.skip_analysis) {
+        stages << 'analysis'
+        if (!params.skip_layout) {
+            stages << 'layout'
+        }
+    }
+    return stages
+}
+
+def stageFiles(Map data, String stage) {
+    return data[stage] ? [data[stage]].flatten() : []
+}
+
+//
+// Numeric top level values of the annotate report, shown in the report index
+//
+def reportMetrics(files) {
+    def report = [files].flatten().find { it && it.name.endsWith('.report.json') }
+    if (!report) {
+        return [:]
+    }
+    def values = new JsonSlurper().parseText(report.text)
+    return values.findAll { key, value -> value instanceof Number }
+}
+
+def reportIndexEntry(meta, report, metrics) {
+    def reportDir = meta.sweep ? "../sweep/${meta.sweep}/report" : 'report'
+    return [
+        sample    : meta.id,
+        sweep     : meta.sweep ?: null,
+        reports   : [report].flatten().collect { "${reportDir}/${it.name}".toString() },
+        completed : new Date().format("yyyy-MM-dd'T'HH:mm:ssXXX"),
+        metrics   : metrics,
+    ]
+}
+
+//
+// Write `report_index.json` and `report_index.html` next to the published reports.
+// Both are rewritten as a whole on every update, they are small.
+//
+def writeReportIndex(List entries, List stages) {
+    entries = entries.sort { a, b -> a.sample <=> b.sample ?: (a.sweep ?: '') <=> (b.sweep ?: '') }
+    def metricNames = entries.collectMany { it.metrics.keySet() as List }.unique()
+
+    def outdir = file("${params.outdir}/pixelator")
+    outdir.mkdirs()
+
+    outdir.resolve('report_index.json').text = JsonOutput.prettyPrint(JsonOutput.toJson([
+        updated : new Date().format("yyyy-MM-dd'T'HH:mm:ssXXX"),
+        stages  : stages,
+        reports : entries,
+    ]))
+
+    def esc = { value -> value.toString().replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;') }
+    def header = (['sample', 'set', 'report', 'completed'] + metricNames).collect { "<th>${esc(it)}</th>" }.join('')
+    def rows = entries.collect { entry ->
+        def links = entry.reports.collect { "<a href=\"${esc(it)}\">${esc(it.tokenize('/').last())}</a>" }.join(' ')
+        def cells = [esc(entry.sample), esc(entry.sweep ?: ''), links, esc(entry.completed)]
+        cells += metricNames.collect { name -> entry.metrics.containsKey(name) ? esc(entry.metrics[name]) : '' }
+        "<tr>${cells.collect { "<td>${it}</td>" }.join('')}</tr>"
+    }.join('\n')
+
+    outdir.resolve('report_index.html').text = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>nf-core/pixelator reports</title>
+<style>table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:2px 6px}</style></head>
+<body><h1>nf-core/pixelator reports</h1><p>${entries.size()} report(s), updated ${new Date()}</p>
+<table><thead><tr>${header}</tr></thead><tbody>
+${rows}
+</tbody></table></body></html>
+"""
+}
+
 /*
 ========================================================================================
     SUBWORKFLOW TO GENERATE PIXELATOR REPORTS
@@ -29,89 +117,51 @@ workflow GENERATE_REPORTS {
     main:
     ch_versions = Channel.empty()
 
-    ch_meta_col = panel_files
-        .map { meta, data -> [ meta.id, meta] }
-        .groupTuple()
-        .map { id, data ->
-            if (data instanceof List) {
-                def newMeta = [:]
-                for (item in data) {
-                    newMeta += item
-                }
-                return [id, newMeta]
-            }
-            return [id, data]
-        }
-
-    ch_panel_col = panel_files
-        .map { meta, data -> [ meta.id, data] }
-
     //
-    // These first subcommands each return two files per sample used by the reporting
-    // A json file with stats and a command invocation metadata json file
+    // Tag the outputs of every stage with the stage name and group them per report. Each stage emits one item per report, so a group is complete, and the report of
+    // that sample can start, as soon as its own stages are done. Stages that are skipped for
+    // this run do not count towards the group size.
     //
-    ch_amplicon_col         = amplicon_data.map { meta, data -> [ meta.id, data] }
-    ch_preqc_col            = preqc_data.map { meta, data -> [ meta.id, data] }
-    ch_adapterqc_col        = adapterqc_data.map { meta, data -> [ meta.id, data] }
-    ch_demux_col            = demux_data.map { meta, data -> [ meta.id, data] }
-    ch_collapse_col         = collapse_data.map { meta, data -> [ meta.id, data] }
-    ch_graph_col            = graph_data.map { meta, data -> [meta.id, data] }
-    ch_annotate_col         = annotate_data.map { meta, data -> [meta.id, data] }
-    ch_analysis_col         = analysis_data.map { meta, data -> [meta.id, data] }
-    ch_layout_col           = layout_data.map { meta, data -> [meta.id, data] }
+    def expected_stages = reportStages()
 
-    //
-    // Combine all inputs and group them, then split them up again.
-    // This is neded to have the per subcommand outputs in the sample order
-    //
-    // ch_report_data: [
-    //    [
-    //       meta, panel_files,
-    //      [amplicon files...],
-    //      [preqc files...],
-    //      [adapterqc files...],
-    //      [demux files...],
-    //      [collapse files...],
-    //      [cluster files],
-    //      [annotate files...],
-    //      [analysis files...]
-    //    ],
-    //    [ same structure repeated for each sample ]
-    // ]
-
-    ch_report_data = ch_meta_col
-        .concat ( ch_panel_col )
-        .concat ( ch_amplicon_col )
-        .concat ( ch_preqc_col )
-        .concat ( ch_adapterqc_col )
-        .concat ( ch_demux_col )
-        .concat ( ch_collapse_col )
-        .concat ( ch_graph_col )
-        .concat ( ch_annotate_col )
-        .concat ( ch_analysis_col )
-        .concat ( ch_layout_col )
-        .groupTuple (size: 10)
+    ch_report_data = panel_files
+        .map { meta, data -> [ reportKey(meta), 'panel', [meta, data] ] }
+        .mix(
+            amplicon_data.map { meta, data -> [ reportKey(meta), 'amplicon', data ] },
+            preqc_data.map { meta, data -> [ reportKey(meta), 'preqc', data ] },
+            adapterqc_data.map { meta, data -> [ reportKey(meta), 'adapterqc', data ] },
+            demux_data.map { meta, data -> [ reportKey(meta), 'demux', data ] },
+            collapse_data.map { meta, data -> [ reportKey(meta), 'collapse', data ] },
+            graph_data.map { meta, data -> [ reportKey(meta), 'graph', data ] },
+            annotate_data.map { meta, data -> [ reportKey(meta), 'annotate', data ] },
+            analysis_data.map { meta, data -> [ reportKey(meta), 'analysis', data ] },
+            layout_data.map { meta, data -> [ reportKey(meta), 'layout', data ] },
+        )
+        .groupTuple(size: expected_stages.size() + 1)
+        .map { id, stages, data -> [ id, [stages, data].transpose().collectEntries() ] }
 
     //
     // Split up everything per stage so we can recreate the expected directory structure for
-    // `pixelator single-cell report` using stageAs for each stage
+    // `pixelator single-cell report` using stageAs for each stage.
     //
-    // These ch_<stage>_grouped channels all emit a list of input files for each sample in the samplesheet
-    // The channels will emit values in the same order so eg. the first list of files from each ch_<stage>_grouped
-    // channel will match the same sample from the samplesheet.
-
-    // If no `panel_file` (data[1]) is given we need to pass in `panel` from the samplesheet instead
+    // The per stage channels are derived from the same grouped item so they emit the files
+    // of a sample in the same order.
+    //
+    // If no `panel_file` is given we need to pass in `panel` from the samplesheet instead
     //
-    ch_panel_files_grouped  = ch_report_data.map { id, data -> [ data[0], data[1], data[1] ? null : data[0].panel ] }
-    ch_amplicon_grouped     = ch_report_data.map { id, data -> data[2] ? data[2].flatten() : [] }
-    ch_preqc_grouped        = ch_report_data.map { id, data -> data[3] ? data[3].flatten() : [] }
-    ch_adapterqc_grouped    = ch_report_data.map { id, data -> data[4] ? data[4].flatten() : [] }
-    ch_demux_grouped        = ch_report_data.map { id, data -> data[5] ? data[5].flatten() : [] }
-    ch_collapse_grouped     = ch_report_data.map { id, data -> data[6] ? data[6].flatten() : [] }
-    ch_graph_grouped        = ch_report_data.map { id, data -> data[7] ? data[7].flatten() : [] }
-    ch_annotate_grouped     = ch_report_data.map { id, data -> data[8] ? data[8].flatten() : [] }
-    ch_analysis_grouped     = ch_report_data.map { id, data -> data[9] ? data[9].flatten() : [] }
-    ch_layout_grouped       = ch_report_data.map { id, data -> data[10] ? data[10].flatten() : [] }
+    ch_report_input = ch_report_data
+        .multiMap { id, data ->
+            panel:      [ data.panel[0], data.panel[1], data.panel[1] ? null : data.panel[0].panel ]
+            amplicon:   stageFiles(data, 'amplicon')
+            preqc:      stageFiles(data, 'preqc')
+            adapterqc:  stageFiles(data, 'adapterqc')
+            demux:      stageFiles(data, 'demux')
+            collapse:   stageFiles(data, 'collapse')
+            graph:      stageFiles(data, 'graph')
+            annotate:   stageFiles(data, 'annotate')
+            analysis:   stageFiles(data, 'analysis')
+            layout:     stageFiles(data, 'layout')
+        }
 
     //
     // MODULE: Run pixelator single-cell report for each samples
@@ -119,21 +169,34 @@ workflow GENERATE_REPORTS {
     // NB: These channels need to be split per stage to allow PIXELATOR_REPORT to
     //     use stageAs directives to reorder the inputs and prevent filename collisions
     PIXELATOR_REPORT (
-        ch_panel_files_grouped,
-        ch_amplicon_grouped,
-        ch_preqc_grouped,
-        ch_adapterqc_grouped,
-        ch_demux_grouped,
-        ch_collapse_grouped,
-        ch_graph_grouped,
-        ch_annotate_grouped,
-        ch_analysis_grouped,
-        ch_layout_grouped,
+        ch_report_input.panel,
+        ch_report_input.amplicon,
+        ch_report_input.preqc,
+        ch_report_input.adapterqc,
+        ch_report_input.demux,
+        ch_report_input.collapse,
+        ch_report_input.graph,
+        ch_report_input.annotate,
+        ch_report_input.analysis,
+        ch_report_input.layout,
     )
 
+    //
+    // Update the multi-sample index in the output directory every time a report lands
+    //
+    def index_entries = [:]
+    PIXELATOR_REPORT.out.reports
+        .map { meta, report -> [ reportKey(meta), meta, report ] }
+        .join(ch_report_data.map { id, data -> [ id, reportMetrics(data.annotate) ] })
+        .subscribe { id, meta, report, metrics ->
+            index_entries[id] = reportIndexEntry(meta, report, metrics)
+            writeReportIndex(index_entries.values().toList(), expected_stages)
+        }
+
     ch_versions = ch_versions.mix(PIXELATOR_REPORT.out.versions.first())
 
     emit:
-    pixelator_reports = PIXELATOR_REPORT.out.reports
+    pixelator_reports = PIXELATOR_REPORT.out.reports   // channel: [meta, [path(report.html), ...]]
+    report_data      = ch_report_data                 // channel: [id, [stage: data, panel: [meta, path(panel_file) | []]]]
     versions         = ch_versions
 }
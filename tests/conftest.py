@@ -0,0 +1,78 @@
+import hashlib
+import re
+import sys
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# `wf` is imported as a package from the repository root, the scripts of `bin`
+# as top-level modules
+sys.path[:0] = [str(ROOT), str(ROOT / "bin")]
+
+
+class _FileHandler(BaseHTTPRequestHandler):
+    """Serves `server.root` with range requests, ETag and Last-Modified like an object store"""
+
+    def log_message(self, *args):
+        pass
+
+    def _file(self):
+        path = self.server.root / self.path.lstrip("/")
+        return path if path.is_file() else None
+
+    def _headers(self, path, status, start, end):
+        data = path.read_bytes()
+        self.send_response(status)
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("ETag", f'"{hashlib.md5(data).hexdigest()}"')
+        self.send_header("Last-Modified", formatdate(path.stat().st_mtime, usegmt=True))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(data)}")
+        self.end_headers()
+        return data[start:end]
+
+    def _respond(self, body: bool):
+        path = self._file()
+        if path is None:
+            self.send_error(404)
+            return
+        size = path.stat().st_size
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+        if match is None or not self.server.ranges:
+            data = self._headers(path, 200, 0, size)
+        else:
+            start = int(match.group(1))
+            end = min(size, int(match.group(2)) + 1) if match.group(2) else size
+            data = self._headers(path, 206, start, end)
+        if body:
+            self.server.requests.append((self.path, self.headers.get("Range")))
+            self.wfile.write(data)
+
+    def do_HEAD(self):
+        self._respond(body=False)
+
+    def do_GET(self):
+        self._respond(body=True)
+
+
+@pytest.fixture
+def http_root(tmp_path):
+    """Directory served over HTTP, yields (root, base URL, server)"""
+    root = tmp_path / "http"
+    root.mkdir()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FileHandler)
+    server.root = root
+    server.ranges = True
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield root, f"http://127.0.0.1:{server.server_port}", server
+    finally:
+        server.shutdown()
+        server.server_close()
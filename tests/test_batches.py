@@ -0,0 +1,86 @@
+from pathlib import Path
+
+from wf.batches import (
+    SampleBatch,
+    merge_manifests,
+    merge_metadata,
+    merge_report_indexes,
+    render_report_index,
+    summarize_batches,
+)
+
+
+def index(stages, *reports):
+    return {
+        "updated": "2026-01-01T00:00:00+00:00",
+        "stages": stages,
+        "reports": list(reports),
+    }
+
+
+def report(sample, **metrics):
+    return {
+        "sample": sample,
+        "sweep": None,
+        "reports": [f"report/{sample}.qc-report.html"],
+        "completed": "2026-01-01T00:00:00+00:00",
+        "metrics": metrics,
+    }
+
+
+def test_merge_report_indexes():
+    merged = merge_report_indexes(
+        [
+            index(["amplicon", "report"], report("S2", cells=10)),
+            index(["amplicon", "layout", "report"], report("S1", reads=5)),
+        ]
+    )
+
+    assert merged["stages"] == ["amplicon", "report", "layout"]
+    assert [r["sample"] for r in merged["reports"]] == ["S1", "S2"]
+
+    html = render_report_index(merged)
+    assert "<th>reads</th><th>cells</th>" in html
+    assert '<a href="report/S1.qc-report.html">S1.qc-report.html</a>' in html
+    assert "2 report(s)" in html
+
+
+def test_merge_manifests_and_metadata():
+    manifest = merge_manifests(
+        {
+            "batch_1": {"updated": 1, "files": [{"path": "pixelator/b"}]},
+            "batch_2": {"updated": 2, "files": [{"path": "pixelator/a"}]},
+        }
+    )
+    assert manifest == {
+        "updated": 2,
+        "files": [{"path": "pixelator/a"}, {"path": "pixelator/b"}],
+    }
+
+    metadata = merge_metadata(
+        {
+            "batch_2": {"nextflow": {"version": "23.10"}, "workflow": {"runName": "b"}},
+            "batch_1": {"nextflow": {"version": "23.10"}, "workflow": {"runName": "a"}},
+        }
+    )
+    assert metadata["workflow"] == {"runName": "a"}
+    assert metadata["batches"] == {
+        "batch_1": {"runName": "a"},
+        "batch_2": {"runName": "b"},
+    }
+
+
+def test_summarize_batches_matches_reports_by_sample_name():
+    batches = [
+        SampleBatch("batch_1", Path("batch_1.csv"), ["sample1", "sample1.b"]),
+        SampleBatch("batch_2", Path("batch_2.csv"), ["sample10"]),
+    ]
+    reports = ["sample1.b.qc-report.html", "sample10.qc-report.html"]
+
+    summary = summarize_batches(batches, reports, skip_report=False)
+
+    assert [b["reports"] for b in summary["batches"]] == [
+        {"sample1": None, "sample1.b": "sample1.b.qc-report.html"},
+        {"sample10": "sample10.qc-report.html"},
+    ]
+    assert summary["missing_reports"] == ["sample1"]
@@ -0,0 +1,50 @@
+import os
+
+from wf.cleanup import Cleaner, expected_tasks, is_hollow
+
+HEADER = "task_id\thash\tprocess\ttag\tstatus\n"
+
+
+def task(work, n):
+    # Task directories are `<work>/<xx>/<30 hex digits>`
+    name = f"{n:06x}" + "0" * 24
+    task_dir = work / "ab" / name
+    task_dir.mkdir(parents=True)
+    return task_dir, f"ab/{name[:6]}"
+
+
+def completed(trace, task_hash, process, sample="S1"):
+    with open(trace, "a") as f:
+        f.write(
+            f"1\t{task_hash}\tNFCORE_PIXELATOR:PIXELATOR:{process}\t{sample}\tCOMPLETED\n"
+        )
+
+
+def test_chunked_adapterqc_outputs_wait_for_merge_adapterqc(tmp_path):
+    work = tmp_path / "work"
+    trace = tmp_path / "trace.txt"
+    trace.write_text(HEADER)
+
+    outputs = []
+    for n in (1, 2):
+        task_dir, task_hash = task(work, n)
+        output = task_dir / f"S1.chunk{n}.processed.fq.gz"
+        output.write_bytes(os.urandom(2 * 1024**2))
+        outputs.append(output)
+        completed(trace, task_hash, "PIXELATOR_QC")
+    for n, process in enumerate(
+        ["PIXELATOR_DEMUX", "PIXELATOR_DEMUX", "PIXELATOR_MERGE_PREQC"], start=3
+    ):
+        completed(trace, task(work, n)[1], process)
+
+    cleaner = Cleaner(work, trace, expected_tasks(read_chunks=2))
+    cleaner.update()
+    cleaner.release()
+
+    assert not any(is_hollow(p.stat()) for p in outputs)
+
+    completed(trace, task(work, 6)[1], "PIXELATOR_MERGE_ADAPTERQC")
+    cleaner.update()
+    cleaner.release()
+
+    assert all(is_hollow(p.stat()) for p in outputs)
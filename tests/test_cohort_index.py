@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+pytest.importorskip("pixelator")
+anndata = pytest.importorskip("anndata")
+np = pytest.importorskip("numpy")
+sparse = pytest.importorskip("scipy.sparse")
+
+from cohort_index import counts_table, flatten, qc_table  # noqa: E402
+
+
+def test_flatten_nested_values():
+    report = {
+        "sample_id": "S1",
+        "passed": True,
+        "reads": 100,
+        "stats": {"fraction": 0.5, "ok": False},
+        "chunks": [{"reads": 60}, {"reads": 40}],
+    }
+
+    assert dict(flatten(report)) == {
+        "reads": 100,
+        "stats.fraction": 0.5,
+        "chunks.0.reads": 60,
+        "chunks.1.reads": 40,
+    }
+
+
+def test_qc_table(tmp_path):
+    report = tmp_path / "S1.report.json"
+    report.write_text(json.dumps({"reads": 100, "is_ok": True, "rates": [{"r": 1}]}))
+
+    df = qc_table([("amplicon", report)])
+
+    assert df.values.tolist() == [
+        ["amplicon", "reads", 100.0],
+        ["amplicon", "rates.0.r", 1.0],
+    ]
+
+
+def test_counts_table_keeps_the_nonzero_counts():
+    adata = anndata.AnnData(
+        X=sparse.csr_matrix(np.array([[0, 3, 0], [5, 0, 1]], dtype=np.float32)),
+        obs={"reads": [10, 20]},
+        var={"nucleotide_sequence": ["A", "C", "G"]},
+    )
+    adata.obs_names = ["c1", "c2"]
+    adata.var_names = ["CD3", "CD4", "CD8"]
+
+    df = counts_table(adata)
+
+    assert sorted(df.itertuples(index=False, name=None)) == [
+        ("c1", "CD4", 3),
+        ("c2", "CD3", 5),
+        ("c2", "CD8", 1),
+    ]
+    assert df["count"].dtype == np.int64
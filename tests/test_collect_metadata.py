@@ -0,0 +1,64 @@
+import argparse
+import importlib
+import importlib.metadata
+import json
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("ruamel.yaml")
+
+
+def dist_info(site, name, version):
+    info = site / f"{name}-{version}.dist-info"
+    info.mkdir(parents=True)
+    (info / "METADATA").write_text(
+        f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+    )
+
+
+@pytest.fixture
+def collect_metadata(monkeypatch):
+    def no_scan(**kwargs):
+        raise AssertionError("packages scanned at import")
+
+    monkeypatch.delitem(sys.modules, "collect_metadata", raising=False)
+    with monkeypatch.context() as m:
+        m.setattr(importlib.metadata, "distributions", no_scan)
+        module = importlib.import_module("collect_metadata")
+    return module
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    site = tmp_path / "site-packages"
+    dist_info(site, "pixelator", "0.19.0")
+    dist_info(site, "polars", "1.2.1")
+    monkeypatch.setattr(sys, "path", [str(site)])
+    return site
+
+
+def test_packages_are_scanned_in_main(collect_metadata, site, tmp_path, monkeypatch):
+    def run(cmd, capture_output, text):
+        out = {"cutadapt": ("4.4\n", ""), "fastp": ("", "fastp 0.23.4\n")}
+        stdout, stderr = out[cmd[0]]
+        return subprocess.CompletedProcess(cmd, 0, stdout, stderr)
+
+    monkeypatch.setattr(collect_metadata.subprocess, "run", run)
+    monkeypatch.chdir(tmp_path)
+    output = tmp_path / "environment.json"
+
+    collect_metadata.main(
+        argparse.Namespace(
+            process_name="PIXELATOR_COLLECT_METADATA",
+            workflow_data=None,
+            output=output,
+        )
+    )
+
+    metadata = json.loads(output.read_text())
+    assert metadata["python"]["packages"] == {"pixelator": "0.19.0", "polars": "1.2.1"}
+    assert metadata["cutadapt"] == {"version": "4.4"}
+    assert metadata["fastp"] == {"version": "0.23.4"}
+    assert (tmp_path / "versions.yml").exists()
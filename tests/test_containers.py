@@ -0,0 +1,85 @@
+import json
+
+import requests
+
+from wf.containers import ImageReference, _pull_timing, digest_key, pin_image
+from wf.remote import LocalRemote
+
+DIGEST = "sha256:" + "a" * 64
+
+
+def test_parse_image_references():
+    assert ImageReference.parse("biocontainers/pixelator:0.17.1") == ImageReference(
+        "quay.io", "biocontainers/pixelator", "0.17.1"
+    )
+    assert ImageReference.parse("docker.io/library/ubuntu") == ImageReference(
+        "docker.io", "library/ubuntu", "latest"
+    )
+    assert ImageReference.parse(
+        f"localhost:5000/pixelator:dev@{DIGEST}"
+    ) == ImageReference("localhost:5000", "pixelator", "dev", DIGEST)
+    assert ImageReference.parse(f"ghcr.io/org/pixelator@{DIGEST}") == ImageReference(
+        "ghcr.io", "org/pixelator", None, DIGEST
+    )
+
+
+class OfflineSession(requests.Session):
+    def head(self, url, **kwargs):
+        raise requests.ConnectionError(f"{url} is not reachable")
+
+
+def test_pin_image_falls_back_to_the_cached_digest(tmp_path):
+    image = "biocontainers/pixelator:0.17.1"
+    remote = LocalRemote(tmp_path / "digests")
+    remote.write_text(
+        f"{digest_key(image)}.json",
+        json.dumps({"image": image, "digest": DIGEST, "resolved": 0}),
+    )
+
+    pinned = pin_image(remote, image, OfflineSession())
+
+    assert pinned.pinned == f"quay.io/biocontainers/pixelator@{DIGEST}"
+    assert pinned.source == "cache"
+
+
+def test_pin_image_without_cache_keeps_the_tag(tmp_path):
+    image = "biocontainers/pixelator:0.17.1"
+
+    pinned = pin_image(LocalRemote(tmp_path / "digests"), image, OfflineSession())
+
+    assert (pinned.pinned, pinned.source) == (image, "unpinned")
+
+
+def pod(node, state, scheduled="2026-01-01T00:00:00Z"):
+    return {
+        "metadata": {"name": "prewarm-1"},
+        "spec": {"nodeName": node},
+        "status": {
+            "conditions": [
+                {
+                    "type": "PodScheduled",
+                    "status": "True",
+                    "lastTransitionTime": scheduled,
+                }
+            ],
+            "containerStatuses": [{"state": state}],
+        },
+    }
+
+
+def test_pull_timing_of_pods():
+    pulled = _pull_timing(
+        pod(
+            "node-1",
+            {"terminated": {"exitCode": 0, "startedAt": "2026-01-01T00:00:42Z"}},
+        )
+    )
+    assert (pulled.node, pulled.status, pulled.pull_seconds) == ("node-1", "pulled", 42)
+
+    pulling = _pull_timing(pod("node-2", {"waiting": {"reason": "ContainerCreating"}}))
+    assert (pulling.status, pulling.pull_seconds) == ("ContainerCreating", None)
+
+    unscheduled = _pull_timing(
+        {"metadata": {"name": "prewarm-2"}, "spec": {}, "status": {}}
+    )
+    assert (unscheduled.node, unscheduled.status) == (None, "unscheduled")
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from wf.cleanup import expected_tasks
+from wf.head import (
+    GiB,
+    MIN_HEAP_BYTES,
+    choose_head,
+    container_limits,
+    count_tasks,
+    jvm_options,
+)
+
+
+@pytest.mark.parametrize(
+    "tasks, size",
+    [
+        (1, "small"),
+        (100, "small"),
+        (101, "medium"),
+        (1000, "medium"),
+        (1001, "large"),
+        (5000, "large"),
+        (5001, "xlarge"),
+        (10**6, "xlarge"),
+    ],
+)
+def test_head_size_thresholds(tasks, size):
+    assert choose_head(tasks).name == size
+
+
+def test_count_tasks(tmp_path):
+    samplesheet = tmp_path / "samplesheet.csv"
+    samplesheet.write_text(
+        "sample,design,panel,fastq_1,fastq_2\n"
+        "S1,pna-2,proxiome-immuno-155,S1_L1_R1.fq.gz,S1_L1_R2.fq.gz\n"
+        "S1,pna-2,proxiome-immuno-155,S1_L2_R1.fq.gz,S1_L2_R2.fq.gz\n"
+        "S2,pna-2,proxiome-immuno-155,S2_R1.fq.gz,S2_R2.fq.gz\n"
+    )
+
+    samples, lanes, tasks = count_tasks(samplesheet, read_chunks=4)
+
+    per_sample = sum(expected_tasks(read_chunks=4).values())
+    # CAT_FASTQ of S1 and the three tasks run once per run
+    assert (samples, lanes, tasks) == (2, 3, 2 * per_sample + 1 + 3)
+    assert tasks > count_tasks(samplesheet)[2]
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_cgroup_v2_limits(tmp_path):
+    write(tmp_path / "memory.max", "4294967296\n")
+    write(tmp_path / "cpu.max", "250000 100000\n")
+
+    assert container_limits(tmp_path) == (4 * GiB, 2)
+
+
+def test_cgroup_v1_limits(tmp_path):
+    write(tmp_path / "memory" / "memory.limit_in_bytes", "8589934592\n")
+    write(tmp_path / "cpu" / "cpu.cfs_quota_us", "300000\n")
+    write(tmp_path / "cpu" / "cpu.cfs_period_us", "100000\n")
+
+    assert container_limits(tmp_path) == (8 * GiB, 3)
+
+
+def test_unlimited_cgroup_uses_the_host(tmp_path):
+    write(tmp_path / "memory.max", "max\n")
+    write(tmp_path / "cpu.max", "max 100000\n")
+
+    memory, cpus = container_limits(tmp_path)
+
+    assert memory == os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    assert cpus == (os.cpu_count() or 1)
+
+
+def test_jvm_heap_is_a_ratio_of_the_container_memory():
+    options = jvm_options(8 * GiB, 4).split()
+
+    # HEAP_RATIO of 8 GiB
+    assert "-Xmx4915M" in options
+    assert "-Xms1228M" in options
+    assert "-XX:ActiveProcessorCount=4" in options
+    assert "-XX:+ExitOnOutOfMemoryError" in options
+
+
+def test_jvm_heap_has_a_minimum():
+    assert f"-Xmx{MIN_HEAP_BYTES // 1024**2}M" in jvm_options(GiB, 1).split()
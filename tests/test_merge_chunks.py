@@ -0,0 +1,170 @@
+import json
+from types import SimpleNamespace
+
+import merge_chunks
+
+
+def fastp_report(reads, bases, q20, q30, passed, low_quality):
+    """preqc report: the fastp JSON, with the fields pixelator reads"""
+    summary = {
+        "total_reads": reads,
+        "total_bases": bases,
+        "q20_bases": q20,
+        "q30_bases": q30,
+        "q20_rate": q20 / bases,
+        "q30_rate": q30 / bases,
+        "read1_mean_length": bases // reads,
+        "gc_content": 0.5,
+    }
+    return {
+        "summary": {
+            "fastp_version": "0.23.4",
+            "sequencing": "single end (132 cycles)",
+            "before_filtering": summary,
+            "after_filtering": summary,
+        },
+        "filtering_result": {
+            "passed_filter_reads": passed,
+            "low_quality_reads": low_quality,
+            "too_many_N_reads": reads - passed - low_quality,
+            "too_short_reads": 0,
+            "too_long_reads": 0,
+        },
+        "read1_before_filtering": {
+            "total_reads": reads,
+            "total_cycles": 132,
+            "quality_curves": {"mean": [32.0, 34.0]},
+        },
+        "command": "fastp -i S1-chunk001.fq.gz",
+    }
+
+
+def cutadapt_report(reads, matches):
+    """demux report: the cutadapt JSON with the antibody names of the panel"""
+    return {
+        "tag": "Cutadapt report",
+        "schema_version": [0, 3],
+        "cutadapt_version": "4.4",
+        "cores": 4,
+        "input": {"path1": "S1-chunk001.processed.fq.gz", "paired": False},
+        "read_counts": {
+            "input": reads,
+            "read1_with_adapter": sum(m for m, _ in matches.values()),
+            "output": sum(m for m, _ in matches.values()),
+        },
+        "adapters_read1": [
+            {
+                "name": name,
+                "total_matches": total,
+                "five_prime_end": {
+                    "error_rate": 0.1,
+                    "error_lengths": [10],
+                    "matches": total,
+                    "trimmed_lengths": [
+                        {"len": length, "expect": 0.5, "counts": [count, 0]}
+                        for length, count in lengths
+                    ],
+                },
+            }
+            for name, (total, lengths) in matches.items()
+        ],
+        "sample_id": "S1-chunk001",
+    }
+
+
+def write(tmp_path, name, report):
+    path = tmp_path / name
+    path.write_text(json.dumps(report))
+    return path
+
+
+def test_merge_fastp_recomputes_rates_from_counts(tmp_path):
+    paths = [
+        write(
+            tmp_path,
+            "S1-chunk001.report.json",
+            fastp_report(100, 13200, 13000, 12000, 90, 6),
+        ),
+        write(
+            tmp_path,
+            "S1-chunk002.report.json",
+            fastp_report(300, 39600, 33600, 30000, 240, 40),
+        ),
+    ]
+    merged = merge_chunks.merge_reports(paths)
+
+    before = merged["summary"]["before_filtering"]
+    assert before["total_reads"] == 400
+    assert before["q20_rate"] == (13000 + 33600) / (13200 + 39600)
+    assert before["q30_rate"] == (12000 + 30000) / (13200 + 39600)
+    assert before["read1_mean_length"] == 132
+
+    # The counts pixelator derives the discarded fraction from
+    filtering = merged["filtering_result"]
+    assert filtering["passed_filter_reads"] == 330
+    assert filtering["low_quality_reads"] == 46
+    assert before["total_reads"] - filtering["passed_filter_reads"] == 70
+
+    assert merged["read1_before_filtering"]["total_cycles"] == 132
+    assert merged["read1_before_filtering"]["quality_curves"]["mean"] == [32.0, 34.0]
+    assert merged["command"] == "fastp -i S1.fq.gz"
+
+
+def test_merge_cutadapt_matches_antibodies_and_lengths(tmp_path):
+    paths = [
+        write(
+            tmp_path,
+            "S1-chunk001.report.json",
+            cutadapt_report(
+                100, {"CD3": (40, [(3, 1), (4, 39)]), "CD4": (50, [(4, 50)])}
+            ),
+        ),
+        write(
+            tmp_path,
+            "S1-chunk002.report.json",
+            # No reads of CD3 in this chunk, so the adapters are not aligned by position
+            cutadapt_report(
+                200, {"CD4": (120, [(2, 5), (4, 115)]), "CD8": (60, [(4, 60)])}
+            ),
+        ),
+    ]
+    merged = merge_chunks.merge_reports(paths)
+
+    assert merged["schema_version"] == [0, 3]
+    assert merged["cores"] == 4
+    assert merged["sample_id"] == "S1"
+    assert merged["read_counts"] == {
+        "input": 300,
+        "read1_with_adapter": 270,
+        "output": 270,
+    }
+
+    adapters = {a["name"]: a for a in merged["adapters_read1"]}
+    assert {name: a["total_matches"] for name, a in adapters.items()} == {
+        "CD3": 40,
+        "CD4": 170,
+        "CD8": 60,
+    }
+    cd4 = adapters["CD4"]["five_prime_end"]
+    assert cd4["error_rate"] == 0.1
+    assert cd4["error_lengths"] == [10]
+    assert cd4["trimmed_lengths"] == [
+        {"len": 2, "expect": 0.5, "counts": [5, 0]},
+        {"len": 4, "expect": 1.0, "counts": [165, 0]},
+    ]
+
+
+def test_main_merges_fastq_and_reports(tmp_path):
+    chunks = tmp_path / "chunks"
+    chunks.mkdir()
+    (chunks / "S1-chunk001.processed.fq.gz").write_bytes(b"a")
+    (chunks / "S1-chunk002.processed.fq.gz").write_bytes(b"b")
+    write(chunks, "S1-chunk001.report.json", cutadapt_report(1, {"CD3": (1, [])}))
+    write(chunks, "S1-chunk002.report.json", cutadapt_report(2, {"CD3": (2, [])}))
+
+    output = tmp_path / "adapterqc"
+    merge_chunks.main(SimpleNamespace(output=output, chunks=sorted(chunks.iterdir())))
+
+    assert (output / "S1.processed.fq.gz").read_bytes() == b"ab"
+    report = json.loads((output / "S1.report.json").read_text())
+    assert report["read_counts"]["input"] == 3
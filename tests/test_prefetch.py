@@ -0,0 +1,83 @@
+import os
+
+from wf.prefetch import fetch, local_name, make_session, prefetch_samplesheet
+from wf.samplesheet import read_samplesheet
+
+MTIME = 1_700_000_000
+
+
+def write_input(path, data):
+    path.write_bytes(data)
+    os.utime(path, (MTIME, MTIME))
+    return path
+
+
+def test_local_copy_keeps_mtime_and_is_skipped_next_time(tmp_path):
+    src = write_input(tmp_path / "S1_R1.fq.gz", b"x" * 1000)
+    dest = tmp_path / "inputs" / local_name(str(src))
+
+    with make_session(1) as session:
+        first = fetch(session, str(src), dest)
+        second = fetch(session, str(src), dest)
+
+    assert dest.read_bytes() == src.read_bytes()
+    assert dest.stat().st_mtime_ns == src.stat().st_mtime_ns
+    assert (first.skipped, first.bytes_downloaded) == (False, 1000)
+    assert (second.skipped, second.bytes_downloaded) == (True, 0)
+
+
+def test_http_download_keeps_last_modified_and_verifies_md5(tmp_path, http_root):
+    root, url, _ = http_root
+    write_input(root / "S1_R1.fq.gz", os.urandom(10_000))
+    dest = tmp_path / "inputs" / "S1_R1.fq.gz"
+
+    with make_session(1) as session:
+        result = fetch(session, f"{url}/S1_R1.fq.gz", dest)
+
+    assert dest.read_bytes() == (root / "S1_R1.fq.gz").read_bytes()
+    assert dest.stat().st_mtime == MTIME
+    assert result.verified == "md5"
+
+
+def test_http_download_resumes_partial_file(tmp_path, http_root):
+    root, url, server = http_root
+    data = os.urandom(10_000)
+    write_input(root / "S1_R1.fq.gz", data)
+    dest = tmp_path / "inputs" / "S1_R1.fq.gz"
+    dest.parent.mkdir()
+    dest.with_name(dest.name + ".part").write_bytes(data[:4000])
+
+    with make_session(1) as session:
+        result = fetch(session, f"{url}/S1_R1.fq.gz", dest)
+
+    assert dest.read_bytes() == data
+    assert (result.resumed, result.bytes_downloaded) == (True, 6000)
+    assert server.requests[-1] == ("/S1_R1.fq.gz", "bytes=4000-")
+
+
+def test_samplesheet_points_at_stable_paths(tmp_path, http_root):
+    root, url, _ = http_root
+    write_input(root / "S1_R1.fq.gz", b"a" * 100)
+    write_input(tmp_path / "S1_R2.fq.gz", b"b" * 100)
+    samplesheet = tmp_path / "samplesheet.csv"
+    samplesheet.write_text(
+        "sample,design,panel,fastq_1,fastq_2\n"
+        f"S1,D21PE,human-sc-immunology-spatial-proteomics,{url}/S1_R1.fq.gz,S1_R2.fq.gz\n"
+    )
+
+    def run(name):
+        out = tmp_path / name / "samplesheet.csv"
+        summary, _ = prefetch_samplesheet(
+            samplesheet, str(samplesheet), None, tmp_path / "inputs", out, max_workers=2
+        )
+        return summary, read_samplesheet(out)[0]
+
+    first_summary, first = run("first")
+    second_summary, second = run("second")
+
+    # Same local paths and mtimes on every run, so -resume hits the cache
+    assert (first.fastq_1, first.fastq_2) == (second.fastq_1, second.fastq_2)
+    assert first.fastq_1.endswith("/S1_R1.fq.gz")
+    assert first.fastq_2.endswith("/S1_R2.fq.gz")
+    assert {os.stat(p).st_mtime for p in (first.fastq_1, first.fastq_2)} == {MTIME}
+    assert (first_summary.files_skipped, second_summary.files_skipped) == (0, 2)
@@ -0,0 +1,72 @@
+import gzip
+
+from wf import preflight
+from wf.prefetch import make_session
+from wf.samplesheet import SamplesheetRow
+
+
+def test_read_head_of_remote_file(http_root):
+    root, url, server = http_root
+    (root / "S1_R1.fq.gz").write_bytes(gzip.compress(b"@r\nACGT\n+\nIIII\n"))
+
+    with make_session(1) as session:
+        head = preflight._read_head(f"{url}/S1_R1.fq.gz", 2, session)
+
+    assert head == preflight.GZIP_MAGIC
+    assert server.requests == [("/S1_R1.fq.gz", "bytes=0-1")]
+
+
+def test_read_head_without_range_support(http_root):
+    root, url, server = http_root
+    server.ranges = False
+    (root / "S1_R1.fastq").write_bytes(b"@r\nACGT\n+\nIIII\n" * 100)
+
+    with make_session(1) as session:
+        assert preflight._read_head(f"{url}/S1_R1.fastq", 2, session) == b"@r"
+
+
+def test_read_head_of_latch_path_uses_signed_url(http_root, monkeypatch):
+    root, url, _ = http_root
+    (root / "S1_R1.fastq").write_bytes(b"@r\nACGT\n+\nIIII\n")
+    monkeypatch.setattr(
+        preflight, "signed_url", lambda path: f"{url}/{path.rsplit('/', 1)[1]}"
+    )
+
+    with make_session(1) as session:
+        head = preflight._read_head("latch:///data/S1_R1.fastq", 2, session)
+
+    assert head == b"@r"
+
+
+def test_read_head_failure_skips_the_check(monkeypatch):
+    def fail(path):
+        raise RuntimeError("no credentials")
+
+    monkeypatch.setattr(preflight, "signed_url", fail)
+
+    with make_session(1) as session:
+        assert preflight._read_head("latch:///data/S1_R1.fq.gz", 2, session) is None
+
+
+def test_validate_files_checks_gzip_magic(tmp_path):
+    gz = tmp_path / "S1_R1.fq.gz"
+    gz.write_bytes(gzip.compress(b"@r\nACGT\n+\nIIII\n"))
+    plain = tmp_path / "S2_R1.fq.gz"
+    plain.write_bytes(b"@r\nACGT\n+\nIIII\n" * 4)
+
+    rows = [
+        SamplesheetRow(line=2, sample="S1", fastq_1=str(gz)),
+        SamplesheetRow(line=3, sample="S2", fastq_1=str(plain)),
+    ]
+    errors = preflight.validate_files(rows)
+
+    assert [(e.line, e.message) for e in errors] == [
+        (3, f"{plain} is not gzip compressed")
+    ]
+
+
+def test_intermediate_codec_without_chunks_warns():
+    assert preflight.check_options(None, "fast") == []
+    assert preflight.check_options(4, "none") == []
+    [warning] = preflight.check_options(1, "none")
+    assert "read_chunks > 1" in warning
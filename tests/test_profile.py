@@ -0,0 +1,102 @@
+import json
+
+from wf.profile import (
+    build_profile,
+    collect_codec_stats,
+    critical_path,
+    parse_trace,
+    render_html,
+)
+
+# Raw trace (`trace.raw = true`): times in epoch ms and ms, sizes in bytes
+TRACE = """\
+task_id\thash\tprocess\ttag\tname\tstatus\tcpus\tsubmit\tstart\tcomplete\trealtime\t%cpu\tpeak_rss\trchar\twchar\tread_bytes\twrite_bytes
+1\tab/000001\tNFCORE_PIXELATOR:PIXELATOR:PIXELATOR_QC\tS1\tPIXELATOR_QC (S1)\tCOMPLETED\t4\t1000\t1500\t5000\t3500\t300.0\t2147483648\t4000\t2000\t1000\t500
+2\tab/000002\tNFCORE_PIXELATOR:PIXELATOR:PIXELATOR_QC\tS2\tPIXELATOR_QC (S2)\tCOMPLETED\t4\t1000\t1200\t3000\t1800\t200.0\t1073741824\t3000\t1000\t0\t300
+3\tab/000003\tNFCORE_PIXELATOR:PIXELATOR:PIXELATOR_DEMUX\tS2\tPIXELATOR_DEMUX (S2)\tCOMPLETED\t2\t3100\t3200\t9000\t5800\t150.0\t536870912\t5000\t5000\t2000\t4000
+4\tab/000004\tNFCORE_PIXELATOR:PIXELATOR:PIXELATOR_DEMUX\tS1\tPIXELATOR_DEMUX (S1)\tFAILED\t2\t5100\t5300\t6000\t700\t-\t-\t-\t-\t-\t-
+"""
+
+
+def test_raw_trace_profile(tmp_path):
+    trace = tmp_path / "trace.txt"
+    trace.write_text(TRACE)
+
+    records = parse_trace(trace)
+
+    first = records[0]
+    assert (first.process, first.sample, first.cpus) == ("PIXELATOR_QC", "S1", 4)
+    assert (first.submit, first.start, first.realtime) == (1000, 1500, 3500)
+    assert first.queue_ms == 500
+    assert first.cpu_efficiency == 0.75
+    assert first.peak_rss == 2 * 1024**3
+    assert (first.rchar, first.wchar, first.read_bytes, first.write_bytes) == (
+        4000,
+        2000,
+        1000,
+        500,
+    )
+    assert records[3].pcpu is None and records[3].read_bytes is None
+
+    # DEMUX of S2 completes last and was submitted after QC of S2 completed
+    assert [r.task_id for r in critical_path(records)] == [2, 3]
+
+    profile = build_profile(records)
+    qc = profile["steps"]["PIXELATOR_QC"]
+    assert (qc["rchar"], qc["wchar"]) == (7000, 3000)
+    assert (qc["read_bytes"], qc["write_bytes"]) == (1000, 800)
+    assert profile["steps"]["PIXELATOR_DEMUX"]["failed"] == 1
+    assert profile["wall_time_ms"] == 8000
+    assert profile["critical_path_ms"] == 8000
+
+
+def test_codec_stats_are_summed_per_stage_and_codec(tmp_path):
+    for n, (codec, records, seconds) in enumerate(
+        [("fast", 100, 1.0), ("fast", 300, 1.0), ("small", 100, 4.0)]
+    ):
+        task_dir = tmp_path / "ab" / f"{n:030x}"
+        task_dir.mkdir(parents=True)
+        (task_dir / f"S1.chunk{n}.codec.json").write_text(
+            json.dumps(
+                {
+                    "stage": "qc",
+                    "codec": codec,
+                    "records": records,
+                    "bytes_in": records * 100,
+                    "bytes_out": records * 10,
+                    "seconds": seconds,
+                }
+            )
+        )
+    # Not inside a task directory
+    (tmp_path / "stray.codec.json").write_text("{}")
+
+    stats = collect_codec_stats(tmp_path)
+
+    fast = stats["qc"]["fast"]
+    assert (fast["tasks"], fast["records"], fast["bytes_out"]) == (2, 400, 4000)
+    assert fast["bytes_per_record"] == 10
+    assert fast["records_per_second"] == 200
+    assert stats["qc"]["small"]["records_per_second"] == 25
+
+
+def test_profile_includes_the_prewarm_pulls():
+    prewarm = {
+        "image": "quay.io/biocontainers/pixelator@sha256:abc",
+        "nodes_requested": 1,
+        "elapsed_seconds": 50.0,
+        "pulls": [
+            {
+                "pod": "prewarm-1",
+                "node": "node-1",
+                "pull_seconds": 42.0,
+                "status": "pulled",
+            }
+        ],
+        "error": None,
+    }
+
+    profile = build_profile([], prewarm)
+
+    assert profile["container_prewarm"]["pulls"][0]["pull_seconds"] == 42.0
+    assert "<td>node-1</td><td>pulled</td><td>42.0 s</td>" in render_html(profile)
@@ -0,0 +1,174 @@
+import json
+
+from wf.publish import MANIFEST, Publisher
+from wf.remote import LocalRemote
+
+
+def publish(tmp_path, remote, **kwargs):
+    publisher = Publisher(
+        tmp_path / "publish", remote, tmp_path / "work", interval=3600, **kwargs
+    )
+    with publisher:
+        pass
+    publisher.write_manifest()
+    return publisher
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_uploads_results_and_skips_unchanged_files(tmp_path):
+    write(tmp_path / "publish" / "pixelator" / "report" / "S1.qc-report.html", "S1")
+    write(tmp_path / "publish" / "pixelator" / "report" / "S2.qc-report.html", "S2")
+    remote = LocalRemote(tmp_path / "outdir")
+
+    first = publish(tmp_path, remote)
+
+    assert remote.read_text("pixelator/report/S1.qc-report.html") == "S1"
+    assert (first.report.files_uploaded, first.report.failed) == (2, 0)
+    manifest = json.loads(remote.read_text(MANIFEST))
+    assert [f["path"] for f in manifest["files"]] == [
+        "pixelator/report/S1.qc-report.html",
+        "pixelator/report/S2.qc-report.html",
+    ]
+
+    write(tmp_path / "publish" / "pixelator" / "report" / "S2.qc-report.html", "S2 v2")
+    second = publish(tmp_path, remote)
+
+    assert remote.read_text("pixelator/report/S2.qc-report.html") == "S2 v2"
+    assert (second.report.files_uploaded, second.report.files_skipped) == (1, 1)
+
+
+class FlakyRemote(LocalRemote):
+    """Fails the first `failures` uploads of every file"""
+
+    def __init__(self, root, failures):
+        super().__init__(root)
+        self.failures = failures
+        self.attempts = {}
+
+    def upload(self, src, rel):
+        self.attempts[rel] = self.attempts.get(rel, 0) + 1
+        if self.attempts[rel] <= self.failures:
+            raise OSError(f"upload of {rel} failed")
+        super().upload(src, rel)
+
+
+def test_failed_upload_is_retried_at_stop(tmp_path):
+    write(tmp_path / "publish" / "pixelator" / "S1.report.json", "{}")
+    remote = FlakyRemote(tmp_path / "outdir", failures=1)
+
+    publisher = publish(tmp_path, remote)
+
+    assert publisher.report.failed == 0
+    assert remote.read_text("pixelator/S1.report.json") == "{}"
+
+
+def test_failed_uploads_are_counted(tmp_path):
+    write(tmp_path / "publish" / "pixelator" / "S1.report.json", "{}")
+    write(tmp_path / "publish" / "pixelator" / "S2.report.json", "{}")
+    remote = FlakyRemote(tmp_path / "outdir", failures=2)
+
+    publisher = publish(tmp_path, remote)
+
+    assert publisher.report.failed == 2
+    assert "2 failed" in publisher.report.summary()
+    assert [f["path"] for f in json.loads(remote.read_text(MANIFEST))["files"]] == []
+
+
+def test_run_files_of_a_batch_are_published_below_its_prefix(tmp_path):
+    write(tmp_path / "publish" / "pixelator" / "report" / "S1.qc-report.html", "S1")
+    write(tmp_path / "publish" / "pixelator" / "report_index.json", "{}")
+    write(tmp_path / "publish" / "pipeline_info" / "software_versions.yml", "v")
+    remote = LocalRemote(tmp_path / "outdir")
+
+    publish(tmp_path, remote, prefix="pipeline_info/sample_batches/batch_1")
+
+    assert remote.exists("pixelator/report/S1.qc-report.html")
+    assert not remote.exists("pixelator/report_index.json")
+    assert remote.exists(
+        "pipeline_info/sample_batches/batch_1/pixelator/report_index.json"
+    )
+    assert remote.exists(
+        "pipeline_info/sample_batches/batch_1/pipeline_info/software_versions.yml"
+    )
+    assert remote.exists(f"pipeline_info/sample_batches/batch_1/{MANIFEST}")
+    assert not remote.exists(MANIFEST)
+
+
+def hollow_file(path, size):
+    # What the resume cache restores for a file released by the cleaner
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.truncate(size)
+
+
+def test_hollow_file_missing_from_outdir_fails(tmp_path):
+    hollow_file(tmp_path / "publish" / "pixelator" / "S1.demux.fq.gz", 2 * 1024**2)
+    # A resumed run with a new outdir: no manifest and no uploads of the first run
+    remote = LocalRemote(tmp_path / "new_outdir")
+
+    publisher = publish(tmp_path, remote)
+
+    assert publisher.report.failed == 1
+    assert not remote.exists("pixelator/S1.demux.fq.gz")
+
+
+def test_hollow_file_keeps_the_upload_of_the_previous_run(tmp_path):
+    size = 2 * 1024**2
+    remote = LocalRemote(tmp_path / "outdir")
+    write(tmp_path / "uploaded", "x" * size)
+    remote.upload(tmp_path / "uploaded", "pixelator/S1.demux.fq.gz")
+    previous = {"path": "pixelator/S1.demux.fq.gz", "size": size, "sha256": "abc"}
+    remote.write_text(MANIFEST, json.dumps({"updated": 0, "files": [previous]}))
+    hollow_file(tmp_path / "publish" / "pixelator" / "S1.demux.fq.gz", size)
+
+    publisher = publish(tmp_path, remote)
+
+    assert publisher.report.failed == 0
+    assert publisher.report.files_skipped == 1
+    assert json.loads(remote.read_text(MANIFEST))["files"] == [
+        {**previous, "step": None}
+    ]
+
+
+class DeletingRemote(LocalRemote):
+    """Removes `victim` from the publish directory during the first upload"""
+
+    def __init__(self, root, victim):
+        super().__init__(root)
+        self.victim = victim
+
+    def upload(self, src, rel):
+        if self.victim.exists():
+            self.victim.unlink()
+        super().upload(src, rel)
+
+
+def test_files_removed_between_scan_and_stop_are_skipped(tmp_path):
+    kept = tmp_path / "publish" / "pipeline_info" / "execution_trace.txt"
+    removed = tmp_path / "publish" / "pixelator" / "S1.tmp.json"
+    write(kept, "trace")
+    write(removed, "{}")
+    write(tmp_path / "publish" / "multiqc_report.html", "<html>")
+    remote = DeletingRemote(tmp_path / "outdir", removed)
+    # One worker: the first upload removes a file that is already queued
+    publisher = Publisher(
+        tmp_path / "publish", remote, tmp_path / "work", max_workers=1, interval=3600
+    )
+    publisher.start()
+    publisher.scan()
+    publisher.scan()
+
+    publisher.stop()
+    kept.unlink()
+    publisher.write_manifest()
+
+    assert not remote.exists("pixelator/S1.tmp.json")
+    assert publisher.report.failed == 0
+    assert [f["path"] for f in json.loads(remote.read_text(MANIFEST))["files"]] == [
+        "multiqc_report.html",
+        "pipeline_info/execution_trace.txt",
+    ]
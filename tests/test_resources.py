@@ -0,0 +1,103 @@
+from wf.profile import TraceRecord
+from wf.remote import LocalRemote
+from wf.resources import (
+    Observation,
+    ResourceHistory,
+    ResourceModel,
+    collect_observations,
+    fit,
+    predict,
+)
+
+
+def observation(cpus_used, cpus_allocated=None, peak_rss=1000):
+    return Observation(
+        process="PIXELATOR_DEMUX",
+        input_bytes=100,
+        peak_rss=peak_rss,
+        cpus_used=cpus_used,
+        recorded=0,
+        cpus_allocated=cpus_allocated,
+    )
+
+
+def test_saturated_tasks_keep_their_allocation():
+    models = fit([observation(3.6, 4), observation(3.9, 4), observation(3.5, 4)])
+
+    assert models["PIXELATOR_DEMUX"].cpus == 4
+
+
+def test_underused_allocation_is_reduced():
+    models = fit([observation(1.2, 8), observation(1.6, 8), observation(1.4, 8)])
+
+    assert models["PIXELATOR_DEMUX"].cpus == 2
+
+
+def test_history_without_allocation():
+    models = fit([observation(1.2), observation(2.5), observation(1.4)])
+
+    assert models["PIXELATOR_DEMUX"].cpus == 3
+
+
+def trace_record(process, sample="S1"):
+    return TraceRecord(
+        task_id=1,
+        name=f"{process} ({sample})",
+        process=process,
+        sample=sample,
+        status="COMPLETED",
+        cpus=2,
+        submit=0,
+        start=0,
+        complete=1000,
+        realtime=1000,
+        pcpu=150.0,
+        peak_rss=1000,
+        rchar=None,
+        wchar=None,
+    )
+
+
+def test_chunk_tasks_are_recorded_and_predicted_per_chunk():
+    records = [trace_record("PIXELATOR_QC"), trace_record("PIXELATOR_COLLAPSE")]
+
+    observations = collect_observations(records, {"S1": 4000}, read_chunks=4)
+
+    assert {o.process: o.input_bytes for o in observations} == {
+        "PIXELATOR_QC": 1000,
+        "PIXELATOR_COLLAPSE": 4000,
+    }
+
+    model = ResourceModel(slope=1.0, intercept=0, max_residual=0, cpus=None, n=3)
+    predictions = predict(
+        {"PIXELATOR_QC": model, "PIXELATOR_COLLAPSE": model},
+        {"S1": 4000},
+        read_chunks=4,
+        headroom=1,
+        min_bytes=0,
+    )
+    assert predictions["PIXELATOR_QC"]["S1"]["memory"] == 1000
+    assert predictions["PIXELATOR_COLLAPSE"]["S1"]["memory"] == 4000
+
+
+def test_concurrent_batches_keep_each_others_observations(tmp_path):
+    remote = LocalRemote(tmp_path / "history")
+    batch_1 = ResourceHistory(remote)
+    batch_2 = ResourceHistory(remote)
+
+    # Both batches finish together, neither rewrites what the other recorded
+    batch_1.record([observation(1.0, peak_rss=100)])
+    batch_2.record([observation(1.0, peak_rss=200)])
+
+    assert sorted(o.peak_rss for o in ResourceHistory(remote).load()) == [100, 200]
+
+
+def test_history_keeps_the_most_recent_observations(tmp_path):
+    remote = LocalRemote(tmp_path / "history")
+    history = ResourceHistory(remote, max_per_process=2)
+
+    for rss in (100, 200, 300):
+        history.record([observation(1.0, peak_rss=rss)])
+
+    assert [o.peak_rss for o in history.load()] == [200, 300]
+    assert len(remote.listdir("runs")) == 2
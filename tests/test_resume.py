@@ -0,0 +1,14 @@
+from wf.resume import cache_key
+
+
+def test_cache_key_ignores_outdir_unless_given(tmp_path):
+    samplesheet = tmp_path / "samplesheet.csv"
+    samplesheet.write_text("sample,design,panel,fastq_1\n")
+    flags = ["--input", str(samplesheet), "--outdir", "/nf-workdir/publish"]
+
+    assert cache_key(samplesheet, flags) == cache_key(
+        samplesheet, [*flags[:2], "--outdir", "latch:///other"]
+    )
+    assert cache_key(samplesheet, flags, outdir="latch:///a") != cache_key(
+        samplesheet, flags, outdir="latch:///b"
+    )
@@ -0,0 +1,54 @@
+import gzip
+from types import SimpleNamespace
+
+import split_fastq
+
+
+def records(n):
+    return b"".join(b"@r%d\nACGT\n+\nIIII\n" % i for i in range(n))
+
+
+def split(tmp_path, n_records, chunks):
+    reads = tmp_path / "S1.merged.fq.gz"
+    reads.write_bytes(gzip.compress(records(n_records)))
+    out = tmp_path / "chunks"
+    split_fastq.main(
+        SimpleNamespace(
+            reads=reads,
+            prefix="S1",
+            chunks=chunks,
+            output_dir=out,
+            codec="fast",
+            stats=None,
+        )
+    )
+    return sorted(out.iterdir())
+
+
+def test_split_round_robin(tmp_path):
+    paths = split(tmp_path, 7, 3)
+
+    assert [p.name for p in paths] == [
+        "S1-chunk001.merged.fq.gz",
+        "S1-chunk002.merged.fq.gz",
+        "S1-chunk003.merged.fq.gz",
+    ]
+    assert [gzip.decompress(p.read_bytes()).count(b"\n") // 4 for p in paths] == [
+        3,
+        2,
+        2,
+    ]
+
+
+def test_split_fewer_records_than_chunks(tmp_path):
+    paths = split(tmp_path, 1, 3)
+
+    assert [p.name for p in paths] == ["S1-chunk001.merged.fq.gz"]
+    assert gzip.decompress(paths[0].read_bytes()) == records(1)
+
+
+def test_split_empty_input(tmp_path):
+    paths = split(tmp_path, 0, 3)
+
+    assert [p.name for p in paths] == ["S1-chunk001.merged.fq.gz"]
+    assert gzip.decompress(paths[0].read_bytes()) == b""
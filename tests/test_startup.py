@@ -0,0 +1,135 @@
+import copy
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+
+from wf import startup
+from wf.startup import StartupTiming
+
+ROOT = Path(__file__).parent.parent
+
+# Loaded by path: importing the `latch_metadata` package builds the Latch metadata
+_module = importlib.util.spec_from_file_location(
+    "parameter_spec", ROOT / "latch_metadata" / "spec.py"
+)
+spec = importlib.util.module_from_spec(_module)
+_module.loader.exec_module(spec)
+
+SCHEMA = {
+    "definitions": {
+        "input_output_options": {
+            "title": "Input/output options",
+            "required": ["input"],
+            "properties": {
+                "input": {"type": "string", "format": "file-path"},
+                "outdir": {"type": "string", "format": "directory-path"},
+                "analysis_sweep": {"type": "string"},
+            },
+        },
+        "generic_options": {
+            "title": "Generic options",
+            "properties": {
+                "help": {"type": "boolean", "hidden": True},
+                "read_chunks": {"type": "integer", "default": 1},
+            },
+        },
+    },
+    "allOf": [
+        {"$ref": "#/definitions/input_output_options"},
+        {"$ref": "#/definitions/generic_options"},
+    ],
+}
+
+
+def test_task_startup_timing(tmp_path):
+    startup.imported()
+    timing = startup.task_started()
+
+    assert timing.import_seconds >= 0
+    if timing.total_seconds is not None:
+        assert timing.total_seconds >= timing.before_import_seconds
+
+    timing.write(tmp_path / "startup.json")
+    assert set(json.loads((tmp_path / "startup.json").read_text())) == {
+        "before_import_seconds",
+        "import_seconds",
+        "total_seconds",
+    }
+
+
+def test_startup_summary():
+    timing = StartupTiming(
+        before_import_seconds=0.5, import_seconds=None, total_seconds=1.25
+    )
+
+    assert timing.summary() == (
+        "Task startup 1.25s: 0.50s before the entrypoint import, - importing it"
+    )
+
+
+def test_compile_spec():
+    params = spec.compile_spec(SCHEMA)
+
+    # Schema order without hidden and excluded parameters
+    assert [p.name for p in params] == ["input", "outdir", "read_chunks"]
+    assert params[0].required and not params[1].required
+    assert [p.section for p in params] == [
+        "Input/output options",
+        None,
+        "Generic options",
+    ]
+    assert params[2].default == 1
+
+
+@pytest.fixture
+def schema(tmp_path, monkeypatch):
+    """The spec of SCHEMA, cached in a temporary directory"""
+    path = tmp_path / "nextflow_schema.json"
+    path.write_text(json.dumps(SCHEMA))
+    spec.write_spec(path, tmp_path / "parameter_spec.json")
+    monkeypatch.setattr(spec, "SCHEMA", path)
+    monkeypatch.setattr(spec, "SPEC", tmp_path / "parameter_spec.json")
+    spec.load_spec.cache_clear()
+    yield path
+    spec.load_spec.cache_clear()
+
+
+def test_stale_spec_is_compiled_from_the_schema(schema):
+    assert spec.parameter_names() == ("input", "outdir", "read_chunks")
+
+    changed = copy.deepcopy(SCHEMA)
+    changed["definitions"]["generic_options"]["properties"]["read_chunks"][
+        "default"
+    ] = 4
+    schema.write_text(json.dumps(changed))
+    spec.load_spec.cache_clear()
+
+    assert spec.load_spec()[-1].default == 4
+
+
+def test_signature_mismatch(schema):
+    def run(input, outdir, read_chunks, pinned_container):
+        pass
+
+    spec.check_signature(run, extra=["pinned_container"])
+    with pytest.raises(
+        spec.SpecMismatch, match=r"not in nextflow_schema.json \['pinned_container'\]"
+    ):
+        spec.check_signature(run)
+
+    def missing(input, outdir):
+        pass
+
+    with pytest.raises(
+        spec.SpecMismatch, match=r"missing from the signature \['read_chunks'\]"
+    ):
+        spec.check_signature(missing)
+
+
+def test_spec_matches_the_schema_and_the_entrypoint():
+    cached = json.loads(spec.SPEC.read_text())
+
+    assert cached["schema_sha256"] == spec.schema_sha()
+    assert spec.check_entrypoint() == []
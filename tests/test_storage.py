@@ -0,0 +1,94 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from wf.storage import ExpansionFactors, estimate_storage, provision_storage
+
+
+def samplesheet(tmp_path, lanes):
+    lines = ["sample,design,panel,fastq_1,fastq_2"]
+    for i, (sample, size) in enumerate(lanes):
+        fq = tmp_path / f"{sample}_L{i}_R1.fq.gz"
+        fq.write_bytes(b"x" * size)
+        lines.append(f"{sample},D21PE,human-sc-immunology-spatial-proteomics,{fq},")
+    path = tmp_path / "samplesheet.csv"
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def test_estimate_with_calibrated_factors(tmp_path, monkeypatch):
+    path = samplesheet(tmp_path, [("S1", 1000), ("S1", 1000), ("S2", 500)])
+    factors = tmp_path / "factors.json"
+    ExpansionFactors(amplicon=2.0, qc=0.5, min_gib=1).to_json(factors)
+
+    from_json = estimate_storage(
+        path, str(path), None, ExpansionFactors.from_json(factors)
+    )
+    monkeypatch.setenv("PIXELATOR_STORAGE_FACTORS", str(factors))
+    from_env = estimate_storage(path, str(path), None)
+
+    for estimate in (from_json, from_env):
+        assert estimate.input_bytes == 2500
+        assert estimate.stage_bytes["cat_fastq"] == 2000
+        assert estimate.stage_bytes["amplicon"] == 5000
+        assert estimate.stage_bytes["qc"] == 1250
+        assert estimate.unknown_inputs == 0
+        assert estimate.storage_gib == 10
+
+
+def test_unknown_factors_are_rejected(tmp_path):
+    factors = tmp_path / "factors.json"
+    factors.write_text(json.dumps({"amplicon": 1.0, "typo": 2.0}))
+
+    with pytest.raises(ValueError, match="typo"):
+        ExpansionFactors.from_json(factors)
+
+
+class _Dispatcher(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.path, self.headers["Authorization"], body))
+        status, response = self.server.response
+        data = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def dispatcher():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Dispatcher)
+    server.requests = []
+    server.response = (200, {"name": "pvc-1"})
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_provision_storage(dispatcher):
+    url, server = dispatcher
+
+    assert provision_storage("token", 120, dispatcher_url=url) == "pvc-1"
+    assert server.requests == [
+        ("/provision-storage", "Latch-Execution-Token token", {"storage_gib": 120})
+    ]
+
+
+def test_provision_storage_error(dispatcher):
+    url, server = dispatcher
+    server.response = (503, {"error": "no capacity"})
+
+    with pytest.raises(requests.HTTPError):
+        provision_storage("token", 120, dispatcher_url=url)
@@ -0,0 +1,87 @@
+import json
+
+from wf.remote import LocalRemote
+from wf.streaming import LogStreamer
+
+TRACE_HEADER = "task_id\thash\tprocess\ttag\tname\tstatus\n"
+
+
+def parts(remote, name):
+    return "".join(
+        remote.read_text(f"{name}.parts/{part}")
+        for part in remote.listdir(f"{name}.parts")
+    )
+
+
+def test_flush_uploads_appended_bytes_and_stop_one_copy(tmp_path):
+    log = tmp_path / ".nextflow.log"
+    trace = tmp_path / "execution_trace.txt"
+    remote = LocalRemote(tmp_path / "live")
+    streamer = LogStreamer(remote, log, trace=trace, samples=["S1"], interval=3600)
+    streamer.start()
+
+    log.write_text("Submitted process > PIXELATOR_QC (S1)\n")
+    trace.write_text(TRACE_HEADER)
+    streamer.flush()
+    with open(log, "a") as f:
+        f.write("Submitted process > PIXELATOR_DEMUX (S1)\n")
+    with open(trace, "a") as f:
+        f.write("1\tab/cdef\tPIXELATOR_QC\tS1\tPIXELATOR_QC (S1)\tCOMPLETED\n")
+    streamer.flush()
+
+    assert remote.listdir("nextflow.log.parts") == ["000001", "000002"]
+    assert parts(remote, "nextflow.log") == log.read_text()
+    assert parts(remote, "execution_trace.txt") == trace.read_text()
+    progress = json.loads(remote.read_text("progress.json"))["samples"]["S1"]
+    assert progress["completed"] == ["PIXELATOR_QC"]
+    assert progress["running"] == ["PIXELATOR_DEMUX"]
+
+    streamer.stop()
+
+    assert remote.read_text("nextflow.log") == log.read_text()
+    assert remote.read_text("execution_trace.txt") == trace.read_text()
+    assert sorted(p.name for p in remote.root.iterdir()) == [
+        "execution_trace.txt",
+        "nextflow.log",
+        "progress.json",
+    ]
+
+
+class RecordingRemote(LocalRemote):
+    def __init__(self, root):
+        super().__init__(root)
+        self.sent = 0
+
+    def upload(self, src, rel):
+        self.sent += src.stat().st_size
+        super().upload(src, rel)
+
+
+def test_bytes_sent_per_pass_are_bounded_by_the_growth(tmp_path):
+    log = tmp_path / ".nextflow.log"
+    remote = RecordingRemote(tmp_path / "live")
+    streamer = LogStreamer(remote, log, interval=3600)
+
+    log.write_text("x" * 100_000 + "\n")
+    streamer.flush()
+    for _ in range(5):
+        remote.sent = 0
+        with open(log, "a") as f:
+            f.write("y" * 999 + "\n")
+        streamer.flush()
+        assert remote.sent == 1000
+
+
+class FailingRemote(LocalRemote):
+    def upload(self, src, rel):
+        raise OSError("upload failed")
+
+
+def test_stop_reports_upload_errors(tmp_path, capsys):
+    log = tmp_path / ".nextflow.log"
+    log.write_text("Submitted process > PIXELATOR_QC (S1)\n")
+
+    with LogStreamer(FailingRemote(tmp_path / "live"), log, interval=3600):
+        pass
+
+    assert "Failed to stream logs: upload failed" in capsys.readouterr().out
@@ -0,0 +1,126 @@
+import argparse
+import csv
+import json
+import re
+from dataclasses import fields
+from pathlib import Path
+
+import pytest
+
+import sweep_summary
+from wf.sweep import AnalysisParameterSet, write_sweep
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.mark.parametrize(
+    "names, error",
+    [
+        ([], "at least one"),
+        (["perm 100"], "may only contain"),
+        (["a/b"], "may only contain"),
+        (["perm-100", "perm-100"], "duplicate"),
+    ],
+)
+def test_invalid_parameter_set_names(tmp_path, names, error):
+    with pytest.raises(ValueError, match=error):
+        write_sweep([AnalysisParameterSet(name=n) for n in names], tmp_path / "s.json")
+
+
+def test_unset_fields_fall_back_to_the_pipeline_parameters(tmp_path):
+    path = tmp_path / "sweep.json"
+
+    write_sweep(
+        [
+            AnalysisParameterSet(name="default"),
+            AnalysisParameterSet(
+                name="perm_100.v2",
+                polarization_n_permutations=100,
+                compute_colocalization=False,
+            ),
+        ],
+        path,
+    )
+
+    # Options missing from a set take the value of params in the pipeline
+    assert json.loads(path.read_text()) == [
+        {"name": "default"},
+        {
+            "name": "perm_100.v2",
+            "compute_colocalization": False,
+            "polarization_n_permutations": 100,
+        },
+    ]
+
+
+def test_parameter_set_fields_are_accepted_by_the_pipeline():
+    text = (ROOT / "workflows" / "pixelator.nf").read_text()
+    allowed = re.search(r"def allowed = \[(.*?)\]", text, re.S).group(1)
+
+    assert set(re.findall(r"'(\w+)'", allowed)) == {
+        f.name for f in fields(AnalysisParameterSet) if f.name != "name"
+    }
+
+
+def report(name, sample, stage, parameters, values):
+    return json.dumps(
+        {
+            "set": name,
+            "sample": sample,
+            "stage": stage,
+            "parameters": parameters,
+            "report": values,
+        }
+    )
+
+
+def test_sweep_summary(tmp_path):
+    lines = [
+        report(
+            "perm_100",
+            "S1",
+            "analysis",
+            {"name": "perm_100", "polarization_n_permutations": 100},
+            {"sample_id": "S1", "polarization": {"mean": 0.4}, "ok": True},
+        ),
+        report(
+            "default",
+            "S1",
+            "layout",
+            {"name": "default"},
+            {"components": 12, "markers": [{"count": 3}]},
+        ),
+        report(
+            "default",
+            "S1",
+            "analysis",
+            {"name": "default"},
+            {"polarization": {"mean": 0.5}},
+        ),
+    ]
+    reports = tmp_path / "sweep_reports.jsonl"
+    reports.write_text("\n".join(lines) + "\n\n")
+    prefix = tmp_path / "sweep_summary"
+
+    sweep_summary.main(argparse.Namespace(reports=reports, output_prefix=str(prefix)))
+
+    with open(f"{prefix}.tsv", newline="") as f:
+        rows = list(csv.reader(f, delimiter="\t"))
+    assert rows == [
+        [
+            "set",
+            "sample",
+            "name",
+            "polarization_n_permutations",
+            "analysis.polarization.mean",
+            "layout.components",
+            "layout.markers.0.count",
+        ],
+        ["default", "S1", "default", "", "0.5", "12", "3"],
+        ["perm_100", "S1", "perm_100", "100", "0.4", "", ""],
+    ]
+
+    summary = json.loads(Path(f"{prefix}.json").read_text())
+    assert summary["samples"] == ["S1"]
+    assert list(summary["parameter_sets"]) == ["default", "perm_100"]
+    assert summary["metrics"]["perm_100:S1"] == {"analysis.polarization.mean": 0.4}
@@ -0,0 +1,106 @@
+import os
+
+import pytest
+
+from wf import sync
+from wf.sync import DEFAULT_IGNORE, MANIFEST_NAME, WorkspaceSync, is_ignored
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def touch(path, mtime_ns):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_unchanged_files_are_skipped(tmp_path, monkeypatch):
+    write(tmp_path / "src" / "main.nf", "workflow {}")
+    write(tmp_path / "src" / "bin" / "tool.py", "print()")
+    sync_ = WorkspaceSync(tmp_path / "src", tmp_path / "dst")
+
+    first = sync_.run()
+    assert (first.files_total, first.files_copied) == (2, 2)
+    assert (tmp_path / "dst" / "bin" / "tool.py").read_text() == "print()"
+
+    # Size and mtime match the manifest: trusted without reading the file
+    def no_digest(path, chunk_size=1 << 20):
+        raise AssertionError(f"{path} was hashed")
+
+    monkeypatch.setattr(sync, "file_digest", no_digest)
+    second = sync_.run()
+
+    assert (second.files_total, second.files_copied) == (2, 0)
+    assert second.bytes_skipped == len("workflow {}") + len("print()")
+
+
+def test_changed_files_are_copied(tmp_path):
+    src = tmp_path / "src"
+    write(src / "main.nf", "workflow {}")
+    write(src / "nextflow.config", "params {}")
+    write(src / "README.md", "readme")
+    sync_ = WorkspaceSync(src, tmp_path / "dst")
+    sync_.run()
+
+    mtime = (src / "nextflow.config").stat().st_mtime_ns
+    # Different size
+    write(src / "main.nf", "workflow { main: }")
+    # Same size, different content and mtime
+    (src / "nextflow.config").write_text("param {x}")
+    touch(src / "nextflow.config", mtime + 10**9)
+    # Same content, only the mtime changed: hashed but not copied
+    touch(src / "README.md", mtime + 10**9)
+
+    report = sync_.run()
+
+    assert report.files_copied == 2
+    assert (tmp_path / "dst" / "main.nf").read_text() == "workflow { main: }"
+    assert (tmp_path / "dst" / "nextflow.config").read_text() == "param {x}"
+
+
+@pytest.mark.parametrize(
+    "rel, ignored",
+    [
+        ("work", True),
+        (".nextflow.log.1", True),
+        ("bin/__pycache__", True),
+        ("wf/__pycache__", True),
+        ("wf/sync.pyc", True),
+        (MANIFEST_NAME, True),
+        ("wf/work", False),
+        ("wf/sync.py", False),
+        ("results.md", False),
+    ],
+)
+def test_ignore_globs(rel, ignored):
+    assert is_ignored(rel, DEFAULT_IGNORE) == ignored
+
+
+def test_ignored_paths_are_not_synced(tmp_path):
+    src = tmp_path / "src"
+    write(src / "main.nf", "workflow {}")
+    write(src / "work" / "ab" / "cdef" / "out.txt", "x")
+    write(src / "wf" / "__pycache__" / "sync.cpython-311.pyc", "x")
+    write(src / ".nextflow.log", "x")
+
+    report = WorkspaceSync(src, tmp_path / "dst").run()
+
+    assert report.files_total == 1
+    assert sorted(p.name for p in (tmp_path / "dst").rglob("*")) == [
+        MANIFEST_NAME,
+        "main.nf",
+    ]
+
+
+def test_worker_errors_reach_the_caller(tmp_path, monkeypatch):
+    write(tmp_path / "src" / "main.nf", "workflow {}")
+
+    def copy2(src, dst):
+        raise OSError("volume unavailable")
+
+    monkeypatch.setattr(sync.shutil, "copy2", copy2)
+
+    with pytest.raises(OSError, match="volume unavailable"):
+        WorkspaceSync(tmp_path / "src", tmp_path / "dst").run()
+    assert not (tmp_path / "dst" / MANIFEST_NAME).exists()
@@ -0,0 +1,177 @@
+"""
+Split a samplesheet into independent per-sample batches.
+
+All lanes of a sample stay in the same batch so CAT_FASTQ and the panel
+consistency check still apply. Paths are resolved to absolute locations so a
+batch samplesheet can be stored anywhere.
+
+The batches publish their per-sample results to the same `outdir`. The files
+every run writes (pipeline info, publish manifest, report index, metadata)
+are published below `BATCH_ROOT/<batch>` and combined once all batches are
+done.
+"""
+
+import html
+import math
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from .samplesheet import (
+    get_data_basedir,
+    group_by_sample,
+    read_samplesheet,
+    resolve_rows,
+    write_samplesheet,
+)
+
+BATCH_ROOT = "pipeline_info/sample_batches"
+# Name of the report of a sample in `outdir/pixelator/report`
+REPORT_SUFFIX = ".qc-report.html"
+
+
+def batch_prefix(name: str) -> str:
+    return f"{BATCH_ROOT}/{name}"
+
+
+@dataclass
+class SampleBatch:
+    name: str
+    samplesheet: Path
+    samples: List[str]
+
+
+def split_samplesheet(
+    samplesheet: Path,
+    samplesheet_uri: str,
+    input_basedir: Optional[str],
+    samples_per_batch: int,
+    out_dir: Path,
+) -> List[SampleBatch]:
+    if samples_per_batch < 1:
+        raise ValueError(
+            f"samples_per_batch must be at least 1, got {samples_per_batch}"
+        )
+
+    rows = resolve_rows(
+        read_samplesheet(samplesheet),
+        get_data_basedir(samplesheet_uri, input_basedir),
+    )
+    groups = list(group_by_sample(rows).items())
+
+    n_batches = math.ceil(len(groups) / samples_per_batch)
+    width = len(str(n_batches))
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    batches = []
+    for i in range(n_batches):
+        chunk = groups[i * samples_per_batch : (i + 1) * samples_per_batch]
+        name = f"batch_{i + 1:0{width}d}"
+        path = out_dir / f"{name}{Path(samplesheet).suffix or '.csv'}"
+
+        write_samplesheet((row for _, lanes in chunk for row in lanes), path)
+        batches.append(
+            SampleBatch(name=name, samplesheet=path, samples=[s for s, _ in chunk])
+        )
+
+    return batches
+
+
+def summarize_batches(
+    batches: Sequence[SampleBatch], reports: Sequence[str], skip_report: bool
+) -> dict:
+    """Match the per-sample reports found in `outdir/pixelator/report` to the batches."""
+    summary = {"batches": [], "missing_reports": []}
+    for batch in batches:
+        entry = {**asdict(batch), "samplesheet": batch.samplesheet.name, "reports": {}}
+        for sample in batch.samples:
+            report = f"{sample}{REPORT_SUFFIX}"
+            if report not in reports:
+                report = None
+            entry["reports"][sample] = report
+            if report is None and not skip_report:
+                summary["missing_reports"].append(sample)
+        summary["batches"].append(entry)
+    return summary
+
+
+def merge_report_indexes(indexes: Sequence[dict]) -> dict:
+    """Combine the `report_index.json` of the batches, same layout as one run"""
+    stages: List[str] = []
+    reports: List[dict] = []
+    for index in indexes:
+        stages += [s for s in index.get("stages", []) if s not in stages]
+        reports += index.get("reports", [])
+    reports.sort(key=lambda r: (r["sample"], r.get("sweep") or ""))
+    return {
+        "updated": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "stages": stages,
+        "reports": reports,
+    }
+
+
+def render_report_index(index: dict) -> str:
+    """HTML table of a report index, as written by GENERATE_REPORTS"""
+    entries = index["reports"]
+    metric_names = list(
+        dict.fromkeys(name for entry in entries for name in entry.get("metrics", {}))
+    )
+
+    def esc(value) -> str:
+        return html.escape(str(value), quote=False)
+
+    header = "".join(
+        f"<th>{esc(h)}</th>"
+        for h in ["sample", "set", "report", "completed", *metric_names]
+    )
+    rows = []
+    for entry in entries:
+        links = " ".join(
+            f'<a href="{esc(r)}">{esc(r.split("/")[-1])}</a>' for r in entry["reports"]
+        )
+        cells = [
+            esc(entry["sample"]),
+            esc(entry.get("sweep") or ""),
+            links,
+            esc(entry.get("completed", "")),
+        ]
+        metrics = entry.get("metrics", {})
+        cells += [esc(metrics[n]) if n in metrics else "" for n in metric_names]
+        rows.append("<tr>" + "".join(f"<td>{c}</td>" for c in cells) + "</tr>")
+
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>nf-core/pixelator reports</title>
+<style>table{{border-collapse:collapse}}td,th{{border:1px solid #ccc;padding:2px 6px}}</style></head>
+<body><h1>nf-core/pixelator reports</h1><p>{len(entries)} report(s), updated {esc(index["updated"])}</p>
+<table><thead><tr>{header}</tr></thead><tbody>
+{chr(10).join(rows)}
+</tbody></table></body></html>
+"""
+
+
+def merge_manifests(manifests: Dict[str, dict]) -> dict:
+    """Combine the publish manifests of the batches, keyed by batch name"""
+    files = {}
+    for manifest in manifests.values():
+        for f in manifest.get("files", []):
+            files[f["path"]] = f
+    return {
+        "updated": max((m.get("updated", 0) for m in manifests.values()), default=0),
+        "files": [files[p] for p in sorted(files)],
+    }
+
+
+def merge_metadata(metadata: Dict[str, dict]) -> dict:
+    """
+    Combine the `metadata.json` of the batches: the pipeline and environment of
+    the first batch, which are the same for all of them, and the workflow
+    details of every batch.
+    """
+    if not metadata:
+        return {}
+    first = metadata[min(metadata)]
+    return {
+        **first,
+        "batches": {name: m.get("workflow") for name, m in sorted(metadata.items())},
+    }
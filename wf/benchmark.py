@@ -0,0 +1,613 @@
+"""
+Offline end-to-end benchmark of the pipeline on synthetic data.
+
+    python -m wf.benchmark generate --out bench/data --samples 2 --lanes 2 --reads 200000
+    python -m wf.benchmark run --samplesheet bench/data/samplesheet.csv --out bench/run
+    python -m wf.benchmark compare bench/base.json bench/run/benchmark.json
+
+`generate` writes paired FASTQs of Molecular Pixelation reads for a design
+and panel: every read is an amplicon of one molecule, a (UPI-A, UPI-B,
+marker, UMI) combination drawn from the UPIs of one synthetic cell, so the
+graph step recovers one component per cell. The amplicon layout (fixed
+sequences and region lengths) and the marker barcodes are read from the
+pixelator container with `pixelator.config`, or from a layout JSON written
+by an earlier `generate --layout-out`, and from `--panel-file` if given.
+
+`run` launches Nextflow on the local executor with the `benchmark` profile
+the way `run_nextflow` does, with local stand-ins for the Latch parts:
+`initialize()` is replaced by a local work directory and the storage
+estimate of the samplesheet, and the log upload by copying the Nextflow log
+and trace to the output directory. The results file has, per stage, the
+wall time from the first task start to the last task end, the summed task
+time, the peak RSS and CPU efficiency of its tasks and the disk used by its
+outputs, plus the peak disk usage of the work directory, peak RSS of the
+Nextflow head and the cold import time of the workflow entrypoint, so runs
+of different commits or containers can be compared with `compare`.
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .cleanup import _outputs
+from .head import container_limits
+from .profile import build_profile, collect_codec_stats, parse_trace
+from .samplesheet import SamplesheetRow, write_samplesheet
+from .storage import estimate_storage
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PIXELATOR_IMAGE = "biocontainers/pixelator:0.17.1--pyhdfd78af_0"
+
+_complement = str.maketrans("ACGTN", "TGCAN")
+
+# Printed as JSON by the pixelator container: the amplicon regions of a
+# design and the barcodes of a built-in panel
+_LAYOUT_SCRIPT = """
+import json, sys
+from pixelator.config import config, load_antibody_panel
+
+design, panel = sys.argv[1], sys.argv[2]
+amplicon = config.get_assay(design).get_region_by_id("amplicon")
+regions = []
+for r in amplicon.regions:
+    fixed = str(getattr(r.sequence_type, "value", r.sequence_type)).lower() == "fixed"
+    regions.append({"id": r.region_id, "sequence": r.sequence if fixed else None, "length": r.min_len})
+markers = []
+if panel:
+    df = load_antibody_panel(config, panel).df
+    markers = [{"marker_id": m, "sequence": s} for m, s in zip(df["marker_id"], df["sequence"])]
+print(json.dumps({"design": design, "panel": panel, "regions": regions, "markers": markers}))
+"""
+
+
+@dataclass
+class Region:
+    id: str
+    # None for random regions
+    sequence: Optional[str]
+    length: int
+
+
+@dataclass
+class Layout:
+    design: str
+    panel: Optional[str]
+    regions: List[Region]
+    markers: List[Dict[str, str]]
+
+    @classmethod
+    def from_json(cls, text: str) -> "Layout":
+        data = json.loads(text)
+        return cls(
+            design=data["design"],
+            panel=data.get("panel"),
+            regions=[Region(**r) for r in data["regions"]],
+            markers=data.get("markers", []),
+        )
+
+    @property
+    def length(self) -> int:
+        return sum(r.length for r in self.regions)
+
+
+def container_layout(
+    design: str, panel: Optional[str], image: str = PIXELATOR_IMAGE
+) -> Layout:
+    res = subprocess.run(
+        [
+            "docker",
+            "run",
+            "--rm",
+            image,
+            "python",
+            "-c",
+            _LAYOUT_SCRIPT,
+            design,
+            panel or "",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return Layout.from_json(res.stdout)
+
+
+def read_panel_file(path: Path) -> List[Dict[str, str]]:
+    with open(path, newline="") as f:
+        # Panel files start with `#` metadata lines before the header
+        rows = csv.DictReader(line for line in f if not line.startswith("#"))
+        return [{"marker_id": r["marker_id"], "sequence": r["sequence"]} for r in rows]
+
+
+def _random_seq(rng: random.Random, n: int) -> str:
+    return "".join(rng.choices("ACGT", k=n))
+
+
+def _mutate(rng: random.Random, seq: str, error_rate: float) -> str:
+    if error_rate <= 0:
+        return seq
+    bases = list(seq)
+    for i in range(len(bases)):
+        if rng.random() < error_rate:
+            bases[i] = rng.choice([b for b in "ACGT" if b != bases[i]])
+    return "".join(bases)
+
+
+class SyntheticSample:
+    """UPIs of each synthetic cell and the molecules read from them"""
+
+    def __init__(
+        self, layout: Layout, cells: int, upis_per_cell: int, molecules: int, seed: int
+    ):
+        self.layout = layout
+        self.molecules = molecules
+        rng = random.Random(seed)
+
+        self._upis: Dict[str, List[List[str]]] = {}
+        for region in layout.regions:
+            if region.id.startswith("upi"):
+                self._upis[region.id] = [
+                    [_random_seq(rng, region.length) for _ in range(upis_per_cell)]
+                    for _ in range(cells)
+                ]
+        # (cell, UPI-A index, UPI-B index, marker index, UMI seed)
+        self._molecules: List[Tuple[int, int, int, int, int]] = [
+            (
+                rng.randrange(cells),
+                rng.randrange(upis_per_cell),
+                rng.randrange(upis_per_cell),
+                rng.randrange(len(layout.markers)),
+                rng.getrandbits(32),
+            )
+            for _ in range(molecules)
+        ]
+
+    def amplicon(self, index: int) -> str:
+        cell, a, b, marker, umi_seed = self._molecules[index]
+        umi_rng = random.Random(umi_seed)
+        parts = []
+        for region in self.layout.regions:
+            if region.sequence is not None:
+                parts.append(region.sequence)
+            elif region.id.startswith("upi"):
+                # upi-a takes the first UPI index of the molecule, any other UPI region the second
+                parts.append(
+                    self._upis[region.id][cell][a if region.id == "upi-a" else b]
+                )
+            elif region.id in ("bc", "barcode") or region.id.startswith("marker"):
+                parts.append(
+                    self.layout.markers[marker]["sequence"][: region.length].ljust(
+                        region.length, "A"
+                    )
+                )
+            else:
+                parts.append(_random_seq(umi_rng, region.length))
+        return "".join(parts)
+
+
+def write_sample_fastqs(
+    sample: SyntheticSample,
+    name: str,
+    lanes: int,
+    reads: int,
+    read_length: int,
+    error_rate: float,
+    out_dir: Path,
+    seed: int,
+) -> List[Tuple[Path, Path]]:
+    """Write `reads` read pairs split over `lanes` lanes, sampling molecules with replacement"""
+    rng = random.Random(seed)
+    paths = []
+    per_lane = [reads // lanes + (1 if i < reads % lanes else 0) for i in range(lanes)]
+    for lane, n in enumerate(per_lane, start=1):
+        r1 = out_dir / f"{name}_S1_L{lane:03d}_R1_001.fastq.gz"
+        r2 = out_dir / f"{name}_S1_L{lane:03d}_R2_001.fastq.gz"
+        # Fast compression, the generator should not dominate the benchmark setup
+        with gzip.open(r1, "wt", compresslevel=1) as f1, gzip.open(
+            r2, "wt", compresslevel=1
+        ) as f2:
+            for i in range(n):
+                amplicon = _mutate(
+                    rng, sample.amplicon(rng.randrange(sample.molecules)), error_rate
+                )
+                reverse = amplicon.translate(_complement)[::-1]
+                seq1, seq2 = amplicon[:read_length], reverse[:read_length]
+                header = f"@{name}:{lane}:{i}"
+                f1.write(f"{header} 1:N:0\n{seq1}\n+\n{'F' * len(seq1)}\n")
+                f2.write(f"{header} 2:N:0\n{seq2}\n+\n{'F' * len(seq2)}\n")
+        paths.append((r1, r2))
+    return paths
+
+
+def generate(args: argparse.Namespace) -> None:
+    out = args.out.resolve()
+    out.mkdir(parents=True, exist_ok=True)
+
+    if args.layout is not None:
+        layout = Layout.from_json(args.layout.read_text())
+    else:
+        layout = container_layout(
+            args.design, None if args.panel_file else args.panel, args.image
+        )
+    if args.panel_file is not None:
+        layout.markers = read_panel_file(args.panel_file)
+        layout.panel = None
+    if not layout.markers:
+        raise ValueError("the layout has no markers, pass --panel or --panel-file")
+    if args.layout_out is not None:
+        args.layout_out.write_text(json.dumps(asdict(layout), indent=4))
+
+    read_length = args.read_length or layout.length
+    rows = []
+    for s in range(args.samples):
+        name = f"synthetic_{s + 1}"
+        sample = SyntheticSample(
+            layout,
+            cells=args.cells,
+            upis_per_cell=args.upis_per_cell,
+            molecules=max(1, int(args.reads / args.duplication)),
+            seed=args.seed + s,
+        )
+        lanes = write_sample_fastqs(
+            sample,
+            name,
+            args.lanes,
+            args.reads,
+            read_length,
+            args.error_rate,
+            out,
+            args.seed + s,
+        )
+        for r1, r2 in lanes:
+            rows.append(
+                SamplesheetRow(
+                    line=len(rows) + 2,
+                    sample=name,
+                    design=layout.design,
+                    panel=layout.panel,
+                    panel_file=(
+                        str(args.panel_file.resolve())
+                        if args.panel_file is not None
+                        else None
+                    ),
+                    fastq_1=str(r1),
+                    fastq_2=str(r2),
+                )
+            )
+        print(f"Wrote {args.reads} read pairs of {name} in {args.lanes} lanes")
+
+    write_samplesheet(rows, out / "samplesheet.csv")
+    print(f"Samplesheet: {out / 'samplesheet.csv'}")
+
+
+class DiskSampler:
+    """Peak allocated bytes of a directory, sampled in the background"""
+
+    def __init__(self, path: Path, interval: float = 5):
+        self.path = path
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="disk-sampler", daemon=True
+        )
+
+    def __enter__(self) -> "DiskSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        total = 0
+        seen = set()
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                try:
+                    st = os.lstat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                if (st.st_dev, st.st_ino) not in seen:
+                    seen.add((st.st_dev, st.st_ino))
+                    total += st.st_blocks * 512
+        self.peak_bytes = max(self.peak_bytes, total)
+
+
+def stage_disk_usage(work_dir: Path, trace: Path) -> Dict[str, int]:
+    """Bytes allocated for the outputs of the tasks of each process"""
+    usage: Dict[str, int] = {}
+    seen = set()
+    with open(trace, newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            if "/" not in row.get("hash", ""):
+                continue
+            process = row["process"].split(":")[-1]
+            prefix, rest = row["hash"].split("/", 1)
+            for task_dir in work_dir.glob(f"{prefix}/{rest}*"):
+                for path in _outputs(task_dir):
+                    st = path.stat()
+                    if (st.st_dev, st.st_ino) in seen:
+                        continue
+                    seen.add((st.st_dev, st.st_ino))
+                    usage[process] = usage.get(process, 0) + st.st_blocks * 512
+    return usage
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        res = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return res.stdout.strip()
+
+
+def entrypoint_import_ms() -> Optional[int]:
+    """Cold import of the workflow entrypoint in a new interpreter, the startup cost of every task"""
+    code = "import time; t = time.monotonic(); import wf.entrypoint; print(time.monotonic() - t)"
+    try:
+        res = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Failed to import the entrypoint, is the Latch SDK installed? {e}")
+        return None
+    return int(float(res.stdout.strip().splitlines()[-1]) * 1000)
+
+
+def initialize_local(samplesheet: Path, out: Path) -> Tuple[Path, dict]:
+    """Stand-in for `initialize()`: a local work directory instead of a provisioned volume"""
+    estimate = estimate_storage(samplesheet, str(samplesheet), None)
+    print(estimate.summary())
+    work_dir = out / "work"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    return work_dir, {
+        "storage_gib": estimate.storage_gib,
+        "total_bytes": estimate.total_bytes,
+    }
+
+
+def upload_logs_local(out: Path) -> None:
+    """Stand-in for the log upload of `run_nextflow`"""
+    logs = out / "logs"
+    logs.mkdir(parents=True, exist_ok=True)
+    for f in [out / ".nextflow.log", *(out / "profile").glob("*")]:
+        if f.is_file():
+            shutil.copy2(f, logs / f.name)
+
+
+def run(args: argparse.Namespace) -> None:
+    out = args.out.resolve()
+    out.mkdir(parents=True, exist_ok=True)
+    samplesheet = args.samplesheet.resolve()
+
+    work_dir, estimate = initialize_local(samplesheet, out)
+    profile_dir = out / "profile"
+    trace = profile_dir / "execution_trace.txt"
+    if trace.exists():
+        trace.unlink()
+
+    memory_bytes, cpus = container_limits()
+    cmd = [
+        args.nextflow,
+        "run",
+        str(ROOT / "main.nf"),
+        "-work-dir",
+        str(work_dir),
+        "-profile",
+        f"benchmark,{args.profile}",
+        "-with-trace",
+        str(trace),
+        "-with-timeline",
+        str(profile_dir / "execution_timeline.html"),
+        "--input",
+        str(samplesheet),
+        "--outdir",
+        str(out / "results"),
+        "--max_cpus",
+        str(cpus),
+        "--max_memory",
+        f"{memory_bytes // 1024**3}.GB",
+        *(
+            ["--pixelator_container", args.pixelator_container]
+            if args.pixelator_container
+            else []
+        ),
+        *args.nextflow_args,
+    ]
+    print(" ".join(cmd), flush=True)
+
+    start = time.monotonic()
+    with DiskSampler(work_dir, args.disk_interval) as disk:
+        res = subprocess.run(
+            cmd, cwd=out, env={**os.environ, "NXF_DISABLE_CHECK_LATEST": "true"}
+        )
+    wall = time.monotonic() - start
+    upload_logs_local(out)
+
+    records = parse_trace(trace) if trace.exists() else []
+    profile = build_profile(records)
+    disk_by_stage = stage_disk_usage(work_dir, trace) if trace.exists() else {}
+
+    stages = {}
+    for process, step in profile["steps"].items():
+        tasks = [r for r in records if r.process == process]
+        starts = [r.start for r in tasks if r.start is not None]
+        ends = [r.complete for r in tasks if r.complete is not None]
+        stages[process] = {
+            "tasks": step["tasks"],
+            "failed": step["failed"],
+            "wall_time_ms": (max(ends) - min(starts)) if starts and ends else None,
+            "task_time_ms": step["realtime_ms"],
+            "peak_rss": step["peak_rss"],
+            "cpu_efficiency": step["cpu_efficiency"],
+            "disk_bytes": disk_by_stage.get(process, 0),
+        }
+
+    results = {
+        "created": time.time(),
+        "commit": _git_commit(),
+        "container": args.pixelator_container or PIXELATOR_IMAGE,
+        "host": {
+            "platform": platform.platform(),
+            "cpus": cpus,
+            "memory_bytes": memory_bytes,
+        },
+        "samplesheet": str(samplesheet),
+        "exit_status": res.returncode,
+        "wall_time_ms": int(wall * 1000),
+        # Largest child of this process, the Nextflow JVM. Tasks run in containers
+        # started by the Docker daemon and are not counted. ru_maxrss is in KiB on Linux.
+        "head_peak_rss": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+        "peak_disk_bytes": disk.peak_bytes,
+        "storage_estimate": estimate,
+        "entrypoint_import_ms": entrypoint_import_ms(),
+        "critical_path_ms": profile.get("critical_path_ms"),
+        "stages": stages,
+        "intermediate_codecs": collect_codec_stats(work_dir),
+    }
+    path = args.results or out / "benchmark.json"
+    path.write_text(json.dumps(results, indent=4))
+    print(f"Results: {path}")
+    sys.exit(res.returncode)
+
+
+# Stage metrics where a larger value is a regression
+COMPARED = ("wall_time_ms", "task_time_ms", "peak_rss", "disk_bytes")
+
+
+def compare(args: argparse.Namespace) -> None:
+    base = json.loads(args.base.read_text())
+    new = json.loads(args.new.read_text())
+
+    regressions = []
+
+    def check(label: str, key: str, a, b) -> None:
+        if a is None or b is None:
+            return
+        change = (b - a) / a if a else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(f"{label} {key}")
+        print(f"{label:<28} {key:<16} {a:>16} {b:>16} {change * 100:+7.1f}%{flag}")
+
+    print(
+        f"{base.get('commit') or '-'} ({base.get('container')}) -> {new.get('commit') or '-'} ({new.get('container')})"
+    )
+    for key in (
+        "wall_time_ms",
+        "head_peak_rss",
+        "peak_disk_bytes",
+        "entrypoint_import_ms",
+    ):
+        check("total", key, base.get(key), new.get(key))
+    for process in sorted(set(base["stages"]) | set(new["stages"])):
+        a, b = base["stages"].get(process, {}), new["stages"].get(process, {})
+        for key in COMPARED:
+            check(process, key, a.get(key), b.get(key))
+
+    if regressions:
+        print(
+            f"{len(regressions)} metrics regressed by more than {args.threshold * 100:.0f}%"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser(
+        "generate", help="write synthetic paired FASTQs and a samplesheet"
+    )
+    p.add_argument("--out", type=Path, required=True)
+    p.add_argument("--design", default="D21")
+    p.add_argument("--panel", default="human-sc-immunology-spatial-proteomics")
+    p.add_argument("--panel-file", type=Path, default=None)
+    p.add_argument(
+        "--layout",
+        type=Path,
+        default=None,
+        help="layout JSON instead of reading it from the container",
+    )
+    p.add_argument(
+        "--layout-out",
+        type=Path,
+        default=None,
+        help="write the layout JSON for later runs",
+    )
+    p.add_argument("--image", default=PIXELATOR_IMAGE)
+    p.add_argument("--samples", type=int, default=2)
+    p.add_argument("--lanes", type=int, default=1)
+    p.add_argument("--reads", type=int, default=200_000, help="read pairs per sample")
+    p.add_argument(
+        "--read-length", type=int, default=None, help="defaults to the amplicon length"
+    )
+    p.add_argument("--cells", type=int, default=100)
+    p.add_argument("--upis-per-cell", type=int, default=500)
+    p.add_argument("--duplication", type=float, default=4.0, help="reads per molecule")
+    p.add_argument("--error-rate", type=float, default=0.001)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=generate)
+
+    p = subparsers.add_parser(
+        "run", help="run the pipeline on the local executor and record stage metrics"
+    )
+    p.add_argument("--samplesheet", type=Path, required=True)
+    p.add_argument("--out", type=Path, required=True)
+    p.add_argument(
+        "--results", type=Path, default=None, help="defaults to <out>/benchmark.json"
+    )
+    p.add_argument("--profile", default="docker")
+    p.add_argument("--pixelator-container", default=None)
+    p.add_argument("--nextflow", default="nextflow")
+    p.add_argument("--disk-interval", type=float, default=5)
+    p.add_argument(
+        "nextflow_args", nargs=argparse.REMAINDER, help="passed on to nextflow run"
+    )
+    p.set_defaults(func=run)
+
+    p = subparsers.add_parser("compare", help="compare two results files")
+    p.add_argument("base", type=Path)
+    p.add_argument("new", type=Path)
+    p.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative increase reported as a regression",
+    )
+    p.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
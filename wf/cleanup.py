@@ -0,0 +1,313 @@
+"""
+Free the space of bulky intermediates on the shared volume as soon as all
+their consumers are done.
+
+A background thread follows the execution trace. Every completed task is
+recorded with its sample (the task tag). The FASTQ, parquet and pxl outputs
+of a task are released once all tasks of the same sample that read them,
+as listed in `CONSUMERS`, have completed. The report and metadata JSONs are
+small and stay in place for GENERATE_REPORTS.
+
+Released files are hollowed out instead of deleted: the file is truncated
+to zero and extended to its old size again, which leaves a sparse file with
+no allocated blocks, and its mtime is restored. Nextflow still finds the
+output with the same path, size and mtime, so a `-resume` of the run hits
+the cache for the producer and for all of its consumers. A consumer that
+has to run again cannot read a hollowed input, but inputs are only released
+after all of their consumers completed successfully.
+
+Files that were published by hard link (`--publish_dir_mode link`) share
+their blocks with the published copy. They are only released after the
+publisher uploaded them.
+
+Hollowed files are listed in `.hollowed.json` in their task directory so the
+resume cache can skip their content and restore them as sparse files.
+
+Disk usage is tracked per sample on every pass, the peak and final values
+are written to `disk_usage.json`.
+"""
+
+import fnmatch
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .streaming import Tail, _Lines
+
+HOLLOWED = ".hollowed.json"
+
+BULKY = ("*.fq.gz", "*.fastq.gz", "*.parquet", "*.pxl")
+
+# Smaller files are not worth releasing. Some file systems report no blocks
+# for tiny files, the threshold also keeps those from looking hollow.
+MIN_BYTES = 1024**2
+
+# Processes that read the bulky outputs of each process, for the same sample
+CONSUMERS = {
+    "CAT_FASTQ": ("PIXELATOR_AMPLICON",),
+    "PIXELATOR_AMPLICON": ("PIXELATOR_SPLIT_READS", "PIXELATOR_QC"),
+    "PIXELATOR_SPLIT_READS": ("PIXELATOR_QC",),
+    "PIXELATOR_QC": (
+        "PIXELATOR_DEMUX",
+        "PIXELATOR_MERGE_PREQC",
+        "PIXELATOR_MERGE_ADAPTERQC",
+    ),
+    "PIXELATOR_MERGE_PREQC": (),
+    "PIXELATOR_MERGE_ADAPTERQC": (),
+    "PIXELATOR_DEMUX": ("PIXELATOR_MERGE_DEMUX", "PIXELATOR_COLLAPSE"),
+    "PIXELATOR_MERGE_DEMUX": ("PIXELATOR_COLLAPSE",),
+    "PIXELATOR_COLLAPSE": ("PIXELATOR_GRAPH",),
+    # GENERATE_REPORTS stages all graph, annotate, analysis and layout outputs
+    "PIXELATOR_GRAPH": ("PIXELATOR_ANNOTATE", "PIXELATOR_REPORT"),
+    # PIXELATOR_COHORT_INDEX reads the analysis dataset, or the annotate dataset with --skip_analysis
+    "PIXELATOR_ANNOTATE": (
+        "PIXELATOR_ANALYSIS",
+        "PIXELATOR_REPORT",
+        "PIXELATOR_COHORT_INDEX",
+    ),
+    "PIXELATOR_ANALYSIS": (
+        "PIXELATOR_LAYOUT",
+        "PIXELATOR_REPORT",
+        "PIXELATOR_COHORT_INDEX",
+    ),
+    "PIXELATOR_LAYOUT": ("PIXELATOR_REPORT",),
+}
+
+
+def expected_tasks(
+    read_chunks: int = 1,
+    parameter_sets: int = 1,
+    skip_analysis: bool = False,
+    skip_layout: bool = False,
+    skip_report: bool = False,
+    cohort_index: bool = False,
+) -> Dict[str, int]:
+    """Number of tasks of each consumer process per sample in a run with these options"""
+    chunked = read_chunks > 1
+    analysis = 0 if skip_analysis else parameter_sets
+    return {
+        "PIXELATOR_AMPLICON": 1,
+        "PIXELATOR_SPLIT_READS": 1 if chunked else 0,
+        "PIXELATOR_QC": read_chunks if chunked else 1,
+        "PIXELATOR_DEMUX": read_chunks if chunked else 1,
+        "PIXELATOR_MERGE_PREQC": 1 if chunked else 0,
+        "PIXELATOR_MERGE_ADAPTERQC": 1 if chunked else 0,
+        "PIXELATOR_MERGE_DEMUX": 1 if chunked else 0,
+        "PIXELATOR_COLLAPSE": 1,
+        "PIXELATOR_GRAPH": 1,
+        "PIXELATOR_ANNOTATE": 1,
+        "PIXELATOR_ANALYSIS": analysis,
+        "PIXELATOR_LAYOUT": 0 if skip_layout else analysis,
+        "PIXELATOR_REPORT": 0 if skip_report else parameter_sets,
+        "PIXELATOR_COHORT_INDEX": parameter_sets if cohort_index else 0,
+    }
+
+
+def is_hollow(st: os.stat_result) -> bool:
+    return st.st_size >= MIN_BYTES and st.st_blocks == 0
+
+
+def hollow(path: Path) -> int:
+    """Release the blocks of `path`, keeping its size and mtime. Returns the bytes freed."""
+    st = path.stat()
+    freed = st.st_blocks * 512
+    os.truncate(path, 0)
+    os.truncate(path, st.st_size)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    task_dir = _task_dir(path)
+    entries = hollowed_files(task_dir)
+    entries[str(path.relative_to(task_dir))] = {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+    (task_dir / HOLLOWED).write_text(json.dumps(entries))
+    return freed
+
+
+def _task_dir(path: Path) -> Path:
+    # Task directories are `<work>/<xx>/<hash>`, outputs can be nested below them
+    for parent in path.parents:
+        if len(parent.parent.name) == 2 and len(parent.name) == 30:
+            return parent
+    return path.parent
+
+
+def hollowed_files(task_dir: Path) -> Dict[str, dict]:
+    marker = task_dir / HOLLOWED
+    return json.loads(marker.read_text()) if marker.exists() else {}
+
+
+def restore_hollowed(task_dir: Path) -> None:
+    """Recreate the hollowed files of a task directory restored without their content"""
+    for rel, entry in hollowed_files(task_dir).items():
+        path = task_dir / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.truncate(entry["size"])
+        os.utime(path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+
+@dataclass
+class _Task:
+    task_dir: Path
+    process: str
+    sample: str
+    released: bool = False
+
+
+@dataclass
+class SampleUsage:
+    peak_bytes: int = 0
+    final_bytes: int = 0
+    freed_bytes: int = 0
+
+
+@dataclass
+class Cleaner:
+    work_dir: Path
+    trace: Path
+    expected: Dict[str, int]
+    # Returns True when a hard linked file was uploaded by the publisher
+    is_published: Optional[Callable[[Path], bool]] = None
+    interval: float = 60
+    usage: Dict[str, SampleUsage] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._tail = Tail(self.trace)
+        self._lines = _Lines()
+        self._header: Optional[List[str]] = None
+        self._tasks: Dict[str, _Task] = {}
+        self._completed: Dict[Tuple[str, str], Set[str]] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cleaner", daemon=True)
+
+    def __enter__(self) -> "Cleaner":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.update()
+        self.measure(final=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.update()
+                self.release()
+                self.measure()
+            except Exception as e:
+                print(f"Failed to clean up intermediates: {e}")
+
+    def update(self) -> None:
+        for line in self._lines.feed(self._tail.read_new()):
+            cols = line.split("\t")
+            if self._header is None:
+                self._header = cols
+                continue
+
+            row = dict(zip(self._header, cols))
+            if row.get("status") not in ("COMPLETED", "CACHED") or "/" not in row.get(
+                "hash", ""
+            ):
+                continue
+            process = row.get("process", "").split(":")[-1]
+            sample = row.get("tag") or "-"
+
+            prefix, rest = row["hash"].split("/", 1)
+            for task_dir in self.work_dir.glob(f"{prefix}/{rest}*"):
+                self._tasks[str(task_dir)] = _Task(task_dir, process, sample)
+                self._completed.setdefault((process, sample), set()).add(str(task_dir))
+
+    def _consumers_done(self, task: _Task) -> bool:
+        for consumer in CONSUMERS.get(task.process, ()):
+            done = len(self._completed.get((consumer, task.sample), ()))
+            if done < self.expected.get(consumer, 1):
+                return False
+        return True
+
+    def release(self) -> None:
+        for task in self._tasks.values():
+            if (
+                task.released
+                or task.process not in CONSUMERS
+                or not self._consumers_done(task)
+            ):
+                continue
+
+            waiting = False
+            for path in _outputs(task.task_dir):
+                if not any(fnmatch.fnmatchcase(path.name, p) for p in BULKY):
+                    continue
+                st = path.stat()
+                if st.st_size < MIN_BYTES or is_hollow(st):
+                    continue
+                if st.st_nlink > 1 and (
+                    self.is_published is None or not self.is_published(path)
+                ):
+                    # The published hard link has not been uploaded yet
+                    waiting = True
+                    continue
+                freed = hollow(path)
+                self.usage.setdefault(task.sample, SampleUsage()).freed_bytes += freed
+            task.released = not waiting
+
+    def measure(self, final: bool = False) -> None:
+        seen: Set[Tuple[int, int]] = set()
+        totals: Dict[str, int] = {}
+        for task in self._tasks.values():
+            for path in _outputs(task.task_dir):
+                st = path.stat()
+                if (st.st_dev, st.st_ino) in seen:
+                    continue
+                seen.add((st.st_dev, st.st_ino))
+                totals[task.sample] = totals.get(task.sample, 0) + st.st_blocks * 512
+
+        for sample, total in totals.items():
+            usage = self.usage.setdefault(sample, SampleUsage())
+            usage.peak_bytes = max(usage.peak_bytes, total)
+            if final:
+                usage.final_bytes = total
+
+    def write_report(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps(
+                {
+                    "updated": time.time(),
+                    "samples": {
+                        s: {
+                            "peak_bytes": u.peak_bytes,
+                            "final_bytes": u.final_bytes,
+                            "freed_bytes": u.freed_bytes,
+                        }
+                        for s, u in sorted(self.usage.items())
+                    },
+                },
+                indent=4,
+            )
+        )
+
+    def summary(self) -> str:
+        lines = ["Intermediate disk usage per sample (peak / final / freed):"]
+        for sample, u in sorted(self.usage.items()):
+            lines.append(
+                f"  {sample}: {u.peak_bytes / 1024**3:.2f} / {u.final_bytes / 1024**3:.2f} / {u.freed_bytes / 1024**3:.2f} GiB"
+            )
+        return "\n".join(lines)
+
+
+def _outputs(task_dir: Path):
+    """Files written by a task, without staged inputs and Nextflow bookkeeping"""
+    for root, _, files in os.walk(task_dir):
+        for name in files:
+            path = Path(root) / name
+            if name.startswith(".") or path.is_symlink():
+                continue
+            yield path
@@ -0,0 +1,358 @@
+"""
+Pin the pixelator container to a digest and pull it onto the cluster nodes
+before the first tasks are scheduled there.
+
+All pixelator modules run `biocontainers/pixelator:0.17.1--pyhdfd78af_0`, or
+`pixelator_container` when it is set. The tag is resolved to the digest of
+its manifest with an anonymous request to the registry Nextflow pulls from
+(`docker.registry` for names without one) and the run uses
+`<registry>/<name>@<digest>`, so every task runs the same image even if the
+tag is moved during the run. Resolved digests are cached per image reference and
+the last known digest is used when the registry cannot be reached.
+
+The pin runs before the Nextflow head and gates it, the prewarm runs next to
+it. The image is prewarmed by starting one short lived pod per node with the
+pinned image, spread over distinct nodes with pod anti-affinity. They are
+created in the namespace of the task with the same defaults as the pods of
+the Nextflow k8s executor, so they land on the nodes the pipeline tasks will
+be scheduled onto. A pod's pull time is the time from scheduling to the start
+of its container. Pods that cannot be scheduled within the timeout are
+deleted and reported as unscheduled.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+from .preflight import DEFAULT_CONTAINER
+
+_MANIFEST_TYPES = ", ".join(
+    [
+        "application/vnd.oci.image.index.v1+json",
+        "application/vnd.docker.distribution.manifest.list.v2+json",
+        "application/vnd.oci.image.manifest.v1+json",
+        "application/vnd.docker.distribution.manifest.v2+json",
+    ]
+)
+
+_auth_param_re = re.compile(r'(\w+)="([^"]*)"')
+
+# `docker.registry` in nextflow.config
+DEFAULT_REGISTRY = "quay.io"
+
+SERVICE_ACCOUNT = Path("/var/run/secrets/kubernetes.io/serviceaccount")
+
+
+@dataclass
+class ImageReference:
+    registry: str
+    repository: str
+    tag: Optional[str] = None
+    digest: Optional[str] = None
+
+    @classmethod
+    def parse(cls, ref: str) -> "ImageReference":
+        name, _, digest = ref.partition("@")
+        tag = None
+        if ":" in name.rsplit("/", 1)[-1]:
+            name, tag = name.rsplit(":", 1)
+
+        first, _, rest = name.partition("/")
+        if rest and ("." in first or ":" in first or first == "localhost"):
+            registry, repository = first, rest
+        else:
+            # Nextflow prepends `docker.registry` to names without a registry
+            registry, repository = DEFAULT_REGISTRY, name
+
+        return cls(
+            registry, repository, tag or (None if digest else "latest"), digest or None
+        )
+
+    @property
+    def host(self) -> str:
+        return "registry-1.docker.io" if self.registry == "docker.io" else self.registry
+
+    def pinned(self, digest: str) -> str:
+        return f"{self.registry}/{self.repository}@{digest}"
+
+
+def _bearer_token(
+    session: requests.Session, challenge: str, timeout: float
+) -> Optional[str]:
+    if not challenge.lower().startswith("bearer "):
+        return None
+    params = dict(_auth_param_re.findall(challenge))
+    realm = params.pop("realm", None)
+    if realm is None:
+        return None
+
+    res = session.get(realm, params=params, timeout=timeout)
+    res.raise_for_status()
+    body = res.json()
+    return body.get("token") or body.get("access_token")
+
+
+def resolve_digest(
+    ref: ImageReference, session: requests.Session, timeout: float = 30
+) -> str:
+    """Digest of the manifest (or multi-platform index) the tag points at"""
+    url = f"https://{ref.host}/v2/{ref.repository}/manifests/{ref.tag}"
+    headers = {"Accept": _MANIFEST_TYPES}
+
+    res = session.head(url, headers=headers, timeout=timeout)
+    if res.status_code == 401:
+        token = _bearer_token(session, res.headers.get("WWW-Authenticate", ""), timeout)
+        if token is not None:
+            headers["Authorization"] = f"Bearer {token}"
+            res = session.head(url, headers=headers, timeout=timeout)
+    res.raise_for_status()
+
+    digest = res.headers.get("Docker-Content-Digest")
+    if digest is None:
+        raise ValueError(
+            f"{ref.registry}/{ref.repository}:{ref.tag}: the registry did not return a digest"
+        )
+    return digest
+
+
+def digest_key(image: str) -> str:
+    return hashlib.sha1(image.encode()).hexdigest()[:16]
+
+
+@dataclass
+class PinnedImage:
+    image: str
+    pinned: str
+    # registry, cache, pinned (the reference already had a digest) or unpinned
+    source: str
+    resolve_ms: int
+
+    def summary(self) -> str:
+        return f"Container {self.image} -> {self.pinned} ({self.source}, {self.resolve_ms} ms)"
+
+
+def pin_image(
+    remote, image: Optional[str], session: Optional[requests.Session] = None
+) -> PinnedImage:
+    image = image or DEFAULT_CONTAINER
+    start = time.monotonic()
+    ref = ImageReference.parse(image)
+    if ref.digest is not None:
+        return PinnedImage(image, image, "pinned", 0)
+
+    key = f"{digest_key(image)}.json"
+    try:
+        digest = resolve_digest(ref, session or requests.Session())
+        remote.write_text(
+            key, json.dumps({"image": image, "digest": digest, "resolved": time.time()})
+        )
+        source = "registry"
+    except Exception as e:
+        print(f"Failed to resolve the digest of {image}: {e}")
+        text = remote.read_text(key)
+        if text is None:
+            return PinnedImage(
+                image, image, "unpinned", int((time.monotonic() - start) * 1000)
+            )
+        digest = json.loads(text)["digest"]
+        source = "cache"
+
+    return PinnedImage(
+        image, ref.pinned(digest), source, int((time.monotonic() - start) * 1000)
+    )
+
+
+class KubeClient:
+    """Minimal client for the pod API of the namespace of this pod"""
+
+    def __init__(self, session: Optional[requests.Session] = None):
+        host = os.environ["KUBERNETES_SERVICE_HOST"]
+        port = os.environ.get("KUBERNETES_SERVICE_PORT", "443")
+        self.base = f"https://{host}:{port}"
+        self.namespace = (SERVICE_ACCOUNT / "namespace").read_text().strip()
+        self.session = session or requests.Session()
+        self.session.headers["Authorization"] = (
+            f"Bearer {(SERVICE_ACCOUNT / 'token').read_text().strip()}"
+        )
+        self.session.verify = str(SERVICE_ACCOUNT / "ca.crt")
+
+    @staticmethod
+    def available() -> bool:
+        return (
+            "KUBERNETES_SERVICE_HOST" in os.environ
+            and (SERVICE_ACCOUNT / "token").exists()
+        )
+
+    def _pods(self) -> str:
+        return f"{self.base}/api/v1/namespaces/{self.namespace}/pods"
+
+    def create_pod(self, spec: dict) -> dict:
+        res = self.session.post(self._pods(), json=spec, timeout=30)
+        res.raise_for_status()
+        return res.json()
+
+    def get_pod(self, name: str) -> dict:
+        res = self.session.get(f"{self._pods()}/{name}", timeout=30)
+        res.raise_for_status()
+        return res.json()
+
+    def delete_pod(self, name: str) -> None:
+        res = self.session.delete(
+            f"{self._pods()}/{name}", params={"gracePeriodSeconds": 0}, timeout=30
+        )
+        if res.status_code != 404:
+            res.raise_for_status()
+
+
+def _prewarm_pod(image: str, run_id: str) -> dict:
+    labels = {"app": "pixelator-prewarm", "pixelator-prewarm": run_id}
+    return {
+        "apiVersion": "v1",
+        "kind": "Pod",
+        "metadata": {"generateName": "pixelator-prewarm-", "labels": labels},
+        "spec": {
+            "restartPolicy": "Never",
+            "affinity": {
+                "podAntiAffinity": {
+                    "requiredDuringSchedulingIgnoredDuringExecution": [
+                        {
+                            "labelSelector": {"matchLabels": labels},
+                            "topologyKey": "kubernetes.io/hostname",
+                        }
+                    ]
+                }
+            },
+            "containers": [
+                {
+                    "name": "prewarm",
+                    "image": image,
+                    "imagePullPolicy": "IfNotPresent",
+                    "command": ["true"],
+                    "resources": {"requests": {"cpu": "10m", "memory": "16Mi"}},
+                }
+            ],
+        },
+    }
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+@dataclass
+class PullTiming:
+    pod: str
+    node: Optional[str] = None
+    # Seconds from scheduling to the start of the container, mostly the image pull
+    pull_seconds: Optional[float] = None
+    status: str = "unscheduled"
+
+
+@dataclass
+class PrewarmReport:
+    # Pinned reference of the image
+    image: str
+    nodes_requested: int
+    elapsed_seconds: float = 0
+    pulls: List[PullTiming] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def summary(self) -> str:
+        lines = [
+            f"Prewarming {self.image} on {self.nodes_requested} nodes ({self.elapsed_seconds:.0f}s)"
+        ]
+        if self.error is not None:
+            lines.append(f"  prewarm skipped: {self.error}")
+        for p in self.pulls:
+            pull = "-" if p.pull_seconds is None else f"{p.pull_seconds:.1f}s"
+            lines.append(f"  {p.node or '-'}: {p.status}, pull {pull}")
+        return "\n".join(lines)
+
+    def write(self, path: Path) -> None:
+        path.write_text(json.dumps(asdict(self), indent=4))
+
+
+def _pull_timing(pod: dict) -> PullTiming:
+    timing = PullTiming(pod["metadata"]["name"], pod["spec"].get("nodeName"))
+    if timing.node is not None:
+        timing.status = "pending"
+    scheduled = next(
+        (
+            c.get("lastTransitionTime")
+            for c in pod["status"].get("conditions", [])
+            if c["type"] == "PodScheduled" and c["status"] == "True"
+        ),
+        None,
+    )
+    for status in pod["status"].get("containerStatuses", []):
+        state = status.get("state", {})
+        started = (state.get("terminated") or state.get("running") or {}).get(
+            "startedAt"
+        )
+        if started is not None and scheduled is not None:
+            timing.pull_seconds = max(0.0, _timestamp(started) - _timestamp(scheduled))
+        if "terminated" in state:
+            timing.status = (
+                "pulled" if state["terminated"].get("exitCode") == 0 else "failed"
+            )
+        elif "waiting" in state:
+            timing.status = state["waiting"].get("reason", "waiting")
+    return timing
+
+
+def prewarm_nodes(
+    client: KubeClient,
+    image: str,
+    nodes: int,
+    timeout: float = 900,
+    interval: float = 5,
+) -> PrewarmReport:
+    report = PrewarmReport(image, nodes)
+    start = time.monotonic()
+    run_id = uuid.uuid4().hex[:12]
+
+    names = [
+        client.create_pod(_prewarm_pod(image, run_id))["metadata"]["name"]
+        for _ in range(nodes)
+    ]
+    timings: Dict[str, PullTiming] = {n: PullTiming(n) for n in names}
+    try:
+        while time.monotonic() - start < timeout:
+            for name in names:
+                if timings[name].status in ("pulled", "failed"):
+                    continue
+                timings[name] = _pull_timing(client.get_pod(name))
+            if all(
+                t.status in ("pulled", "failed", "ErrImagePull", "ImagePullBackOff")
+                for t in timings.values()
+            ):
+                break
+            # Pods left pending once the others are done have no free node to go to
+            done = [t for t in timings.values() if t.status in ("pulled", "failed")]
+            if done and all(
+                t.node is None or t.status in ("pulled", "failed")
+                for t in timings.values()
+            ):
+                break
+            time.sleep(interval)
+    finally:
+        for name in names:
+            try:
+                client.delete_pod(name)
+            except Exception as e:
+                print(f"Failed to delete prewarm pod {name}: {e}")
+
+    report.pulls = list(timings.values())
+    report.elapsed_seconds = time.monotonic() - start
+    return report
@@ -1,82 +1,262 @@
-from dataclasses import dataclass
+# First, to time the imports below
+from wf import startup
+
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass
+from datetime import datetime
 from enum import Enum
+import functools
+import json
 import os
 import subprocess
-import requests
+import tempfile
 import shutil
 from pathlib import Path
 import typing
 import typing_extensions
 
 from latch.resources.workflow import workflow
+from flytekit import dynamic
 from latch.resources.tasks import nextflow_runtime_task, custom_task
 from latch.types.file import LatchFile
 from latch.types.directory import LatchDir, LatchOutputDir
 from latch.ldata.path import LPath
-from latch_cli.nextflow.workflow import get_flag
 from latch_cli.nextflow.utils import _get_execution_name
 from latch_cli.utils import urljoins
 from latch.types import metadata
 from flytekit.core.annotation import FlyteAnnotation
 
-from latch_cli.services.register.utils import import_module_by_path
+from wf.storage import estimate_storage, provision_storage
+from wf.sync import WorkspaceSync
+from wf.remote import remote_dir
+from wf.resume import ResumeCache, cache_key
+from wf.batches import BATCH_ROOT, SampleBatch, batch_prefix, merge_manifests, merge_metadata, merge_report_indexes, render_report_index, split_samplesheet, summarize_batches
+from wf.profile import collect_codec_stats, parse_trace, write_profile
+from wf.resources import ResourceHistory, collect_observations, sample_input_bytes
+from wf.streaming import LogStreamer
+from wf.preflight import PreflightFailed, check_options, check_samplesheet, load_options, save_options
+from wf.sweep import AnalysisParameterSet, write_sweep
+from wf.prefetch import prefetch_samplesheet
+from wf.publish import MANIFEST, Publisher
+from wf.cleanup import Cleaner, expected_tasks
+from wf.containers import KubeClient, PrewarmReport, pin_image, prewarm_nodes
+from wf.head import DEFAULT_HEAD, HEAD_SIZES, HeadSize, choose_head, container_limits, count_tasks, jvm_options
 
-meta = Path("latch_metadata") / "__init__.py"
-import_module_by_path(meta)
+# A plain import, the registration code of latch_cli takes ~300 ms to import
 import latch_metadata
+from latch_metadata.spec import check_signature, parameter_names
+
+resume_cache_root = "latch:///your_log_dir/nf_nf_core_pixelator/resume_cache"
+resume_cache_budget_gib = int(os.environ.get("PIXELATOR_RESUME_CACHE_GIB", 1000))
+resource_history_root = "latch:///your_log_dir/nf_nf_core_pixelator/resource_history"
+log_stream_interval = float(os.environ.get("PIXELATOR_LOG_STREAM_INTERVAL", 60))
+list_options_root = "latch:///your_log_dir/nf_nf_core_pixelator/list_options"
+metadata_cache_root = "latch:///your_log_dir/nf_nf_core_pixelator/metadata_cache"
+prefetch_workers = int(os.environ.get("PIXELATOR_PREFETCH_WORKERS", 16))
+publish_workers = int(os.environ.get("PIXELATOR_PUBLISH_WORKERS", 8))
+container_digest_root = "latch:///your_log_dir/nf_nf_core_pixelator/container_digests"
+prewarm_node_count = int(os.environ.get("PIXELATOR_PREWARM_NODES", 4))
+
+
+def get_flag(name: str, val: typing.Any) -> typing.List[str]:
+    # get_flag of latch_cli.nextflow.workflow, which imports the registration code of latch_cli
+    flag = f"--{name}"
+    if val is None:
+        return []
+    elif isinstance(val, bool):
+        return [flag] if val else []
+    elif isinstance(val, (LatchFile, LatchDir)):
+        return [flag, val.remote_path if val.remote_path is not None else str(val.path)]
+    elif isinstance(val, Enum):
+        return [flag, val.value]
+    return [flag, str(val)]
+
+
+def _log_dir(name: str, batch: typing.Optional[str]) -> str:
+    # The batches of the per-sample fan-out run in the same execution
+    return urljoins("latch:///your_log_dir/nf_nf_core_pixelator", name, *([batch] if batch is not None else []))
+
+
+def _execution_reports(profile_dir: Path, timestamp: str) -> typing.List[typing.Tuple[Path, str]]:
+    # -with-trace/-timeline/-report write to the profile directory, outdir keeps them under the names of nextflow.config
+    res = []
+    for name in ("execution_trace.txt", "execution_timeline.html", "execution_report.html"):
+        src = profile_dir / name
+        if src.exists():
+            stem, suffix = name.rsplit(".", 1)
+            res.append((src, f"pipeline_info/{stem}_{timestamp}.{suffix}"))
+    return res
+
+
+@custom_task(cpu=1, memory=2, storage_gib=10)
+def preflight(input: LatchFile, input_basedir: typing.Optional[LatchDir], pixelator_container: typing.Optional[str], read_chunks: typing.Optional[int], intermediate_codec: typing.Optional[str]) -> None:
+    for warning in check_options(read_chunks, intermediate_codec):
+        print(f"Warning: {warning}")
+
+    print("Validating samplesheet")
+    errors = check_samplesheet(
+        Path(input),
+        input.remote_path or str(input.path),
+        input_basedir.remote_path if input_basedir is not None else None,
+        Path("assets") / "schema_input.json",
+        load_options(remote_dir(list_options_root), pixelator_container),
+    )
+    if errors:
+        raise PreflightFailed(errors)
+    print("Samplesheet OK")
 
 @custom_task(cpu=0.25, memory=0.5, storage_gib=1)
-def initialize() -> str:
+def initialize(input: LatchFile, input_basedir: typing.Optional[LatchDir]) -> str:
+    print(startup.task_started().summary())
+
     token = os.environ.get("FLYTE_INTERNAL_EXECUTION_ID")
     if token is None:
         raise RuntimeError("failed to get execution token")
 
-    headers = {"Authorization": f"Latch-Execution-Token {token}"}
-
-    print("Provisioning shared storage volume... ", end="")
-    resp = requests.post(
-        "http://nf-dispatcher-service.flyte.svc.cluster.local/provision-storage",
-        headers=headers,
-        json={
-            "storage_gib": 100,
-        }
+    print("Estimating shared storage volume size")
+    estimate = estimate_storage(
+        Path(input),
+        input.remote_path or str(input.path),
+        input_basedir.remote_path if input_basedir is not None else None,
     )
-    resp.raise_for_status()
+    print(estimate.summary())
+
+    print(f"Provisioning shared storage volume ({estimate.storage_gib} GiB)... ", end="")
+    name = provision_storage(token, estimate.storage_gib)
     print("Done.")
 
-    return resp.json()["name"]
+    return name
 
 
+@custom_task(cpu=0.25, memory=0.5, storage_gib=1)
+def pin_container(pixelator_container: typing.Optional[str]) -> str:
+    image = pin_image(remote_dir(container_digest_root), pixelator_container)
+    print(image.summary())
+    return image.pinned
+
 
+@custom_task(cpu=0.25, memory=0.5, storage_gib=1)
+def prewarm_containers(pinned_container: str) -> LatchFile:
+    # Runs next to the Nextflow head, which does not wait for the pulls
+    report = PrewarmReport(pinned_container, prewarm_node_count)
+    if prewarm_node_count > 0:
+        if not KubeClient.available():
+            report.error = "no Kubernetes API access from this task"
+        else:
+            try:
+                report = prewarm_nodes(KubeClient(), pinned_container, prewarm_node_count)
+            except Exception as e:
+                report.error = str(e)
+    print(report.summary())
 
+    path = Path("container_prewarm.json")
+    report.write(path)
+    # Next to the performance profiles of the execution, which include the pulls
+    name = _get_execution_name()
+    if name is not None:
+        try:
+            remote_dir(_log_dir(name, None)).upload(path, path.name)
+        except Exception as e:
+            print(f"Failed to upload the prewarm report: {e}")
+    return LatchFile(str(path))
 
 
-@nextflow_runtime_task(cpu=4, memory=8, storage_gib=100)
-def nextflow_runtime(pvc_name: str, input: LatchFile, input_basedir: typing.Optional[LatchDir], outdir: typing_extensions.Annotated[LatchDir, FlyteAnnotation({'output': True})], email: typing.Optional[str], max_length: typing.Optional[int], min_length: typing.Optional[int], dedup: typing.Optional[bool], remove_polyg: typing.Optional[bool], demux_min_length: typing.Optional[int], markers_ignore: typing.Optional[str], collapse_use_counts: typing.Optional[bool], min_size: typing.Optional[int], max_size: typing.Optional[int], skip_analysis: typing.Optional[bool], use_full_bipartite: typing.Optional[bool], skip_layout: typing.Optional[bool], skip_report: typing.Optional[bool], pixelator_container: typing.Optional[str], trim_front: typing.Optional[int], trim_tail: typing.Optional[int], max_n_bases: typing.Optional[int], avg_qual: typing.Optional[int], adapterqc_mismatches: typing.Optional[float], demux_mismatches: typing.Optional[float], algorithm: typing.Optional[str], collapse_mismatches: typing.Optional[int], collapse_min_count: typing.Optional[int], multiplet_recovery: typing.Optional[bool], dynamic_filter: typing.Optional[str], aggregate_calling: typing.Optional[bool], compute_polarization: typing.Optional[bool], compute_colocalization: typing.Optional[bool], polarization_transformation: typing.Optional[str], polarization_n_permutations: typing.Optional[int], polarization_min_marker_count: typing.Optional[int], colocalization_transformation: typing.Optional[str], colocalization_neighbourhood_size: typing.Optional[int], colocalization_n_permutations: typing.Optional[int], colocalization_min_region_count: typing.Optional[int], no_node_marker_counts: typing.Optional[bool], layout_algorithm: typing.Optional[str]) -> None:
+def run_nextflow(pvc_name: str, input: LatchFile, input_basedir: typing.Optional[LatchDir], outdir: typing_extensions.Annotated[LatchDir, FlyteAnnotation({'output': True})], email: typing.Optional[str], max_length: typing.Optional[int], min_length: typing.Optional[int], dedup: typing.Optional[bool], remove_polyg: typing.Optional[bool], demux_min_length: typing.Optional[int], markers_ignore: typing.Optional[str], collapse_use_counts: typing.Optional[bool], min_size: typing.Optional[int], max_size: typing.Optional[int], skip_analysis: typing.Optional[bool], use_full_bipartite: typing.Optional[bool], skip_layout: typing.Optional[bool], skip_report: typing.Optional[bool], pixelator_container: typing.Optional[str], trim_front: typing.Optional[int], trim_tail: typing.Optional[int], max_n_bases: typing.Optional[int], avg_qual: typing.Optional[int], adapterqc_mismatches: typing.Optional[float], demux_mismatches: typing.Optional[float], algorithm: typing.Optional[str], collapse_mismatches: typing.Optional[int], collapse_min_count: typing.Optional[int], multiplet_recovery: typing.Optional[bool], dynamic_filter: typing.Optional[str], aggregate_calling: typing.Optional[bool], compute_polarization: typing.Optional[bool], compute_colocalization: typing.Optional[bool], polarization_transformation: typing.Optional[str], polarization_n_permutations: typing.Optional[int], polarization_min_marker_count: typing.Optional[int], colocalization_transformation: typing.Optional[str], colocalization_neighbourhood_size: typing.Optional[int], colocalization_n_permutations: typing.Optional[int], colocalization_min_region_count: typing.Optional[int], no_node_marker_counts: typing.Optional[bool], layout_algorithm: typing.Optional[str], read_chunks: typing.Optional[int], intermediate_codec: typing.Optional[str], cohort_index: typing.Optional[bool], analysis_sweep: typing.Optional[LatchFile], resume: typing.Optional[bool], eager_cleanup: typing.Optional[bool], pinned_container: typing.Optional[str], batch: typing.Optional[str]) -> None:
+    # The parameters by name, for the flags of the parameter spec
+    args = dict(locals())
+    timing = startup.task_started()
+    print(timing.summary())
+
+    shared_dir = Path("/nf-workdir")
+    profile_dir = shared_dir / "profile"
+    resume_cache = None
+    publisher = None
+    cleaner = None
+    trace_timestamp = None
+    resource_history = ResourceHistory(remote_dir(resource_history_root))
+    input_bytes = {}
     try:
-        shared_dir = Path("/nf-workdir")
+        report = WorkspaceSync(Path("/root"), shared_dir).run()
+        print(report.summary())
+
+        try:
+            profile_dir.mkdir(parents=True, exist_ok=True)
+            timing.write(profile_dir / "startup.json")
+        except Exception as e:
+            print(f"Failed to write the startup timing: {e}")
 
+        samplesheet_flags = [*get_flag('input', input), *get_flag('input_basedir', input_basedir)]
+        if prefetch_workers > 0:
+            try:
+                print("Prefetching input files")
+                local_samplesheet = shared_dir / "inputs" / f"samplesheet{Path(input).suffix or '.csv'}"
+                prefetch, _ = prefetch_samplesheet(
+                    Path(input),
+                    input.remote_path or str(input.path),
+                    input_basedir.remote_path if input_basedir is not None else None,
+                    shared_dir / "inputs",
+                    local_samplesheet,
+                    max_workers=prefetch_workers,
+                )
+                print(prefetch.summary())
+                samplesheet_flags = ["--input", str(local_samplesheet)]
+            except Exception as e:
+                print(f"Failed to prefetch input files, Nextflow will stage them: {e}")
 
+        container_flags = [*get_flag('pixelator_container', pixelator_container)]
+        if pinned_container is not None:
+            container_flags = ["--pixelator_container", pinned_container]
+            print(f"Running pixelator steps in {pinned_container}")
 
-        ignore_list = [
-            "latch",
-            ".latch",
-            "nextflow",
-            ".nextflow",
-            "work",
-            "results",
-            "miniconda",
-            "anaconda3",
-            "mambaforge",
+        # Nextflow publishes by hard linking into the shared volume, the publisher uploads to outdir.
+        # Batches of the per-sample fan-out always publish this way, below their own prefix for the
+        # files every run writes.
+        outdir_flags = [*get_flag('outdir', outdir)]
+        if publish_workers > 0 or batch is not None:
+            outdir_flags = ["--outdir", str(shared_dir / "publish"), "--publish_dir_mode", "link"]
+            publisher = Publisher(
+                shared_dir / "publish",
+                remote_dir(outdir.remote_path),
+                shared_dir,
+                trace=profile_dir / "execution_trace.txt",
+                max_workers=max(publish_workers, 1),
+                prefix=batch_prefix(batch) if batch is not None else None,
+            )
+
+        # Set up above: input, input_basedir, outdir and pixelator_container
+        handled = {'input', 'input_basedir', 'outdir', 'pixelator_container'}
+        flags = [
+            *samplesheet_flags,
+            *outdir_flags,
+            *container_flags,
+            *(flag for name in parameter_names() if name not in handled for flag in get_flag(name, args[name])),
+            *get_flag('analysis_sweep', analysis_sweep),
         ]
 
-        shutil.copytree(
-            Path("/root"),
-            shared_dir,
-            ignore=lambda src, names: ignore_list,
-            ignore_dangling_symlinks=True,
-            dirs_exist_ok=True,
-        )
+        resumed = False
+        if resume:
+            resume_cache = ResumeCache(
+                remote_dir(resume_cache_root),
+                cache_key(Path(input), flags, outdir=outdir.remote_path if eager_cleanup else None),
+                budget_bytes=resume_cache_budget_gib * 1024**3,
+            )
+            resumed = resume_cache.restore(shared_dir, shared_dir, shared_dir / ".resume-staging")
+            if not resumed:
+                print(f"No resume cache entry for {resume_cache.key}, starting from scratch")
+
+        predictions = profile_dir / "resource_predictions.json"
+        try:
+            print("Predicting resource requests from previous runs")
+            input_bytes = sample_input_bytes(
+                Path(input),
+                input.remote_path or str(input.path),
+                input_basedir.remote_path if input_basedir is not None else None,
+            )
+            profile_dir.mkdir(parents=True, exist_ok=True)
+            resource_history.write_predictions(input_bytes, predictions, read_chunks or 1)
+        except Exception as e:
+            print(f"Failed to predict resource requests, using the process labels: {e}")
+            predictions = None
 
         cmd = [
             "/root/nextflow",
@@ -88,89 +268,355 @@ def nextflow_runtime(pvc_name: str, input: LatchFile, input_basedir: typing.Opti
             "docker",
             "-c",
             "latch.config",
-                *get_flag('input', input),
-                *get_flag('input_basedir', input_basedir),
-                *get_flag('outdir', outdir),
-                *get_flag('email', email),
-                *get_flag('trim_front', trim_front),
-                *get_flag('trim_tail', trim_tail),
-                *get_flag('max_length', max_length),
-                *get_flag('min_length', min_length),
-                *get_flag('max_n_bases', max_n_bases),
-                *get_flag('avg_qual', avg_qual),
-                *get_flag('dedup', dedup),
-                *get_flag('remove_polyg', remove_polyg),
-                *get_flag('adapterqc_mismatches', adapterqc_mismatches),
-                *get_flag('demux_mismatches', demux_mismatches),
-                *get_flag('demux_min_length', demux_min_length),
-                *get_flag('markers_ignore', markers_ignore),
-                *get_flag('algorithm', algorithm),
-                *get_flag('collapse_mismatches', collapse_mismatches),
-                *get_flag('collapse_min_count', collapse_min_count),
-                *get_flag('collapse_use_counts', collapse_use_counts),
-                *get_flag('multiplet_recovery', multiplet_recovery),
-                *get_flag('min_size', min_size),
-                *get_flag('max_size', max_size),
-                *get_flag('dynamic_filter', dynamic_filter),
-                *get_flag('aggregate_calling', aggregate_calling),
-                *get_flag('skip_analysis', skip_analysis),
-                *get_flag('compute_polarization', compute_polarization),
-                *get_flag('compute_colocalization', compute_colocalization),
-                *get_flag('use_full_bipartite', use_full_bipartite),
-                *get_flag('polarization_transformation', polarization_transformation),
-                *get_flag('polarization_n_permutations', polarization_n_permutations),
-                *get_flag('polarization_min_marker_count', polarization_min_marker_count),
-                *get_flag('colocalization_transformation', colocalization_transformation),
-                *get_flag('colocalization_neighbourhood_size', colocalization_neighbourhood_size),
-                *get_flag('colocalization_n_permutations', colocalization_n_permutations),
-                *get_flag('colocalization_min_region_count', colocalization_min_region_count),
-                *get_flag('skip_layout', skip_layout),
-                *get_flag('no_node_marker_counts', no_node_marker_counts),
-                *get_flag('layout_algorithm', layout_algorithm),
-                *get_flag('skip_report', skip_report),
-                *get_flag('pixelator_container', pixelator_container)
+            *(["-resume"] if resumed else []),
+            "-with-trace",
+            str(profile_dir / "execution_trace.txt"),
+            "-with-timeline",
+            str(profile_dir / "execution_timeline.html"),
+            "-with-report",
+            str(profile_dir / "execution_report.html"),
+            *(["--resource_predictions", str(predictions)] if predictions is not None else []),
+            "--metadata_cache",
+            metadata_cache_root,
+            *flags,
         ]
 
         print("Launching Nextflow Runtime")
+        trace_timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         print(' '.join(cmd))
         print(flush=True)
 
+        memory_bytes, cpus = container_limits()
+        nxf_opts = jvm_options(memory_bytes, cpus)
+        print(f"Nextflow head: {cpus} cpus, {memory_bytes / 1024**3:.1f} GiB, NXF_OPTS={nxf_opts}")
+
         env = {
             **os.environ,
             "NXF_HOME": "/root/.nextflow",
-            "NXF_OPTS": "-Xms2048M -Xmx8G -XX:ActiveProcessorCount=4",
+            "NXF_OPTS": nxf_opts,
             "K8S_STORAGE_CLAIM_NAME": pvc_name,
             "NXF_DISABLE_CHECK_LATEST": "true",
         }
-        subprocess.run(
-            cmd,
-            env=env,
-            check=True,
-            cwd=str(shared_dir),
-        )
+
+        streamer = nullcontext()
+        name = _get_execution_name()
+        if name is None:
+            print("Skipping live log streaming, failed to get execution name")
+        else:
+            streamer = LogStreamer(
+                remote_dir(urljoins(_log_dir(name, batch), "live")),
+                shared_dir / ".nextflow.log",
+                trace=profile_dir / "execution_trace.txt",
+                samples=list(input_bytes),
+                interval=log_stream_interval,
+            )
+
+        if eager_cleanup:
+            if publisher is None:
+                print("Eager cleanup needs the publisher (PIXELATOR_PUBLISH_WORKERS > 0), keeping all intermediates")
+            else:
+                parameter_sets = len(json.loads(Path(analysis_sweep).read_text())) if analysis_sweep is not None else 1
+                cleaner = Cleaner(
+                    shared_dir,
+                    profile_dir / "execution_trace.txt",
+                    expected_tasks(
+                        read_chunks=read_chunks or 1,
+                        parameter_sets=parameter_sets,
+                        skip_analysis=bool(skip_analysis),
+                        skip_layout=bool(skip_layout),
+                        skip_report=bool(skip_report),
+                        cohort_index=bool(cohort_index),
+                    ),
+                    is_published=publisher.is_published,
+                )
+
+        with streamer, publisher or nullcontext(), cleaner or nullcontext():
+            try:
+                subprocess.run(
+                    cmd,
+                    env=env,
+                    check=True,
+                    cwd=str(shared_dir),
+                )
+            finally:
+                # Picked up by the last scan of the publisher
+                if publisher is not None:
+                    try:
+                        for src, rel in _execution_reports(profile_dir, trace_timestamp):
+                            (shared_dir / "publish" / rel).parent.mkdir(parents=True, exist_ok=True)
+                            shutil.copyfile(src, shared_dir / "publish" / rel)
+                    except Exception as e:
+                        print(f"Failed to copy the execution reports to outdir: {e}")
+
+        if publisher is not None and publisher.report.failed:
+            raise RuntimeError(f"Failed to publish {publisher.report.failed} result files to {outdir.remote_path}")
     finally:
         print()
 
+        if cleaner is not None:
+            try:
+                cleaner.write_report(profile_dir / "disk_usage.json")
+                print(cleaner.summary())
+            except Exception as e:
+                print(f"Failed to write the disk usage report: {e}")
+
+        if publisher is not None:
+            try:
+                publisher.write_manifest()
+                print(publisher.report.summary())
+            except Exception as e:
+                print(f"Failed to write the publish manifest: {e}")
+        elif trace_timestamp is not None:
+            try:
+                for src, rel in _execution_reports(profile_dir, trace_timestamp):
+                    remote_dir(outdir.remote_path).upload(src, rel)
+            except Exception as e:
+                print(f"Failed to upload the execution reports: {e}")
+
+        if resume_cache is not None:
+            try:
+                resume_cache.save(shared_dir, shared_dir, shared_dir / ".resume-staging")
+            except Exception as e:
+                print(f"Failed to update resume cache: {e}")
+
+        try:
+            save_options(remote_dir(list_options_root), pixelator_container, shared_dir)
+        except Exception as e:
+            print(f"Failed to cache pixelator options: {e}")
+
         nextflow_log = shared_dir / ".nextflow.log"
         if nextflow_log.exists():
             name = _get_execution_name()
             if name is None:
                 print("Skipping logs upload, failed to get execution name")
             else:
-                remote = LPath(urljoins("latch:///your_log_dir/nf_nf_core_pixelator", name, "nextflow.log"))
+                remote = LPath(urljoins(_log_dir(name, batch), "nextflow.log"))
                 print(f"Uploading .nextflow.log to {remote.path}")
                 remote.upload_from(nextflow_log)
 
+                trace = profile_dir / "execution_trace.txt"
+                if trace.exists():
+                    prewarm = None
+                    try:
+                        # The prewarm runs next to this task, its report is there once the pulls are done
+                        text = remote_dir(_log_dir(name, None)).read_text("container_prewarm.json")
+                        prewarm = json.loads(text) if text is not None else None
+                    except Exception as e:
+                        print(f"Failed to read the prewarm report: {e}")
+
+                    try:
+                        write_profile(trace, profile_dir, prewarm)
+                    except Exception as e:
+                        print(f"Failed to build performance profile: {e}")
+
+                    try:
+                        codecs = collect_codec_stats(shared_dir)
+                        if codecs:
+                            (profile_dir / "intermediate_codecs.json").write_text(json.dumps(codecs, indent=4))
+                    except Exception as e:
+                        print(f"Failed to collect intermediate codec stats: {e}")
+
+                    try:
+                        resource_history.record(collect_observations(parse_trace(trace), input_bytes, read_chunks or 1))
+                    except Exception as e:
+                        print(f"Failed to record resource observations: {e}")
+
+                    for f in sorted(profile_dir.iterdir()):
+                        remote = LPath(urljoins(_log_dir(name, batch), f.name))
+                        print(f"Uploading {f.name} to {remote.path}")
+                        remote.upload_from(f)
+
+
+# Parameters of the runtime that are not in nextflow_schema.json
+check_signature(run_nextflow, extra=("pvc_name", "analysis_sweep", "resume", "eager_cleanup", "pinned_container", "batch"))
+
+
+def _runtime_task(name: str, size: HeadSize):
+    # One registered task per head size, all running run_nextflow
+    @functools.wraps(run_nextflow)
+    def task(*args, **kwargs) -> None:
+        return run_nextflow(*args, **kwargs)
+
+    # The task resolver looks the task up by name in this module
+    task.__name__ = task.__qualname__ = name
+    return nextflow_runtime_task(cpu=size.cpus, memory=size.memory_gib, storage_gib=100)(task)
 
 
+nextflow_runtime_small = _runtime_task("nextflow_runtime_small", HEAD_SIZES[0])
+nextflow_runtime = _runtime_task("nextflow_runtime", DEFAULT_HEAD)
+nextflow_runtime_large = _runtime_task("nextflow_runtime_large", HEAD_SIZES[2])
+nextflow_runtime_xlarge = _runtime_task("nextflow_runtime_xlarge", HEAD_SIZES[3])
+
+runtime_tasks = {
+    "small": nextflow_runtime_small,
+    "medium": nextflow_runtime,
+    "large": nextflow_runtime_large,
+    "xlarge": nextflow_runtime_xlarge,
+}
+
+
+def choose_runtime(samplesheet: Path, read_chunks: typing.Optional[int], analysis_sweep: typing.Optional[LatchFile], skip_analysis: typing.Optional[bool], skip_layout: typing.Optional[bool], skip_report: typing.Optional[bool], cohort_index: typing.Optional[bool]):
+    parameter_sets = len(json.loads(Path(analysis_sweep).read_text())) if analysis_sweep is not None else 1
+    samples, lanes, tasks = count_tasks(
+        samplesheet,
+        read_chunks=read_chunks or 1,
+        parameter_sets=parameter_sets,
+        skip_analysis=bool(skip_analysis),
+        skip_layout=bool(skip_layout),
+        skip_report=bool(skip_report),
+        cohort_index=bool(cohort_index),
+    )
+    size = choose_head(tasks)
+    print(f"{samples} samples, {lanes} lanes, ~{tasks} tasks: {size.name} Nextflow head ({size.cpus} cpus, {size.memory_gib} GiB)")
+    return runtime_tasks[size.name]
+
+
+@dynamic
+def sized_nextflow_runtime(pvc_name: str, input: LatchFile, input_basedir: typing.Optional[LatchDir], outdir: typing_extensions.Annotated[LatchDir, FlyteAnnotation({'output': True})], email: typing.Optional[str], max_length: typing.Optional[int], min_length: typing.Optional[int], dedup: typing.Optional[bool], remove_polyg: typing.Optional[bool], demux_min_length: typing.Optional[int], markers_ignore: typing.Optional[str], collapse_use_counts: typing.Optional[bool], min_size: typing.Optional[int], max_size: typing.Optional[int], skip_analysis: typing.Optional[bool], use_full_bipartite: typing.Optional[bool], skip_layout: typing.Optional[bool], skip_report: typing.Optional[bool], pixelator_container: typing.Optional[str], trim_front: typing.Optional[int], trim_tail: typing.Optional[int], max_n_bases: typing.Optional[int], avg_qual: typing.Optional[int], adapterqc_mismatches: typing.Optional[float], demux_mismatches: typing.Optional[float], algorithm: typing.Optional[str], collapse_mismatches: typing.Optional[int], collapse_min_count: typing.Optional[int], multiplet_recovery: typing.Optional[bool], dynamic_filter: typing.Optional[str], aggregate_calling: typing.Optional[bool], compute_polarization: typing.Optional[bool], compute_colocalization: typing.Optional[bool], polarization_transformation: typing.Optional[str], polarization_n_permutations: typing.Optional[int], polarization_min_marker_count: typing.Optional[int], colocalization_transformation: typing.Optional[str], colocalization_neighbourhood_size: typing.Optional[int], colocalization_n_permutations: typing.Optional[int], colocalization_min_region_count: typing.Optional[int], no_node_marker_counts: typing.Optional[bool], layout_algorithm: typing.Optional[str], read_chunks: typing.Optional[int], intermediate_codec: typing.Optional[str], cohort_index: typing.Optional[bool], analysis_sweep: typing.Optional[LatchFile], resume: typing.Optional[bool], eager_cleanup: typing.Optional[bool], pinned_container: typing.Optional[str]) -> None:
+    runtime = choose_runtime(Path(input), read_chunks, analysis_sweep, skip_analysis, skip_layout, skip_report, cohort_index)
+    runtime(pvc_name=pvc_name, input=input, input_basedir=input_basedir, outdir=outdir, email=email, max_length=max_length, min_length=min_length, dedup=dedup, remove_polyg=remove_polyg, demux_min_length=demux_min_length, markers_ignore=markers_ignore, collapse_use_counts=collapse_use_counts, min_size=min_size, max_size=max_size, skip_analysis=skip_analysis, use_full_bipartite=use_full_bipartite, skip_layout=skip_layout, skip_report=skip_report, pixelator_container=pixelator_container, trim_front=trim_front, trim_tail=trim_tail, max_n_bases=max_n_bases, avg_qual=avg_qual, adapterqc_mismatches=adapterqc_mismatches, demux_mismatches=demux_mismatches, algorithm=algorithm, collapse_mismatches=collapse_mismatches, collapse_min_count=collapse_min_count, multiplet_recovery=multiplet_recovery, dynamic_filter=dynamic_filter, aggregate_calling=aggregate_calling, compute_polarization=compute_polarization, compute_colocalization=compute_colocalization, polarization_transformation=polarization_transformation, polarization_n_permutations=polarization_n_permutations, polarization_min_marker_count=polarization_min_marker_count, colocalization_transformation=colocalization_transformation, colocalization_neighbourhood_size=colocalization_neighbourhood_size, colocalization_n_permutations=colocalization_n_permutations, colocalization_min_region_count=colocalization_min_region_count, no_node_marker_counts=no_node_marker_counts, layout_algorithm=layout_algorithm, read_chunks=read_chunks, intermediate_codec=intermediate_codec, cohort_index=cohort_index, analysis_sweep=analysis_sweep, resume=resume, eager_cleanup=eager_cleanup, pinned_container=pinned_container, batch=None)
+
 @workflow(metadata._nextflow_metadata)
-def nf_nf_core_pixelator(input: LatchFile, input_basedir: typing.Optional[LatchDir], outdir: typing_extensions.Annotated[LatchDir, FlyteAnnotation({'output': True})], email: typing.Optional[str], max_length: typing.Optional[int], min_length: typing.Optional[int], dedup: typing.Optional[bool], remove_polyg: typing.Optional[bool], demux_min_length: typing.Optional[int], markers_ignore: typing.Optional[str], collapse_use_counts: typing.Optional[bool], min_size: typing.Optional[int], max_size: typing.Optional[int], skip_analysis: typing.Optional[bool], use_full_bipartite: typing.Optional[bool], skip_layout: typing.Optional[bool], skip_report: typing.Optional[bool], pixelator_container: typing.Optional[str], trim_front: typing.Optional[int] = 0, trim_tail: typing.Optional[int] = 0, max_n_bases: typing.Optional[int] = 0, avg_qual: typing.Optional[int] = 20, adapterqc_mismatches: typing.Optional[float] = 0.1, demux_mismatches: typing.Optional[float] = 0.1, algorithm: typing.Optional[str] = 'adjacency', collapse_mismatches: typing.Optional[int] = 2, collapse_min_count: typing.Optional[int] = 2, multiplet_recovery: typing.Optional[bool] = True, dynamic_filter: typing.Optional[str] = 'min', aggregate_calling: typing.Optional[bool] = True, compute_polarization: typing.Optional[bool] = True, compute_colocalization: typing.Optional[bool] = True, polarization_transformation: typing.Optional[str] = 'log1p', polarization_n_permutations: typing.Optional[int] = 50, polarization_min_marker_count: typing.Optional[int] = 5, colocalization_transformation: typing.Optional[str] = 'log1p', colocalization_neighbourhood_size: typing.Optional[int] = 1, colocalization_n_permutations: typing.Optional[int] = 50, colocalization_min_region_count: typing.Optional[int] = 5, no_node_marker_counts: typing.Optional[bool] = False, layout_algorithm: typing.Optional[str] = 'pmds_3d') -> None:
+def nf_nf_core_pixelator(input: LatchFile, input_basedir: typing.Optional[LatchDir], outdir: typing_extensions.Annotated[LatchDir, FlyteAnnotation({'output': True})], email: typing.Optional[str], max_length: typing.Optional[int], min_length: typing.Optional[int], dedup: typing.Optional[bool], remove_polyg: typing.Optional[bool], demux_min_length: typing.Optional[int], markers_ignore: typing.Optional[str], collapse_use_counts: typing.Optional[bool], min_size: typing.Optional[int], max_size: typing.Optional[int], skip_analysis: typing.Optional[bool], use_full_bipartite: typing.Optional[bool], skip_layout: typing.Optional[bool], skip_report: typing.Optional[bool], pixelator_container: typing.Optional[str], trim_front: typing.Optional[int] = 0, trim_tail: typing.Optional[int] = 0, max_n_bases: typing.Optional[int] = 0, avg_qual: typing.Optional[int] = 20, adapterqc_mismatches: typing.Optional[float] = 0.1, demux_mismatches: typing.Optional[float] = 0.1, algorithm: typing.Optional[str] = 'adjacency', collapse_mismatches: typing.Optional[int] = 2, collapse_min_count: typing.Optional[int] = 2, multiplet_recovery: typing.Optional[bool] = True, dynamic_filter: typing.Optional[str] = 'min', aggregate_calling: typing.Optional[bool] = True, compute_polarization: typing.Optional[bool] = True, compute_colocalization: typing.Optional[bool] = True, polarization_transformation: typing.Optional[str] = 'log1p', polarization_n_permutations: typing.Optional[int] = 50, polarization_min_marker_count: typing.Optional[int] = 5, colocalization_transformation: typing.Optional[str] = 'log1p', colocalization_neighbourhood_size: typing.Optional[int] = 1, colocalization_n_permutations: typing.Optional[int] = 50, colocalization_min_region_count: typing.Optional[int] = 5, no_node_marker_counts: typing.Optional[bool] = False, layout_algorithm: typing.Optional[str] = 'pmds_3d', read_chunks: typing.Optional[int] = 1, intermediate_codec: typing.Optional[str] = 'fast', cohort_index: typing.Optional[bool] = False, resume: typing.Optional[bool] = False, eager_cleanup: typing.Optional[bool] = False) -> None:
     """
     nf-core/pixelator
 
     Sample Description
     """
 
-    pvc_name: str = initialize()
-    nextflow_runtime(pvc_name=pvc_name, input=input, input_basedir=input_basedir, outdir=outdir, email=email, trim_front=trim_front, trim_tail=trim_tail, max_length=max_length, min_length=min_length, max_n_bases=max_n_bases, avg_qual=avg_qual, dedup=dedup, remove_polyg=remove_polyg, adapterqc_mismatches=adapterqc_mismatches, demux_mismatches=demux_mismatches, demux_min_length=demux_min_length, markers_ignore=markers_ignore, algorithm=algorithm, collapse_mismatches=collapse_mismatches, collapse_min_count=collapse_min_count, collapse_use_counts=collapse_use_counts, multiplet_recovery=multiplet_recovery, min_size=min_size, max_size=max_size, dynamic_filter=dynamic_filter, aggregate_calling=aggregate_calling, skip_analysis=skip_analysis, compute_polarization=compute_polarization, compute_colocalization=compute_colocalization, use_full_bipartite=use_full_bipartite, polarization_transformation=polarization_transformation, polarization_n_permutations=polarization_n_permutations, polarization_min_marker_count=polarization_min_marker_count, colocalization_transformation=colocalization_transformation, colocalization_neighbourhood_size=colocalization_neighbourhood_size, colocalization_n_permutations=colocalization_n_permutations, colocalization_min_region_count=colocalization_min_region_count, skip_layout=skip_layout, no_node_marker_counts=no_node_marker_counts, layout_algorithm=layout_algorithm, skip_report=skip_report, pixelator_container=pixelator_container)
+    checked = preflight(input=input, input_basedir=input_basedir, pixelator_container=pixelator_container, read_chunks=read_chunks, intermediate_codec=intermediate_codec)
+    pinned_container = pin_container(pixelator_container=pixelator_container)
+    prewarm_containers(pinned_container=pinned_container)
+    pvc_name: str = initialize(input=input, input_basedir=input_basedir)
+    checked >> pinned_container
+    checked >> pvc_name
+    sized_nextflow_runtime(pvc_name=pvc_name, input=input, input_basedir=input_basedir, outdir=outdir, email=email, trim_front=trim_front, trim_tail=trim_tail, max_length=max_length, min_length=min_length, max_n_bases=max_n_bases, avg_qual=avg_qual, dedup=dedup, remove_polyg=remove_polyg, adapterqc_mismatches=adapterqc_mismatches, demux_mismatches=demux_mismatches, demux_min_length=demux_min_length, markers_ignore=markers_ignore, algorithm=algorithm, collapse_mismatches=collapse_mismatches, collapse_min_count=collapse_min_count, collapse_use_counts=collapse_use_counts, multiplet_recovery=multiplet_recovery, min_size=min_size, max_size=max_size, dynamic_filter=dynamic_filter, aggregate_calling=aggregate_calling, skip_analysis=skip_analysis, compute_polarization=compute_polarization, compute_colocalization=compute_colocalization, use_full_bipartite=use_full_bipartite, polarization_transformation=polarization_transformation, polarization_n_permutations=polarization_n_permutations, polarization_min_marker_count=polarization_min_marker_count, colocalization_transformation=colocalization_transformation, colocalization_neighbourhood_size=colocalization_neighbourhood_size, colocalization_n_permutations=colocalization_n_permutations, colocalization_min_region_count=colocalization_min_region_count, skip_layout=skip_layout, no_node_marker_counts=no_node_marker_counts, layout_algorithm=layout_algorithm, skip_report=skip_report, pixelator_container=pixelator_container, read_chunks=read_chunks, intermediate_codec=intermediate_codec, cohort_index=cohort_index, analysis_sweep=None, resume=resume, eager_cleanup=eager_cleanup, pinned_container=pinned_container)
+
+
+@custom_task(cpu=0.25, memory=0.5, storage_gib=1)
+def gather_sample_batches(plan: LatchFile, outdir: typing_extensions.Annotated[LatchDir, FlyteAnnotation({'output': True})], skip_report: typing.Optional[bool]) -> None:
+    batches = [
+        SampleBatch(name=b["name"], samplesheet=Path(b["samplesheet"]), samples=b["samples"])
+        for b in json.loads(Path(plan).read_text())
+    ]
+
+    remote = remote_dir(outdir.remote_path)
+    summary = summarize_batches(batches, remote.listdir("pixelator/report"), bool(skip_report))
+    remote.write_text("pipeline_info/sample_batches.json", json.dumps(summary, indent=4))
+
+    # Each batch wrote its own run files below its prefix, combine them at the top of outdir
+    def read_batches(rel: str) -> typing.Dict[str, dict]:
+        res = {}
+        for batch in batches:
+            text = remote.read_text(f"{batch_prefix(batch.name)}/{rel}")
+            if text is not None:
+                res[batch.name] = json.loads(text)
+        return res
+
+    indexes = read_batches("pixelator/report_index.json")
+    if indexes:
+        index = merge_report_indexes([indexes[name] for name in sorted(indexes)])
+        remote.write_text("pixelator/report_index.json", json.dumps(index, indent=4))
+        remote.write_text("pixelator/report_index.html", render_report_index(index))
+        print(f"Combined the report index of {len(indexes)} batches: {len(index['reports'])} reports")
+
+    metadata = read_batches("pixelator/metadata.json")
+    if metadata:
+        remote.write_text("pixelator/metadata.json", json.dumps(merge_metadata(metadata), indent=4))
+
+    manifests = read_batches(MANIFEST)
+    if manifests:
+        remote.write_text(MANIFEST, json.dumps(merge_manifests(manifests), indent=4))
+
+    for batch in summary["batches"]:
+        print(f"{batch['name']}: {', '.join(batch['samples'])}")
+
+    if summary["missing_reports"]:
+        raise RuntimeError(f"No report produced for: {', '.join(summary['missing_reports'])}")
+
+
+@dynamic
+def per_sample_fan_out(samples_per_batch: int, input: LatchFile, input_basedir: typing.Optional[LatchDir], outdir: typing_extensions.Annotated[LatchDir, FlyteAnnotation({'output': True})], email: typing.Optional[str], max_length: typing.Optional[int], min_length: typing.Optional[int], dedup: typing.Optional[bool], remove_polyg: typing.Optional[bool], demux_min_length: typing.Optional[int], markers_ignore: typing.Optional[str], collapse_use_counts: typing.Optional[bool], min_size: typing.Optional[int], max_size: typing.Optional[int], skip_analysis: typing.Optional[bool], use_full_bipartite: typing.Optional[bool], skip_layout: typing.Optional[bool], skip_report: typing.Optional[bool], pixelator_container: typing.Optional[str], trim_front: typing.Optional[int], trim_tail: typing.Optional[int], max_n_bases: typing.Optional[int], avg_qual: typing.Optional[int], adapterqc_mismatches: typing.Optional[float], demux_mismatches: typing.Optional[float], algorithm: typing.Optional[str], collapse_mismatches: typing.Optional[int], collapse_min_count: typing.Optional[int], multiplet_recovery: typing.Optional[bool], dynamic_filter: typing.Optional[str], aggregate_calling: typing.Optional[bool], compute_polarization: typing.Optional[bool], compute_colocalization: typing.Optional[bool], polarization_transformation: typing.Optional[str], polarization_n_permutations: typing.Optional[int], polarization_min_marker_count: typing.Optional[int], colocalization_transformation: typing.Optional[str], colocalization_neighbourhood_size: typing.Optional[int], colocalization_n_permutations: typing.Optional[int], colocalization_min_region_count: typing.Optional[int], no_node_marker_counts: typing.Optional[bool], layout_algorithm: typing.Optional[str], read_chunks: typing.Optional[int], intermediate_codec: typing.Optional[str], cohort_index: typing.Optional[bool], resume: typing.Optional[bool], eager_cleanup: typing.Optional[bool], pinned_container: typing.Optional[str]) -> None:
+    local_dir = Path(tempfile.mkdtemp())
+    batches = split_samplesheet(
+        Path(input),
+        input.remote_path or str(input.path),
+        input_basedir.remote_path if input_basedir is not None else None,
+        samples_per_batch,
+        local_dir,
+    )
+    print(f"Split {sum(len(b.samples) for b in batches)} samples into {len(batches)} batches")
+
+    remote_root = urljoins(outdir.remote_path, BATCH_ROOT)
+
+    plan = local_dir / "plan.json"
+    plan.write_text(json.dumps([
+        {"name": b.name, "samplesheet": b.samplesheet.name, "samples": b.samples}
+        for b in batches
+    ]))
+
+    done = gather_sample_batches(
+        plan=LatchFile(str(plan), urljoins(remote_root, plan.name)),
+        outdir=outdir,
+        skip_report=skip_report,
+    )
+
+    for batch in batches:
+        samplesheet = LatchFile(str(batch.samplesheet), urljoins(remote_root, batch.samplesheet.name))
+        pvc_name = initialize(input=samplesheet, input_basedir=None)
+        runtime = choose_runtime(batch.samplesheet, read_chunks, None, skip_analysis, skip_layout, skip_report, cohort_index)
+        run = runtime(pvc_name=pvc_name, input=samplesheet, input_basedir=None, outdir=outdir, email=email, trim_front=trim_front, trim_tail=trim_tail, max_length=max_length, min_length=min_length, max_n_bases=max_n_bases, avg_qual=avg_qual, dedup=dedup, remove_polyg=remove_polyg, adapterqc_mismatches=adapterqc_mismatches, demux_mismatches=demux_mismatches, demux_min_length=demux_min_length, markers_ignore=markers_ignore, algorithm=algorithm, collapse_mismatches=collapse_mismatches, collapse_min_count=collapse_min_count, collapse_use_counts=collapse_use_counts, multiplet_recovery=multiplet_recovery, min_size=min_size, max_size=max_size, dynamic_filter=dynamic_filter, aggregate_calling=aggregate_calling, skip_analysis=skip_analysis, compute_polarization=compute_polarization, compute_colocalization=compute_colocalization, use_full_bipartite=use_full_bipartite, polarization_transformation=polarization_transformation, polarization_n_permutations=polarization_n_permutations, polarization_min_marker_count=polarization_min_marker_count, colocalization_transformation=colocalization_transformation, colocalization_neighbourhood_size=colocalization_neighbourhood_size, colocalization_n_permutations=colocalization_n_permutations, colocalization_min_region_count=colocalization_min_region_count, skip_layout=skip_layout, no_node_marker_counts=no_node_marker_counts, layout_algorithm=layout_algorithm, skip_report=skip_report, pixelator_container=pixelator_container, read_chunks=read_chunks, intermediate_codec=intermediate_codec, cohort_index=cohort_index, analysis_sweep=None, resume=resume, eager_cleanup=eager_cleanup, pinned_container=pinned_container, batch=batch.name)
+        run >> done
+
+
+@workflow
+def nf_nf_core_pixelator_per_sample(input: LatchFile, input_basedir: typing.Optional[LatchDir], outdir: typing_extensions.Annotated[LatchDir, FlyteAnnotation({'output': True})], email: typing.Optional[str], max_length: typing.Optional[int], min_length: typing.Optional[int], dedup: typing.Optional[bool], remove_polyg: typing.Optional[bool], demux_min_length: typing.Optional[int], markers_ignore: typing.Optional[str], collapse_use_counts: typing.Optional[bool], min_size: typing.Optional[int], max_size: typing.Optional[int], skip_analysis: typing.Optional[bool], use_full_bipartite: typing.Optional[bool], skip_layout: typing.Optional[bool], skip_report: typing.Optional[bool], pixelator_container: typing.Optional[str], trim_front: typing.Optional[int] = 0, trim_tail: typing.Optional[int] = 0, max_n_bases: typing.Optional[int] = 0, avg_qual: typing.Optional[int] = 20, adapterqc_mismatches: typing.Optional[float] = 0.1, demux_mismatches: typing.Optional[float] = 0.1, algorithm: typing.Optional[str] = 'adjacency', collapse_mismatches: typing.Optional[int] = 2, collapse_min_count: typing.Optional[int] = 2, multiplet_recovery: typing.Optional[bool] = True, dynamic_filter: typing.Optional[str] = 'min', aggregate_calling: typing.Optional[bool] = True, compute_polarization: typing.Optional[bool] = True, compute_colocalization: typing.Optional[bool] = True, polarization_transformation: typing.Optional[str] = 'log1p', polarization_n_permutations: typing.Optional[int] = 50, polarization_min_marker_count: typing.Optional[int] = 5, colocalization_transformation: typing.Optional[str] = 'log1p', colocalization_neighbourhood_size: typing.Optional[int] = 1, colocalization_n_permutations: typing.Optional[int] = 50, colocalization_min_region_count: typing.Optional[int] = 5, no_node_marker_counts: typing.Optional[bool] = False, layout_algorithm: typing.Optional[str] = 'pmds_3d', read_chunks: typing.Optional[int] = 1, intermediate_codec: typing.Optional[str] = 'fast', cohort_index: typing.Optional[bool] = False, resume: typing.Optional[bool] = False, eager_cleanup: typing.Optional[bool] = False, samples_per_batch: int = 1) -> None:
+    """
+    nf-core/pixelator, one Nextflow runtime per sample batch
+
+    Splits the samplesheet by sample and runs each batch of `samples_per_batch`
+    samples on its own shared volume and Nextflow head. All batches publish to
+    the same `outdir`.
+    """
+
+    checked = preflight(input=input, input_basedir=input_basedir, pixelator_container=pixelator_container, read_chunks=read_chunks, intermediate_codec=intermediate_codec)
+    pinned_container = pin_container(pixelator_container=pixelator_container)
+    prewarm_containers(pinned_container=pinned_container)
+    checked >> pinned_container
+    fan_out = per_sample_fan_out(samples_per_batch=samples_per_batch, input=input, input_basedir=input_basedir, outdir=outdir, email=email, trim_front=trim_front, trim_tail=trim_tail, max_length=max_length, min_length=min_length, max_n_bases=max_n_bases, avg_qual=avg_qual, dedup=dedup, remove_polyg=remove_polyg, adapterqc_mismatches=adapterqc_mismatches, demux_mismatches=demux_mismatches, demux_min_length=demux_min_length, markers_ignore=markers_ignore, algorithm=algorithm, collapse_mismatches=collapse_mismatches, collapse_min_count=collapse_min_count, collapse_use_counts=collapse_use_counts, multiplet_recovery=multiplet_recovery, min_size=min_size, max_size=max_size, dynamic_filter=dynamic_filter, aggregate_calling=aggregate_calling, skip_analysis=skip_analysis, compute_polarization=compute_polarization, compute_colocalization=compute_colocalization, use_full_bipartite=use_full_bipartite, polarization_transformation=polarization_transformation, polarization_n_permutations=polarization_n_permutations, polarization_min_marker_count=polarization_min_marker_count, colocalization_transformation=colocalization_transformation, colocalization_neighbourhood_size=colocalization_neighbourhood_size, colocalization_n_permutations=colocalization_n_permutations, colocalization_min_region_count=colocalization_min_region_count, skip_layout=skip_layout, no_node_marker_counts=no_node_marker_counts, layout_algorithm=layout_algorithm, skip_report=skip_report, pixelator_container=pixelator_container, read_chunks=read_chunks, intermediate_codec=intermediate_codec, cohort_index=cohort_index, resume=resume, eager_cleanup=eager_cleanup, pinned_container=pinned_container)
+    checked >> fan_out
+
+
+@custom_task(cpu=0.25, memory=0.5, storage_gib=1)
+def write_analysis_sweep(parameter_sets: typing.List[AnalysisParameterSet], outdir: typing_extensions.Annotated[LatchDir, FlyteAnnotation({'output': True})]) -> LatchFile:
+    path = Path("analysis_sweep.json")
+    write_sweep(parameter_sets, path)
+    for s in parameter_sets:
+        print(f"{s.name}: {json.dumps({k: v for k, v in asdict(s).items() if v is not None and k != 'name'})}")
+
+    return LatchFile(str(path), urljoins(outdir.remote_path, "pipeline_info", "analysis_sweep.json"))
+
+
+@workflow
+def nf_nf_core_pixelator_sweep(input: LatchFile, input_basedir: typing.Optional[LatchDir], outdir: typing_extensions.Annotated[LatchDir, FlyteAnnotation({'output': True})], email: typing.Optional[str], max_length: typing.Optional[int], min_length: typing.Optional[int], dedup: typing.Optional[bool], remove_polyg: typing.Optional[bool], demux_min_length: typing.Optional[int], markers_ignore: typing.Optional[str], collapse_use_counts: typing.Optional[bool], min_size: typing.Optional[int], max_size: typing.Optional[int], skip_analysis: typing.Optional[bool], use_full_bipartite: typing.Optional[bool], skip_layout: typing.Optional[bool], skip_report: typing.Optional[bool], pixelator_container: typing.Optional[str], parameter_sets: typing.List[AnalysisParameterSet], trim_front: typing.Optional[int] = 0, trim_tail: typing.Optional[int] = 0, max_n_bases: typing.Optional[int] = 0, avg_qual: typing.Optional[int] = 20, adapterqc_mismatches: typing.Optional[float] = 0.1, demux_mismatches: typing.Optional[float] = 0.1, algorithm: typing.Optional[str] = 'adjacency', collapse_mismatches: typing.Optional[int] = 2, collapse_min_count: typing.Optional[int] = 2, multiplet_recovery: typing.Optional[bool] = True, dynamic_filter: typing.Optional[str] = 'min', aggregate_calling: typing.Optional[bool] = True, compute_polarization: typing.Optional[bool] = True, compute_colocalization: typing.Optional[bool] = True, polarization_transformation: typing.Optional[str] = 'log1p', polarization_n_permutations: typing.Optional[int] = 50, polarization_min_marker_count: typing.Optional[int] = 5, colocalization_transformation: typing.Optional[str] = 'log1p', colocalization_neighbourhood_size: typing.Optional[int] = 1, colocalization_n_permutations: typing.Optional[int] = 50, colocalization_min_region_count: typing.Optional[int] = 5, no_node_marker_counts: typing.Optional[bool] = False, layout_algorithm: typing.Optional[str] = 'pmds_3d', read_chunks: typing.Optional[int] = 1, intermediate_codec: typing.Optional[str] = 'fast', cohort_index: typing.Optional[bool] = False, resume: typing.Optional[bool] = False, eager_cleanup: typing.Optional[bool] = False) -> None:
+    """
+    nf-core/pixelator, analysis and layout parameter sweep
+
+    Runs the steps up to annotate once per sample, then analysis, layout and
+    report once per sample and parameter set. Each set publishes to
+    `sweep/<name>/` in `outdir` and `sweep/sweep_summary.tsv` compares the
+    analysis and layout reports of all sets. Options a set does not specify
+    use the values given here.
+    """
+
+    checked = preflight(input=input, input_basedir=input_basedir, pixelator_container=pixelator_container, read_chunks=read_chunks, intermediate_codec=intermediate_codec)
+    sweep = write_analysis_sweep(parameter_sets=parameter_sets, outdir=outdir)
+    pinned_container = pin_container(pixelator_container=pixelator_container)
+    prewarm_containers(pinned_container=pinned_container)
+    pvc_name: str = initialize(input=input, input_basedir=input_basedir)
+    checked >> pinned_container
+    checked >> pvc_name
+    sized_nextflow_runtime(pvc_name=pvc_name, input=input, input_basedir=input_basedir, outdir=outdir, email=email, trim_front=trim_front, trim_tail=trim_tail, max_length=max_length, min_length=min_length, max_n_bases=max_n_bases, avg_qual=avg_qual, dedup=dedup, remove_polyg=remove_polyg, adapterqc_mismatches=adapterqc_mismatches, demux_mismatches=demux_mismatches, demux_min_length=demux_min_length, markers_ignore=markers_ignore, algorithm=algorithm, collapse_mismatches=collapse_mismatches, collapse_min_count=collapse_min_count, collapse_use_counts=collapse_use_counts, multiplet_recovery=multiplet_recovery, min_size=min_size, max_size=max_size, dynamic_filter=dynamic_filter, aggregate_calling=aggregate_calling, skip_analysis=skip_analysis, compute_polarization=compute_polarization, compute_colocalization=compute_colocalization, use_full_bipartite=use_full_bipartite, polarization_transformation=polarization_transformation, polarization_n_permutations=polarization_n_permutations, polarization_min_marker_count=polarization_min_marker_count, colocalization_transformation=colocalization_transformation, colocalization_neighbourhood_size=colocalization_neighbourhood_size, colocalization_n_permutations=colocalization_n_permutations, colocalization_min_region_count=colocalization_min_region_count, skip_layout=skip_layout, no_node_marker_counts=no_node_marker_counts, layout_algorithm=layout_algorithm, skip_report=skip_report, pixelator_container=pixelator_container, read_chunks=read_chunks, intermediate_codec=intermediate_codec, cohort_index=cohort_index, analysis_sweep=sweep, resume=resume, eager_cleanup=eager_cleanup, pinned_container=pinned_container)
+
 
+startup.imported()
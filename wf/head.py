@@ -0,0 +1,133 @@
+"""
+Size the Nextflow head (the runtime task) and its JVM from the workload.
+
+The memory of the head grows with the number of tasks it tracks: task
+records, the cache DB, the trace and the channels between processes. The
+number of tasks is counted from the samplesheet and the options of the run
+and the smallest head in `HEAD_SIZES` that fits it is picked.
+
+The JVM gets `HEAP_RATIO` of the container memory as maximum heap. The rest
+is left for metaspace, thread stacks and direct buffers of the JVM and for
+the Python process of the runtime task with its log streaming, publishing
+and cleanup threads. G1 keeps pauses short on the long lived heap of a long
+run and an OutOfMemoryError exits the JVM instead of leaving it thrashing in
+GC until the run times out.
+"""
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .cleanup import expected_tasks
+from .samplesheet import group_by_sample, read_samplesheet
+
+GiB = 1024**3
+
+HEAP_RATIO = 0.6
+MIN_HEAP_BYTES = 1 * GiB
+
+CGROUP = Path("/sys/fs/cgroup")
+
+
+@dataclass(frozen=True)
+class HeadSize:
+    name: str
+    cpus: int
+    memory_gib: int
+    # Largest expected task count this size is used for, None for no limit
+    max_tasks: Optional[int]
+
+
+HEAD_SIZES = (
+    HeadSize("small", cpus=2, memory_gib=4, max_tasks=100),
+    HeadSize("medium", cpus=4, memory_gib=8, max_tasks=1000),
+    HeadSize("large", cpus=8, memory_gib=16, max_tasks=5000),
+    HeadSize("xlarge", cpus=16, memory_gib=32, max_tasks=None),
+)
+
+# Resources of the default runtime task and of the metadata of the workflow
+DEFAULT_HEAD = HEAD_SIZES[1]
+
+
+def count_tasks(
+    samplesheet: Path,
+    read_chunks: int = 1,
+    parameter_sets: int = 1,
+    skip_analysis: bool = False,
+    skip_layout: bool = False,
+    skip_report: bool = False,
+    cohort_index: bool = False,
+) -> Tuple[int, int, int]:
+    """(samples, lanes, expected tasks) of a run"""
+    samples = group_by_sample(read_samplesheet(samplesheet))
+    lanes = sum(len(rows) for rows in samples.values())
+
+    per_sample = sum(
+        expected_tasks(
+            read_chunks,
+            parameter_sets,
+            skip_analysis,
+            skip_layout,
+            skip_report,
+            cohort_index,
+        ).values()
+    )
+    cat_fastq = sum(1 for rows in samples.values() if len(rows) > 1)
+    # LIST_OPTIONS, COLLECT_METADATA and the sweep summary
+    fixed = 3
+
+    return len(samples), lanes, len(samples) * per_sample + cat_fastq + fixed
+
+
+def choose_head(tasks: int) -> HeadSize:
+    for size in HEAD_SIZES:
+        if size.max_tasks is None or tasks <= size.max_tasks:
+            return size
+    return HEAD_SIZES[-1]
+
+
+def _read_int(path: Path) -> Optional[int]:
+    try:
+        value = path.read_text().split()[0]
+    except (OSError, IndexError):
+        return None
+    return None if value == "max" else int(value)
+
+
+def container_limits(cgroup: Path = CGROUP) -> Tuple[int, int]:
+    """(memory bytes, cpus) available to this container, from the cgroup limits if set"""
+    # cgroup v2, then v1
+    memory = _read_int(cgroup / "memory.max") or _read_int(
+        cgroup / "memory/memory.limit_in_bytes"
+    )
+    if memory is None or memory >= 1 << 60:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+    cpus = os.cpu_count() or 1
+    try:
+        quota, period = (cgroup / "cpu.max").read_text().split()
+        if quota != "max":
+            cpus = max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        quota = _read_int(cgroup / "cpu/cpu.cfs_quota_us")
+        period = _read_int(cgroup / "cpu/cpu.cfs_period_us")
+        if quota is not None and quota > 0 and period:
+            cpus = max(1, quota // period)
+
+    return memory, cpus
+
+
+def jvm_options(memory_bytes: int, cpus: int) -> str:
+    heap_mib = max(MIN_HEAP_BYTES, int(memory_bytes * HEAP_RATIO)) // 1024**2
+    return " ".join(
+        [
+            f"-Xms{heap_mib // 4}M",
+            f"-Xmx{heap_mib}M",
+            "-XX:+UseG1GC",
+            "-XX:MaxGCPauseMillis=500",
+            "-XX:+UseStringDeduplication",
+            "-XX:+ExitOnOutOfMemoryError",
+            f"-XX:ActiveProcessorCount={cpus}",
+        ]
+    )
@@ -0,0 +1,360 @@
+"""
+Download the inputs referenced by the samplesheet to the shared volume
+before Nextflow starts.
+
+Nextflow stages remote inputs one task at a time, so a sample with many
+lanes waits on serial downloads before CAT_FASTQ can run. Prefetching
+downloads every FASTQ and panel file up front on a bounded thread pool that
+shares one pooled HTTP session, then writes a copy of the samplesheet that
+points at the local files.
+
+`latch://` paths are fetched through a presigned URL, `http(s)://` URLs
+directly and local paths are copied, so everything but the URL signing can
+be run against a local HTTP server or directory.
+
+A download is written to `<dest>.part` and resumed with a range request
+after a failure or on the next run. A completed download is checked against
+the expected size and, when the ETag is a plain MD5 digest, the MD5 of the
+content. Completed downloads are recorded in `<dest>.prefetch.json` and
+skipped on the next run if the source size and ETag did not change.
+
+Local copies keep the file name and the modification time of the source so
+`-resume` of a run with prefetched inputs hits the cache.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .samplesheet import (
+    PATH_COLUMNS,
+    get_data_basedir,
+    read_samplesheet,
+    resolve_rows,
+    write_samplesheet,
+)
+
+CHUNK_BYTES = 8 * 1024**2
+
+_md5_etag_re = re.compile(r'^"?([0-9a-f]{32})"?$')
+
+
+class PrefetchError(RuntimeError):
+    pass
+
+
+@dataclass
+class PrefetchResult:
+    source: str
+    dest: str
+    size: int
+    bytes_downloaded: int
+    resumed: bool
+    skipped: bool
+    verified: str
+
+
+@dataclass
+class PrefetchSummary:
+    files: int
+    bytes_total: int
+    bytes_downloaded: int
+    files_resumed: int
+    files_skipped: int
+    elapsed_seconds: float
+
+    @property
+    def throughput(self) -> Optional[float]:
+        if self.elapsed_seconds <= 0 or self.bytes_downloaded == 0:
+            return None
+        return self.bytes_downloaded / self.elapsed_seconds
+
+    def summary(self) -> str:
+        rate = (
+            ""
+            if self.throughput is None
+            else f" ({self.throughput / 1024**2:.1f} MiB/s)"
+        )
+        return (
+            f"Prefetched {self.files} input files ({self.bytes_total / 1024**3:.2f} GiB) in {self.elapsed_seconds:.1f}s: "
+            f"{self.bytes_downloaded / 1024**3:.2f} GiB downloaded{rate}, "
+            f"{self.files_resumed} resumed, {self.files_skipped} already present"
+        )
+
+
+def make_session(max_workers: int, retries: int = 3) -> requests.Session:
+    """One connection pool for all workers so connections to the same host are reused"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retries
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def signed_url(path: str) -> str:
+    from latch_cli import tinyrequests
+    from latch_cli.utils import get_auth_header
+    from latch_cli.utils.path import normalize_path
+    from latch_sdk_config.latch import config as latch_config
+
+    res = tinyrequests.post(
+        latch_config.api.data.get_signed_url,
+        headers={"Authorization": get_auth_header()},
+        json={"path": normalize_path(path)},
+    )
+    if res.status_code != 200:
+        raise PrefetchError(
+            f"failed to get a download URL for {path}: {res.status_code}"
+        )
+    return res.json()["data"]["url"]
+
+
+def local_name(source: str) -> str:
+    """Unique relative destination of a source, keeping its file name for Nextflow"""
+    digest = hashlib.sha1(source.encode()).hexdigest()[:12]
+    return f"{digest}/{Path(urlparse(source).path).name}"
+
+
+def _md5_of(path: Path) -> "hashlib._Hash":
+    h = hashlib.md5()
+    if path.exists():
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_BYTES):
+                h.update(chunk)
+    return h
+
+
+def _expected_md5(etag: Optional[str]) -> Optional[str]:
+    # Multipart upload ETags (`<hash>-<parts>`) are not the MD5 of the content
+    match = _md5_etag_re.match(etag or "")
+    return match.group(1) if match else None
+
+
+def _read_marker(dest: Path) -> Optional[dict]:
+    marker = dest.with_name(dest.name + ".prefetch.json")
+    if not marker.exists() or not dest.exists():
+        return None
+    return json.loads(marker.read_text())
+
+
+def _write_marker(dest: Path, values: dict) -> None:
+    dest.with_name(dest.name + ".prefetch.json").write_text(json.dumps(values))
+
+
+def _fetch_http(
+    session: requests.Session, url: str, source: str, dest: Path
+) -> PrefetchResult:
+    head = session.head(url, allow_redirects=True)
+    if head.status_code == 403:
+        # Presigned URLs are often only signed for GET
+        head = session.get(url, headers={"Range": "bytes=0-0"}, stream=True)
+        head.close()
+    head.raise_for_status()
+
+    etag = head.headers.get("ETag")
+    size = _total_size(head)
+
+    marker = _read_marker(dest)
+    if marker is not None and marker.get("size") == size and marker.get("etag") == etag:
+        return PrefetchResult(
+            source,
+            str(dest),
+            dest.stat().st_size,
+            0,
+            False,
+            True,
+            marker.get("verified", "size"),
+        )
+
+    part = dest.with_name(dest.name + ".part")
+    offset = part.stat().st_size if part.exists() else 0
+    if size is not None and offset > size:
+        part.unlink()
+        offset = 0
+
+    h = _md5_of(part) if offset else hashlib.md5()
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    downloaded = 0
+    with session.get(url, headers=headers, stream=True) as res:
+        if res.status_code == 416 and size is not None and offset == size:
+            pass
+        else:
+            res.raise_for_status()
+            if offset and res.status_code != 206:
+                # The server ignored the range, start over
+                offset = 0
+                h = hashlib.md5()
+            with open(part, "ab" if offset else "wb") as f:
+                for chunk in res.iter_content(CHUNK_BYTES):
+                    f.write(chunk)
+                    h.update(chunk)
+                    downloaded += len(chunk)
+
+    actual = part.stat().st_size
+    if size is not None and actual != size:
+        raise PrefetchError(f"{source}: downloaded {actual} bytes, expected {size}")
+
+    verified = "size"
+    expected_md5 = _expected_md5(etag)
+    if expected_md5 is not None:
+        if h.hexdigest() != expected_md5:
+            part.unlink()
+            raise PrefetchError(
+                f"{source}: MD5 mismatch, expected {expected_md5}, got {h.hexdigest()}"
+            )
+        verified = "md5"
+
+    _keep_mtime(part, head.headers.get("Last-Modified"))
+    part.replace(dest)
+    _write_marker(
+        dest, {"source": source, "size": size, "etag": etag, "verified": verified}
+    )
+    return PrefetchResult(
+        source, str(dest), actual, downloaded, offset > 0, False, verified
+    )
+
+
+def _keep_mtime(path: Path, last_modified: Optional[str]) -> None:
+    # Nextflow hashes input files by path, size and mtime: the same source must
+    # get the same mtime on every download for -resume to hit the cache
+    if last_modified is None:
+        return
+    ts = parsedate_to_datetime(last_modified).timestamp()
+    os.utime(path, (ts, ts))
+
+
+def _total_size(res: requests.Response) -> Optional[int]:
+    content_range = res.headers.get("Content-Range")
+    if content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    length = res.headers.get("Content-Length")
+    return int(length) if length is not None else None
+
+
+def _fetch_local(path: Path, source: str, dest: Path) -> PrefetchResult:
+    size = path.stat().st_size
+    mtime_ns = path.stat().st_mtime_ns
+
+    marker = _read_marker(dest)
+    if (
+        marker is not None
+        and marker.get("size") == size
+        and marker.get("mtime_ns") == mtime_ns
+    ):
+        return PrefetchResult(source, str(dest), size, 0, False, True, "size")
+
+    part = dest.with_name(dest.name + ".part")
+    offset = part.stat().st_size if part.exists() else 0
+    if offset > size:
+        offset = 0
+
+    with open(path, "rb") as src, open(part, "ab" if offset else "wb") as dst:
+        src.seek(offset)
+        shutil.copyfileobj(src, dst, CHUNK_BYTES)
+
+    actual = part.stat().st_size
+    if actual != size:
+        raise PrefetchError(f"{source}: copied {actual} bytes, expected {size}")
+
+    os.utime(part, ns=(mtime_ns, mtime_ns))
+    part.replace(dest)
+    _write_marker(
+        dest, {"source": source, "size": size, "mtime_ns": mtime_ns, "verified": "size"}
+    )
+    return PrefetchResult(
+        source, str(dest), actual, size - offset, offset > 0, False, "size"
+    )
+
+
+def fetch(
+    session: requests.Session, source: str, dest: Path, attempts: int = 3
+) -> PrefetchResult:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    parsed = urlparse(source)
+    if parsed.scheme not in ("", "file", "http", "https", "latch"):
+        raise PrefetchError(f"unsupported input location: {source}")
+
+    for attempt in range(1, attempts + 1):
+        try:
+            if parsed.scheme in ("", "file"):
+                return _fetch_local(Path(parsed.path), source, dest)
+            # Presigned URLs expire, get a fresh one for every attempt
+            url = signed_url(source) if parsed.scheme == "latch" else source
+            return _fetch_http(session, url, source, dest)
+        except (requests.RequestException, OSError, PrefetchError) as e:
+            if attempt == attempts:
+                raise
+            print(f"Retrying {source} after attempt {attempt} failed: {e}")
+            time.sleep(2**attempt)
+
+    raise AssertionError("unreachable")
+
+
+def prefetch_samplesheet(
+    samplesheet: Path,
+    samplesheet_uri: str,
+    input_basedir: Optional[str],
+    dest_dir: Path,
+    out_samplesheet: Path,
+    max_workers: int = 16,
+) -> Tuple[PrefetchSummary, List[PrefetchResult]]:
+    """Download every file of the samplesheet to `dest_dir` and write a samplesheet pointing at the copies"""
+    rows = resolve_rows(
+        read_samplesheet(samplesheet), get_data_basedir(samplesheet_uri, input_basedir)
+    )
+
+    sources = list(
+        dict.fromkeys(
+            getattr(r, c) for r in rows for c in PATH_COLUMNS if getattr(r, c)
+        )
+    )
+    dests: Dict[str, Path] = {s: dest_dir / local_name(s) for s in sources}
+
+    start = time.monotonic()
+    results: List[PrefetchResult] = []
+    if sources:
+        with make_session(max_workers) as session, ThreadPoolExecutor(
+            max_workers=min(max_workers, len(sources))
+        ) as pool:
+            results = list(pool.map(lambda s: fetch(session, s, dests[s]), sources))
+    elapsed = time.monotonic() - start
+
+    for row in rows:
+        for column in PATH_COLUMNS:
+            value = getattr(row, column)
+            if value:
+                setattr(row, column, str(dests[value]))
+    out_samplesheet.parent.mkdir(parents=True, exist_ok=True)
+    write_samplesheet(rows, out_samplesheet)
+
+    summary = PrefetchSummary(
+        files=len(results),
+        bytes_total=sum(r.size for r in results),
+        bytes_downloaded=sum(r.bytes_downloaded for r in results),
+        files_resumed=sum(r.resumed for r in results),
+        files_skipped=sum(r.skipped for r in results),
+        elapsed_seconds=elapsed,
+    )
+    (dest_dir / "prefetch.json").write_text(
+        json.dumps(
+            {"summary": asdict(summary), "results": [asdict(r) for r in results]},
+            indent=4,
+        )
+    )
+    return summary, results
@@ -0,0 +1,317 @@
+"""
+Validate the samplesheet and its inputs before any storage is provisioned.
+
+Runs the checks Nextflow would only make after booting, and collects every
+problem instead of stopping at the first one:
+
+- each row against `assets/schema_input.json`,
+- lanes of a sample must agree on endedness and panel, and every sample
+  needs a `panel` or a `panel_file`,
+- every FASTQ and panel file exists; FASTQs must be larger than an empty
+  gzip member and start with the gzip magic bytes, read with a range request
+  on the presigned URL of `latch://` paths,
+- `design` and `panel` against the options of `pixelator single-cell
+  --list-designs/--list-panels`.
+
+Options that have no effect with the others, such as `intermediate_codec`
+without `read_chunks`, are reported as warnings.
+
+The pixelator options are read from a cache keyed by the container image:
+entries are saved by the runtime from the PIXELATOR_LIST_OPTIONS task of a
+finished run, and `assets/pixelator_options/` has a bundled copy for the
+default image. Without an entry for the image the option check is skipped.
+"""
+
+import hashlib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Set, Tuple
+from urllib.parse import urlparse
+
+from .prefetch import make_session, signed_url
+from .samplesheet import (
+    SamplesheetRow,
+    get_data_basedir,
+    group_by_sample,
+    path_sizes,
+    read_samplesheet,
+    resolve_rows,
+)
+
+DEFAULT_CONTAINER = "biocontainers/pixelator:0.17.1--pyhdfd78af_0"
+BUNDLED_OPTIONS = (
+    Path(__file__).resolve().parent.parent / "assets" / "pixelator_options"
+)
+OPTION_FILES = ("design_options.txt", "panel_options.txt")
+
+# `intermediate_codec` in nextflow.config
+DEFAULT_CODEC = "fast"
+
+# An empty gzip member is 20 bytes
+MIN_FASTQ_BYTES = 20
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+@dataclass
+class PreflightError:
+    line: Optional[int]
+    column: Optional[str]
+    message: str
+
+    def __str__(self) -> str:
+        where = []
+        if self.line is not None:
+            where.append(f"line {self.line}")
+        if self.column is not None:
+            where.append(self.column)
+        return f"[{', '.join(where)}] {self.message}" if where else self.message
+
+
+class PreflightFailed(ValueError):
+    def __init__(self, errors: Sequence[PreflightError]):
+        self.errors = list(errors)
+        super().__init__(
+            f"Samplesheet preflight found {len(self.errors)} problem(s):\n"
+            + "\n".join(f"  {e}" for e in self.errors)
+        )
+
+
+def _check_value(value: Optional[str], schema: dict) -> bool:
+    if "anyOf" in schema:
+        return any(_check_value(value, s) for s in schema["anyOf"])
+    if value is None:
+        return True
+    if "pattern" in schema and re.search(schema["pattern"], value) is None:
+        return False
+    if "maxLength" in schema and len(value) > schema["maxLength"]:
+        return False
+    return True
+
+
+def validate_schema(
+    rows: Sequence[SamplesheetRow], schema: dict
+) -> List[PreflightError]:
+    """The subset of JSON schema used by schema_input.json; empty cells count as missing."""
+    items = schema["items"]
+    errors = []
+    for row in rows:
+        values = row.as_dict()
+        for column in items.get("required", []):
+            if values.get(column) is None:
+                errors.append(PreflightError(row.line, column, f"{column} is required"))
+
+        for column, prop in items.get("properties", {}).items():
+            if not _check_value(values.get(column), prop):
+                errors.append(
+                    PreflightError(
+                        row.line, column, prop.get("errorMessage", f"invalid {column}")
+                    )
+                )
+    return errors
+
+
+def validate_samples(rows: Sequence[SamplesheetRow]) -> List[PreflightError]:
+    errors = []
+    for sample, lanes in group_by_sample(rows).items():
+        if sample is None:
+            continue
+        first = lanes[0]
+
+        if len({len(r.fastqs) for r in lanes}) > 1:
+            errors.append(
+                PreflightError(
+                    first.line,
+                    None,
+                    f"multiple runs of sample {sample} must all be single-end or all paired-end",
+                )
+            )
+        if len({(r.panel, r.panel_file) for r in lanes}) > 1:
+            errors.append(
+                PreflightError(
+                    first.line,
+                    None,
+                    f"concatenated lanes of sample {sample} must use the same panel",
+                )
+            )
+
+        for row in lanes:
+            if row.panel is None and row.panel_file is None:
+                errors.append(
+                    PreflightError(
+                        row.line,
+                        "panel",
+                        "either panel or panel_file must be specified",
+                    )
+                )
+    return errors
+
+
+def _read_head(path: str, n: int, session=None) -> Optional[bytes]:
+    """The first `n` bytes of a file, None if they can not be read"""
+    parsed = urlparse(path)
+    if parsed.scheme in ("", "file"):
+        with open(parsed.path, "rb") as f:
+            return f.read(n)
+    if parsed.scheme not in ("latch", "http", "https") or session is None:
+        return None
+
+    try:
+        url = signed_url(path) if parsed.scheme == "latch" else path
+        with session.get(
+            url, headers={"Range": f"bytes=0-{n - 1}"}, stream=True, timeout=60
+        ) as res:
+            if res.status_code not in (200, 206):
+                return None
+            # Servers without range support send the whole file
+            return res.raw.read(n)
+    except Exception as e:
+        print(f"Failed to read the first bytes of {path}: {e}")
+        return None
+
+
+def validate_files(
+    resolved: Sequence[SamplesheetRow], max_workers: int = 16
+) -> List[PreflightError]:
+    checks: List[Tuple[int, str, str]] = []
+    for row in resolved:
+        for column in ("fastq_1", "fastq_2", "panel_file"):
+            path = getattr(row, column)
+            if path:
+                checks.append((row.line, column, path))
+
+    sizes = path_sizes((p for _, _, p in checks), max_workers=max_workers)
+    fastqs = sorted({p for _, c, p in checks if c != "panel_file" and sizes.get(p)})
+    workers = max(1, min(max_workers, len(fastqs)))
+    with make_session(workers) as session, ThreadPoolExecutor(workers) as pool:
+        heads = dict(
+            zip(
+                fastqs,
+                pool.map(lambda p: _read_head(p, len(GZIP_MAGIC), session), fastqs),
+            )
+        )
+
+    errors = []
+    for line, column, path in checks:
+        size = sizes.get(path)
+        if size is None:
+            if urlparse(path).scheme in ("", "file", "latch"):
+                errors.append(PreflightError(line, column, f"{path} does not exist"))
+            continue
+        if column == "panel_file":
+            continue
+        if size < MIN_FASTQ_BYTES:
+            errors.append(
+                PreflightError(
+                    line,
+                    column,
+                    f"{path} is too small to be a gzipped FASTQ ({size} bytes)",
+                )
+            )
+        elif heads.get(path) not in (None, GZIP_MAGIC):
+            errors.append(
+                PreflightError(line, column, f"{path} is not gzip compressed")
+            )
+    return errors
+
+
+def options_key(container: Optional[str]) -> str:
+    return hashlib.sha1((container or DEFAULT_CONTAINER).encode()).hexdigest()[:16]
+
+
+def _parse_options(text: str) -> Set[str]:
+    return {line.strip() for line in text.splitlines() if line.strip()}
+
+
+def load_options(
+    remote, container: Optional[str]
+) -> Optional[Tuple[Set[str], Set[str]]]:
+    """Cached (designs, panels) for the container, None if unknown"""
+    key = options_key(container)
+    texts = [remote.read_text(f"{key}/{name}") for name in OPTION_FILES]
+    if None in texts and (container or DEFAULT_CONTAINER) == DEFAULT_CONTAINER:
+        texts = [(BUNDLED_OPTIONS / name).read_text() for name in OPTION_FILES]
+    if None in texts:
+        return None
+    designs, panels = (_parse_options(t) for t in texts)
+    return designs, panels
+
+
+def save_options(remote, container: Optional[str], work_dir: Path) -> bool:
+    """Store the outputs of a successful PIXELATOR_LIST_OPTIONS task"""
+    for designs in work_dir.glob(f"??/*/{OPTION_FILES[0]}"):
+        task_dir = designs.parent
+        exitcode = task_dir / ".exitcode"
+        if not exitcode.exists() or exitcode.read_text().strip() != "0":
+            continue
+
+        key = options_key(container)
+        for name in OPTION_FILES:
+            remote.write_text(f"{key}/{name}", (task_dir / name).read_text())
+        return True
+    return False
+
+
+def validate_options(
+    rows: Sequence[SamplesheetRow], designs: Set[str], panels: Set[str]
+) -> List[PreflightError]:
+    errors = []
+    for row in rows:
+        if row.design is not None and row.design not in designs:
+            errors.append(
+                PreflightError(
+                    row.line,
+                    "design",
+                    f"unknown design {row.design!r}, valid options: {', '.join(sorted(designs))}",
+                )
+            )
+        if row.panel is not None and row.panel not in panels:
+            errors.append(
+                PreflightError(
+                    row.line,
+                    "panel",
+                    f"unknown panel {row.panel!r}, valid options: {', '.join(sorted(panels))}",
+                )
+            )
+    return errors
+
+
+def check_samplesheet(
+    samplesheet: Path,
+    samplesheet_uri: str,
+    input_basedir: Optional[str],
+    schema: Path,
+    options: Optional[Tuple[Set[str], Set[str]]],
+) -> List[PreflightError]:
+    rows = read_samplesheet(samplesheet)
+    if not rows:
+        return [PreflightError(None, None, "samplesheet has no rows")]
+
+    errors = validate_schema(rows, json.loads(Path(schema).read_text()))
+    errors += validate_samples(rows)
+    if options is not None:
+        errors += validate_options(rows, *options)
+    else:
+        print(
+            "No cached pixelator options for this container, skipping design and panel checks"
+        )
+
+    resolved = resolve_rows(rows, get_data_basedir(samplesheet_uri, input_basedir))
+    errors += validate_files(resolved)
+
+    return sorted(errors, key=lambda e: (e.line or 0, e.column or ""))
+
+
+def check_options(
+    read_chunks: Optional[int], intermediate_codec: Optional[str]
+) -> List[str]:
+    """Warnings for run options that have no effect"""
+    warnings = []
+    if (read_chunks or 1) <= 1 and intermediate_codec not in (None, DEFAULT_CODEC):
+        warnings.append(
+            f"intermediate_codec {intermediate_codec!r} has no effect without"
+            " read_chunks > 1, it only sets the compression of the read chunks"
+        )
+    return warnings
@@ -0,0 +1,345 @@
+"""
+Per-process performance profile built from the Nextflow execution trace.
+
+The runtime launches Nextflow with the trace fields listed in `latch.config`
+and `trace.raw = true` (times in ms, memory in bytes), but the parser also
+accepts the human readable format of the default trace file.
+
+The critical path is reconstructed from the timestamps: walking back from
+the last task to complete, the predecessor of a task is the task that
+completed last before it was submitted, preferring tasks of the same sample.
+
+The pull times of the container prewarm, which runs next to the Nextflow
+head, are added to the profile when its report is available.
+"""
+
+import csv
+import html
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from statistics import mean
+from typing import Dict, List, Optional, Tuple
+
+_units = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3, "TB": 1024**4}
+_durations = {
+    "ms": 1,
+    "s": 1000,
+    "m": 60 * 1000,
+    "h": 60 * 60 * 1000,
+    "d": 24 * 60 * 60 * 1000,
+}
+_duration_re = re.compile(r"([\d.]+)\s*(ms|s|m|h|d)")
+
+
+def _missing(value: Optional[str]) -> bool:
+    return value is None or value.strip() in ("", "-")
+
+
+def parse_bytes(value: Optional[str]) -> Optional[int]:
+    if _missing(value):
+        return None
+    value = value.strip()
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    number, unit = value.split()
+    return int(float(number) * _units[unit.upper()])
+
+
+def parse_duration(value: Optional[str]) -> Optional[int]:
+    """Duration in ms"""
+    if _missing(value):
+        return None
+    value = value.strip()
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    return int(sum(float(n) * _durations[u] for n, u in _duration_re.findall(value)))
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[int]:
+    """Epoch ms"""
+    if _missing(value):
+        return None
+    value = value.strip()
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    return int(datetime.strptime(value, "%Y-%m-%d %H:%M:%S.%f").timestamp() * 1000)
+
+
+def parse_percent(value: Optional[str]) -> Optional[float]:
+    if _missing(value):
+        return None
+    return float(value.strip().rstrip("%"))
+
+
+@dataclass
+class TraceRecord:
+    task_id: int
+    name: str
+    process: str
+    sample: Optional[str]
+    status: str
+    cpus: Optional[int]
+    submit: Optional[int]
+    start: Optional[int]
+    complete: Optional[int]
+    realtime: Optional[int]
+    pcpu: Optional[float]
+    peak_rss: Optional[int]
+    # All bytes read and written through syscalls, page cache hits included
+    rchar: Optional[int]
+    wchar: Optional[int]
+    # Bytes actually read from and written to storage
+    read_bytes: Optional[int] = None
+    write_bytes: Optional[int] = None
+
+    @property
+    def queue_ms(self) -> Optional[int]:
+        if self.submit is None or self.start is None:
+            return None
+        return max(self.start - self.submit, 0)
+
+    @property
+    def cpu_efficiency(self) -> Optional[float]:
+        if self.pcpu is None or not self.cpus:
+            return None
+        return self.pcpu / (100 * self.cpus)
+
+
+def _sample(row: Dict[str, str]) -> Optional[str]:
+    tag = row.get("tag")
+    if not _missing(tag):
+        return tag.strip()
+    # `name` is `PROCESS (tag)` when no tag column was requested
+    match = re.search(r"\((.+)\)$", row.get("name", ""))
+    return match.group(1) if match else None
+
+
+def parse_trace(path: Path) -> List[TraceRecord]:
+    records = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            name = row.get("name", "")
+            process = row.get("process") or name.split(" (")[0]
+            cpus = row.get("cpus")
+            records.append(
+                TraceRecord(
+                    task_id=int(row["task_id"]),
+                    name=name,
+                    process=process.split(":")[-1],
+                    sample=_sample(row),
+                    status=row.get("status", ""),
+                    cpus=None if _missing(cpus) else int(cpus),
+                    submit=parse_timestamp(row.get("submit")),
+                    start=parse_timestamp(row.get("start")),
+                    complete=parse_timestamp(row.get("complete")),
+                    realtime=parse_duration(row.get("realtime")),
+                    pcpu=parse_percent(row.get("%cpu")),
+                    peak_rss=parse_bytes(row.get("peak_rss")),
+                    rchar=parse_bytes(row.get("rchar")),
+                    wchar=parse_bytes(row.get("wchar")),
+                    read_bytes=parse_bytes(row.get("read_bytes")),
+                    write_bytes=parse_bytes(row.get("write_bytes")),
+                )
+            )
+    return records
+
+
+def _aggregate(records: List[TraceRecord]) -> dict:
+    def values(attr: str) -> list:
+        return [v for v in (getattr(r, attr) for r in records) if v is not None]
+
+    realtime = values("realtime")
+    queue = values("queue_ms")
+    rss = values("peak_rss")
+    efficiency = values("cpu_efficiency")
+
+    return {
+        "tasks": len(records),
+        "failed": sum(r.status not in ("COMPLETED", "CACHED") for r in records),
+        "realtime_ms": sum(realtime),
+        "max_realtime_ms": max(realtime, default=None),
+        "queue_ms": sum(queue),
+        "peak_rss": max(rss, default=None),
+        "cpu_efficiency": mean(efficiency) if efficiency else None,
+        "rchar": sum(values("rchar")),
+        "wchar": sum(values("wchar")),
+        "read_bytes": sum(values("read_bytes")),
+        "write_bytes": sum(values("write_bytes")),
+    }
+
+
+def critical_path(records: List[TraceRecord]) -> List[TraceRecord]:
+    done = [r for r in records if r.submit is not None and r.complete is not None]
+    if not done:
+        return []
+
+    path = [max(done, key=lambda r: r.complete)]
+    while True:
+        cur = path[-1]
+        candidates = [r for r in done if r.complete <= cur.submit]
+        if not candidates:
+            break
+        same_sample = [r for r in candidates if r.sample == cur.sample]
+        path.append(max(same_sample or candidates, key=lambda r: r.complete))
+
+    return path[::-1]
+
+
+def build_profile(records: List[TraceRecord], prewarm: Optional[dict] = None) -> dict:
+    by_process: Dict[str, List[TraceRecord]] = {}
+    by_sample: Dict[str, Dict[str, List[TraceRecord]]] = {}
+    for r in records:
+        by_process.setdefault(r.process, []).append(r)
+        by_sample.setdefault(r.sample or "-", {}).setdefault(r.process, []).append(r)
+
+    submits = [r.submit for r in records if r.submit is not None]
+    completes = [r.complete for r in records if r.complete is not None]
+
+    path = critical_path(records)
+    steps = {p: _aggregate(rs) for p, rs in by_process.items()}
+
+    res = {
+        "tasks": len(records),
+        "wall_time_ms": (
+            (max(completes) - min(submits)) if submits and completes else None
+        ),
+        "steps": dict(sorted(steps.items(), key=lambda kv: -kv[1]["realtime_ms"])),
+        "samples": {
+            s: {p: _aggregate(rs) for p, rs in ps.items()}
+            for s, ps in sorted(by_sample.items())
+        },
+        "critical_path": [
+            {
+                "name": r.name,
+                "process": r.process,
+                "sample": r.sample,
+                "queue_ms": r.queue_ms,
+                "realtime_ms": r.realtime,
+            }
+            for r in path
+        ],
+        "critical_path_ms": (path[-1].complete - path[0].submit) if path else None,
+    }
+    if prewarm is not None:
+        # The report of wf/containers.py: image, nodes_requested, elapsed_seconds, pulls, error
+        res["container_prewarm"] = prewarm
+    return res
+
+
+def _fmt(key: str, value) -> str:
+    if value is None:
+        return "-"
+    if key.endswith("_ms"):
+        return f"{value / 1000:.1f} s"
+    if key.endswith("_seconds"):
+        return f"{value:.1f} s"
+    if key in ("peak_rss", "rchar", "wchar", "read_bytes", "write_bytes"):
+        return f"{value / 1024**3:.2f} GiB"
+    if key == "cpu_efficiency":
+        return f"{value * 100:.0f}%"
+    return str(value)
+
+
+def _table(rows: List[Tuple[str, dict]], first: str) -> str:
+    if not rows:
+        return "<p>No tasks</p>"
+    keys = list(rows[0][1].keys())
+    head = "".join(f"<th>{html.escape(k)}</th>" for k in [first, *keys])
+    body = "".join(
+        "<tr>"
+        + f"<td>{html.escape(str(label))}</td>"
+        + "".join(f"<td>{html.escape(_fmt(k, v.get(k)))}</td>" for k in keys)
+        + "</tr>"
+        for label, v in rows
+    )
+    return f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>"
+
+
+def render_html(profile: dict) -> str:
+    sections = [
+        "<h1>nf-core/pixelator performance profile</h1>",
+        f"<p>{profile['tasks']} tasks, wall time {_fmt('_ms', profile['wall_time_ms'])}, "
+        f"critical path {_fmt('_ms', profile['critical_path_ms'])}</p>",
+        "<h2>Steps</h2>",
+        _table(list(profile["steps"].items()), "process"),
+        "<h2>Critical path</h2>",
+        _table(
+            [
+                (c["name"], {k: v for k, v in c.items() if k != "name"})
+                for c in profile["critical_path"]
+            ],
+            "task",
+        ),
+    ]
+    for sample, steps in profile["samples"].items():
+        sections.append(f"<h2>Sample {html.escape(sample)}</h2>")
+        sections.append(_table(list(steps.items()), "process"))
+
+    prewarm = profile.get("container_prewarm")
+    if prewarm is not None:
+        sections.append("<h2>Container prewarm</h2>")
+        sections.append(f"<p>{html.escape(prewarm['image'])}</p>")
+        if prewarm.get("error"):
+            sections.append(f"<p>Skipped: {html.escape(prewarm['error'])}</p>")
+        sections.append(
+            _table(
+                [
+                    (
+                        p["node"] or p["pod"],
+                        {"status": p["status"], "pull_seconds": p["pull_seconds"]},
+                    )
+                    for p in prewarm["pulls"]
+                ],
+                "node",
+            )
+        )
+
+    style = "table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:2px 6px;text-align:right}"
+    return f"<!DOCTYPE html><html><head><meta charset='utf-8'><style>{style}</style></head><body>{''.join(sections)}</body></html>"
+
+
+def collect_codec_stats(work_dir: Path) -> Dict[str, Dict[str, dict]]:
+    """Time and bytes of the intermediate codecs per stage and codec, from the `*.codec.json` of each task"""
+    stats: Dict[str, Dict[str, dict]] = {}
+    for path in sorted(work_dir.glob("??/*/*.codec.json")):
+        task = json.loads(path.read_text())
+        entry = stats.setdefault(task["stage"], {}).setdefault(
+            task["codec"],
+            {"tasks": 0, "records": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0},
+        )
+        entry["tasks"] += 1
+        for key in ("records", "bytes_in", "bytes_out", "seconds"):
+            entry[key] += task[key]
+
+    for codecs in stats.values():
+        for entry in codecs.values():
+            entry["bytes_per_record"] = (
+                entry["bytes_out"] / entry["records"] if entry["records"] else None
+            )
+            entry["records_per_second"] = (
+                entry["records"] / entry["seconds"] if entry["seconds"] else None
+            )
+    return stats
+
+
+def write_profile(
+    trace: Path, out_dir: Path, prewarm: Optional[dict] = None
+) -> List[Path]:
+    profile = build_profile(parse_trace(trace), prewarm)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    json_path = out_dir / "performance_profile.json"
+    html_path = out_dir / "performance_profile.html"
+    json_path.write_text(json.dumps(profile, indent=4))
+    html_path.write_text(render_html(profile))
+
+    return [json_path, html_path]
@@ -0,0 +1,334 @@
+"""
+Publish the pipeline results to `outdir` while the run is going.
+
+The runtime points Nextflow's `--outdir` at a directory on the shared volume
+and publishes with `--publish_dir_mode link`, so `publishDir` only creates
+hard links and never copies data on the critical path of a task. A
+background thread scans that directory every `interval` seconds and uploads
+new or changed files to the real `outdir` on a thread pool. Large files are
+split in parts and uploaded in parallel by Latch Data.
+
+A file is uploaded once its size and mtime are unchanged between two scans.
+Its SHA-256 is compared to the manifest of the previous run in
+`pipeline_info/publish_manifest.json`: files with the same digest that are
+still present in `outdir` with the same size are not uploaded again.
+
+The manifest lists every published file with its size, digest and the
+Nextflow process that produced it, found through the inode of the hard link
+and the `hash` column of the execution trace. It is written when the run
+ends, also when it fails.
+
+Runs of a batch of the per-sample fan-out share `outdir` with the other
+batches. With a `prefix`, the files every run writes (`RUN_FILES`: pipeline
+info, report index, metadata) and the manifest are published below the
+prefix instead, and combined by the gather step of the fan-out.
+"""
+
+import fnmatch
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from .cleanup import is_hollow
+from .streaming import Tail, _Lines
+from .sync import file_digest
+
+MANIFEST = "pipeline_info/publish_manifest.json"
+
+# Files written by every run rather than per sample
+RUN_FILES = ("pipeline_info/*", "pixelator/report_index.*", "pixelator/metadata.json")
+
+
+@dataclass
+class PublishedFile:
+    path: str
+    size: int
+    sha256: str
+    step: Optional[str] = None
+
+
+@dataclass
+class PublishReport:
+    files_total: int = 0
+    files_uploaded: int = 0
+    files_skipped: int = 0
+    bytes_uploaded: int = 0
+    bytes_skipped: int = 0
+    failed: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"Published {self.files_total} files: {self.files_uploaded} uploaded "
+            f"({self.bytes_uploaded / 1024**3:.2f} GiB), {self.files_skipped} unchanged "
+            f"({self.bytes_skipped / 1024**3:.2f} GiB)"
+            + (f", {self.failed} failed" if self.failed else "")
+        )
+
+
+class StepIndex:
+    """
+    Map task outputs to the process that wrote them, by (device, inode).
+
+    Follows the execution trace and indexes the files of every task as it
+    completes, before intermediate files can be cleaned up.
+    """
+
+    def __init__(self, work_dir: Path, trace: Optional[Path]):
+        self.work_dir = work_dir
+        self.tail = Tail(trace) if trace is not None else None
+        self.lines = _Lines()
+        self.header: Optional[List[str]] = None
+        self.steps: Dict[Tuple[int, int], str] = {}
+
+    def update(self) -> None:
+        if self.tail is None:
+            return
+
+        for line in self.lines.feed(self.tail.read_new()):
+            cols = line.split("\t")
+            if self.header is None:
+                self.header = cols
+                continue
+
+            row = dict(zip(self.header, cols))
+            if not row.get("hash") or not row.get("process") or "/" not in row["hash"]:
+                continue
+            prefix, rest = row["hash"].split("/", 1)
+            for task_dir in self.work_dir.glob(f"{prefix}/{rest}*"):
+                self._index(task_dir, row["process"].split(":")[-1])
+
+    def _index(self, task_dir: Path, process: str) -> None:
+        for root, _, files in os.walk(task_dir):
+            for name in files:
+                path = Path(root) / name
+                if path.is_symlink():
+                    # Staged inputs
+                    continue
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                self.steps[(st.st_dev, st.st_ino)] = process
+
+    def get(self, path: Path) -> Optional[str]:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        return self.steps.get((st.st_dev, st.st_ino))
+
+
+class Publisher:
+    def __init__(
+        self,
+        local: Path,
+        remote,
+        work_dir: Path,
+        trace: Optional[Path] = None,
+        max_workers: int = 8,
+        interval: float = 30,
+        prefix: Optional[str] = None,
+    ):
+        self.local = local
+        self.remote = remote
+        self.prefix = prefix
+        self.interval = interval
+        self.steps = StepIndex(work_dir, trace)
+        self.report = PublishReport()
+
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="publish"
+        )
+        self._pending: Dict[str, Future] = {}
+        # rel -> (size, mtime_ns) seen on the previous scan
+        self._seen: Dict[str, Tuple[int, int]] = {}
+        # rel -> (size, mtime_ns) of the version that was published
+        self._published: Dict[str, Tuple[int, int]] = {}
+        self._files: Dict[str, PublishedFile] = {}
+        self._previous: Dict[str, PublishedFile] = {}
+        # remote rel -> local path
+        self._local: Dict[str, Path] = {}
+        self._failed: Set[str] = set()
+        self._uploaded: Set[Tuple[int, int]] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="publisher", daemon=True)
+
+    def __enter__(self) -> "Publisher":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def remote_path(self, rel: str) -> str:
+        """Location of a published file in outdir"""
+        if self.prefix is not None and any(fnmatch.fnmatch(rel, p) for p in RUN_FILES):
+            return f"{self.prefix}/{rel}"
+        return rel
+
+    def start(self) -> None:
+        text = self.remote.read_text(self.remote_path(MANIFEST))
+        if text is not None:
+            self._previous = {
+                f["path"]: PublishedFile(**f) for f in json.loads(text)["files"]
+            }
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        # Nextflow has exited, everything in the directory is final.
+        # The second pass retries files that failed to upload.
+        for _ in range(2):
+            self.scan(settle=False)
+            for future in list(self._pending.values()):
+                future.result()
+        self._pool.shutdown()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"Failed to publish results: {e}")
+
+    def scan(self, settle: bool = True) -> None:
+        self.steps.update()
+        if not self.local.exists():
+            return
+
+        for root, _, files in os.walk(self.local):
+            for name in files:
+                path = Path(root) / name
+                rel = str(path.relative_to(self.local))
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    # Replaced by Nextflow since the directory was listed
+                    continue
+                state = (st.st_size, st.st_mtime_ns)
+
+                previous = self._seen.get(rel)
+                self._seen[rel] = state
+                if self._published.get(rel) == state:
+                    continue
+                # Wait for files that are still being written to settle
+                if settle and previous != state:
+                    continue
+                pending = self._pending.get(rel)
+                if pending is not None and not pending.done():
+                    continue
+
+                self._published[rel] = state
+                self._pending[rel] = self._pool.submit(self._publish, path, rel)
+
+    def is_published(self, path: Path) -> bool:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return False
+        return (st.st_dev, st.st_ino) in self._uploaded
+
+    def _vanished(self, local_rel: str) -> None:
+        # Removed or renamed since the scan, a new version is published by
+        # the next scan
+        with self._lock:
+            self._published.pop(local_rel, None)
+
+    def _publish(self, path: Path, local_rel: str) -> None:
+        try:
+            self._publish_file(path, local_rel)
+        except FileNotFoundError:
+            self._vanished(local_rel)
+
+    def _publish_file(self, path: Path, local_rel: str) -> None:
+        rel = self.remote_path(local_rel)
+        with self._lock:
+            self._local[rel] = path
+        st = path.stat()
+        size = st.st_size
+        if is_hollow(st):
+            # Released by the cleaner in a previous run and restored by the
+            # resume cache without content, the upload of that run is kept.
+            # Without it in outdir the file can not be published.
+            previous = self._previous.get(rel)
+            if previous is None or self.remote.size(rel) != previous.size:
+                print(
+                    f"Failed to publish {rel}: its content was released by a previous run"
+                )
+                with self._lock:
+                    self._failed.add(rel)
+                    self.report.failed = len(self._failed)
+                    self._published.pop(local_rel, None)
+                return
+
+            with self._lock:
+                self._failed.discard(rel)
+                self.report.failed = len(self._failed)
+                if rel not in self._files:
+                    self.report.files_total += 1
+                    self.report.files_skipped += 1
+                    self.report.bytes_skipped += previous.size
+                self._files[rel] = previous
+            return
+
+        digest = file_digest(path)
+        entry = PublishedFile(
+            path=rel, size=size, sha256=digest, step=self.steps.get(path)
+        )
+
+        previous = self._previous.get(rel)
+        unchanged = (
+            previous is not None
+            and previous.sha256 == digest
+            and previous.size == size
+            and self.remote.size(rel) == size
+        )
+        try:
+            if not unchanged:
+                self.remote.upload(path, rel)
+        except Exception as e:
+            if not path.exists():
+                self._vanished(local_rel)
+                return
+            print(f"Failed to publish {rel}: {e}")
+            with self._lock:
+                self._failed.add(rel)
+                self.report.failed = len(self._failed)
+                self._published.pop(local_rel, None)
+            return
+
+        with self._lock:
+            self._uploaded.add((st.st_dev, st.st_ino))
+            self._failed.discard(rel)
+            self.report.failed = len(self._failed)
+            if rel not in self._files:
+                self.report.files_total += 1
+            self._files[rel] = entry
+            if unchanged:
+                self.report.files_skipped += 1
+                self.report.bytes_skipped += size
+            else:
+                self.report.files_uploaded += 1
+                self.report.bytes_uploaded += size
+
+    def write_manifest(self) -> List[PublishedFile]:
+        files = sorted(self._files.values(), key=lambda f: f.path)
+        for f in files:
+            if f.step is None:
+                f.step = self.steps.get(self._local.get(f.path, self.local / f.path))
+
+        manifest = {
+            "updated": time.time(),
+            "files": [asdict(f) for f in files],
+        }
+        self.remote.write_text(
+            self.remote_path(MANIFEST), json.dumps(manifest, indent=4)
+        )
+        return files
@@ -0,0 +1,144 @@
+"""
+Minimal file store used for artifacts that outlive the shared volume.
+
+`LatchRemote` is backed by Latch Data, `LocalRemote` by a local directory so
+the code using it can be run without Latch credentials.
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import urlparse
+
+
+class LocalRemote:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def __repr__(self) -> str:
+        return f"LocalRemote({str(self.root)!r})"
+
+    def url(self, rel: str) -> str:
+        return str(self.root / rel)
+
+    def exists(self, rel: str) -> bool:
+        return (self.root / rel).exists()
+
+    def size(self, rel: str) -> Optional[int]:
+        path = self.root / rel
+        return path.stat().st_size if path.is_file() else None
+
+    def listdir(self, rel: str) -> List[str]:
+        path = self.root / rel
+        return sorted(p.name for p in path.iterdir()) if path.is_dir() else []
+
+    def upload(self, src: Path, rel: str) -> None:
+        dst = self.root / rel
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(dst.name + ".part")
+        shutil.copyfile(src, tmp)
+        tmp.replace(dst)
+
+    def download(self, rel: str, dst: Path) -> None:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(self.root / rel, dst)
+
+    def remove(self, rel: str) -> None:
+        path = self.root / rel
+        if path.is_dir():
+            shutil.rmtree(path)
+        elif path.exists():
+            path.unlink()
+
+    def read_text(self, rel: str) -> Optional[str]:
+        path = self.root / rel
+        return path.read_text() if path.exists() else None
+
+    def write_text(self, rel: str, text: str) -> None:
+        dst = self.root / rel
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(dst.name + ".part")
+        tmp.write_text(text)
+        tmp.replace(dst)
+
+
+class LatchRemote:
+    def __init__(self, root: str):
+        self.root = root.rstrip("/")
+
+    def __repr__(self) -> str:
+        return f"LatchRemote({self.root!r})"
+
+    def url(self, rel: str) -> str:
+        from latch_cli.utils import urljoins
+
+        return urljoins(self.root, rel)
+
+    def _lpath(self, rel: str):
+        from latch.ldata.path import LPath
+
+        return LPath(self.url(rel))
+
+    def exists(self, rel: str) -> bool:
+        return self.size(rel) is not None or self._is_dir(rel)
+
+    def _is_dir(self, rel: str) -> bool:
+        from latch.ldata.type import LatchPathError
+
+        try:
+            return self._lpath(rel).is_dir()
+        except LatchPathError:
+            return False
+
+    def size(self, rel: str) -> Optional[int]:
+        from latch.ldata.type import LatchPathError
+
+        try:
+            return self._lpath(rel).size()
+        except LatchPathError:
+            return None
+
+    def listdir(self, rel: str) -> List[str]:
+        if not self._is_dir(rel):
+            return []
+        return sorted(p.name() for p in self._lpath(rel).iterdir())
+
+    def upload(self, src: Path, rel: str) -> None:
+        self._lpath(rel).upload_from(src)
+
+    def download(self, rel: str, dst: Path) -> None:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        self._lpath(rel).download(dst)
+
+    def remove(self, rel: str) -> None:
+        from latch.ldata.type import LatchPathError
+
+        try:
+            self._lpath(rel).rmr()
+        except LatchPathError:
+            pass
+
+    def read_text(self, rel: str) -> Optional[str]:
+        if self.size(rel) is None:
+            return None
+
+        with tempfile.TemporaryDirectory() as tmp:
+            dst = Path(tmp) / "data"
+            self.download(rel, dst)
+            return dst.read_text()
+
+    def write_text(self, rel: str, text: str) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            src = Path(tmp) / Path(rel).name
+            src.write_text(text)
+            self.upload(src, rel)
+
+
+def remote_dir(url: str):
+    scheme = urlparse(url).scheme
+    if scheme == "latch":
+        return LatchRemote(url)
+    if scheme in ("", "file"):
+        return LocalRemote(Path(urlparse(url).path))
+    raise ValueError(f"unsupported remote location: {url}")
@@ -0,0 +1,259 @@
+"""
+Predict per-task memory and CPU requests from the traces of previous runs.
+
+Every run records, for each completed pixelator task, the input FASTQ bytes
+of its sample with the observed peak RSS and CPU usage. Before the next
+launch a size-to-resource model is fitted per process and the predictions
+for the samples of the run are written to the JSON file read by
+`predicted_resource` in `nextflow.config`:
+
+    {"<PROCESS>": {"<sample>": {"memory": <bytes>, "cpus": <n>}}}
+
+Processes with too few observations get no prediction and keep the
+requests of their label in `conf/base.config`. With `--read_chunks` the qc
+and demux tasks read one chunk of their sample, so they are recorded and
+predicted with the chunk's share of the input bytes.
+
+Every run writes its observations to a file of its own under `runs/`, so
+the batches of a per-sample fan-out that finish together do not overwrite
+each other. Loading keeps the most recent `max_per_process` observations of
+every process and recording drops files with none of them left.
+
+Memory is a least squares line through (input bytes, peak RSS), shifted up
+by the largest residual so none of the observed tasks would have been
+under-provisioned, times a headroom factor. CPUs are the 90th percentile of
+the observed usage (%cpu / 100). Usage can not exceed the allocation, so a
+task that used at least `SATURATED` of its CPUs counts as needing all of
+them and the prediction never drops below an allocation the tasks filled.
+"""
+
+import json
+import math
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from .profile import TraceRecord
+from .samplesheet import (
+    get_data_basedir,
+    group_by_sample,
+    path_sizes,
+    read_samplesheet,
+    resolve_rows,
+)
+
+GiB = 1024**3
+
+# Observations of every run, one file each
+RUNS = "runs"
+# Single file of all observations written by earlier versions, still read
+HISTORY = "observations.json"
+
+# Processes that run once per read chunk with --read_chunks
+CHUNKED = ("PIXELATOR_QC", "PIXELATOR_DEMUX")
+
+# Fraction of the allocated CPUs above which a task was limited by its allocation
+SATURATED = 0.85
+
+
+@dataclass
+class Observation:
+    process: str
+    input_bytes: int
+    peak_rss: int
+    cpus_used: Optional[float]
+    recorded: float
+    cpus_allocated: Optional[int] = None
+
+    @property
+    def cpus_needed(self) -> Optional[float]:
+        if (
+            self.cpus_used is not None
+            and self.cpus_allocated
+            and self.cpus_used >= SATURATED * self.cpus_allocated
+        ):
+            return max(self.cpus_used, self.cpus_allocated)
+        return self.cpus_used
+
+
+@dataclass
+class ResourceModel:
+    slope: float
+    intercept: float
+    max_residual: float
+    cpus: Optional[int]
+    n: int
+
+    def memory(self, input_bytes: int, headroom: float, min_bytes: int) -> int:
+        predicted = self.intercept + self.slope * input_bytes + self.max_residual
+        return max(min_bytes, int(math.ceil(predicted * headroom)))
+
+
+def sample_input_bytes(
+    samplesheet: Path, samplesheet_uri: str, input_basedir: Optional[str]
+) -> Dict[str, Optional[int]]:
+    rows = resolve_rows(
+        read_samplesheet(samplesheet),
+        get_data_basedir(samplesheet_uri, input_basedir),
+    )
+    sizes = path_sizes(fq for row in rows for fq in row.fastqs)
+
+    res: Dict[str, Optional[int]] = {}
+    for sample, lanes in group_by_sample(rows).items():
+        lane_sizes = [sizes.get(fq) for row in lanes for fq in row.fastqs]
+        res[sample] = None if None in lane_sizes else sum(lane_sizes)
+    return res
+
+
+def task_input_bytes(process: str, sample_bytes: int, read_chunks: int = 1) -> int:
+    """Input bytes of one task of `process` for a sample of `sample_bytes`"""
+    if process in CHUNKED and read_chunks > 1:
+        return sample_bytes // read_chunks
+    return sample_bytes
+
+
+def collect_observations(
+    records: Sequence[TraceRecord],
+    input_bytes: Dict[str, Optional[int]],
+    read_chunks: int = 1,
+) -> List[Observation]:
+    now = time.time()
+    res = []
+    for r in records:
+        if r.status != "COMPLETED" or r.peak_rss is None:
+            continue
+        size = input_bytes.get(r.sample)
+        if size is None:
+            continue
+        res.append(
+            Observation(
+                process=r.process,
+                input_bytes=task_input_bytes(r.process, size, read_chunks),
+                peak_rss=r.peak_rss,
+                cpus_used=None if r.pcpu is None else r.pcpu / 100,
+                recorded=now,
+                cpus_allocated=r.cpus,
+            )
+        )
+    return res
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(math.ceil(q * len(values))) - 1)]
+
+
+def fit(
+    observations: Sequence[Observation], min_observations: int = 3
+) -> Dict[str, ResourceModel]:
+    by_process: Dict[str, List[Observation]] = {}
+    for o in observations:
+        by_process.setdefault(o.process, []).append(o)
+
+    models = {}
+    for process, obs in by_process.items():
+        if len(obs) < min_observations:
+            continue
+
+        xs = [o.input_bytes for o in obs]
+        ys = [o.peak_rss for o in obs]
+        x_mean = sum(xs) / len(xs)
+        y_mean = sum(ys) / len(ys)
+        var = sum((x - x_mean) ** 2 for x in xs)
+
+        if var == 0:
+            slope = 0.0
+        else:
+            # Peak memory never shrinks with the input size
+            slope = max(
+                0.0, sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / var
+            )
+        intercept = y_mean - slope * x_mean
+        max_residual = max(y - (intercept + slope * x) for x, y in zip(xs, ys))
+
+        used = [o.cpus_needed for o in obs if o.cpus_needed is not None]
+        cpus = max(1, int(math.ceil(_percentile(used, 0.9)))) if used else None
+
+        models[process] = ResourceModel(
+            slope=slope,
+            intercept=intercept,
+            max_residual=max_residual,
+            cpus=cpus,
+            n=len(obs),
+        )
+    return models
+
+
+def predict(
+    models: Dict[str, ResourceModel],
+    input_bytes: Dict[str, Optional[int]],
+    read_chunks: int = 1,
+    headroom: float = 1.2,
+    min_bytes: int = 1 * GiB,
+) -> Dict[str, Dict[str, dict]]:
+    res: Dict[str, Dict[str, dict]] = {}
+    for process, model in models.items():
+        for sample, size in input_bytes.items():
+            if size is None:
+                continue
+            size = task_input_bytes(process, size, read_chunks)
+            prediction = {"memory": model.memory(size, headroom, min_bytes)}
+            if model.cpus is not None:
+                prediction["cpus"] = model.cpus
+            res.setdefault(process, {})[sample] = prediction
+    return res
+
+
+@dataclass
+class ResourceHistory:
+    remote: object
+    max_per_process: int = 500
+
+    def _runs(self) -> Dict[str, List[Observation]]:
+        """Observations by the file they were read from"""
+        files = [f"{RUNS}/{name}" for name in self.remote.listdir(RUNS)]
+        res = {}
+        for rel in [HISTORY, *files]:
+            text = self.remote.read_text(rel)
+            if text is not None:
+                res[rel] = [Observation(**o) for o in json.loads(text)]
+        return res
+
+    def _recent(self, runs: Dict[str, List[Observation]]) -> List[Observation]:
+        by_process: Dict[str, List[Observation]] = {}
+        observations = [o for obs in runs.values() for o in obs]
+        for o in sorted(observations, key=lambda o: o.recorded):
+            by_process.setdefault(o.process, []).append(o)
+        return [o for obs in by_process.values() for o in obs[-self.max_per_process :]]
+
+    def load(self) -> List[Observation]:
+        return self._recent(self._runs())
+
+    def record(self, observations: Sequence[Observation]) -> None:
+        if not observations:
+            return
+
+        rel = f"{RUNS}/{time.time_ns()}-{uuid.uuid4().hex[:8]}.json"
+        self.remote.write_text(rel, json.dumps([asdict(o) for o in observations]))
+        print(f"Recorded {len(observations)} resource observations")
+
+        runs = self._runs()
+        recent = {id(o) for o in self._recent(runs)}
+        for stale, obs in runs.items():
+            if not any(id(o) in recent for o in obs):
+                self.remote.remove(stale)
+
+    def write_predictions(
+        self, input_bytes: Dict[str, Optional[int]], path: Path, read_chunks: int = 1
+    ) -> Dict[str, Dict[str, dict]]:
+        models = fit(self.load())
+        predictions = predict(models, input_bytes, read_chunks)
+        path.write_text(json.dumps(predictions, indent=4))
+
+        for process, model in sorted(models.items()):
+            print(
+                f"  {process}: {model.n} observations, {model.slope:.3f} B/B + {model.intercept / GiB:.1f} GiB, cpus {model.cpus}"
+            )
+        return predictions
@@ -0,0 +1,206 @@
+"""
+Cross-execution Nextflow resume cache.
+
+Every execution runs on a freshly provisioned volume, so `-resume` has
+nothing to resume from. This keeps the launch directory `.nextflow` (cache
+DB and history) and the work directories of successfully completed tasks in
+a remote store, keyed by the samplesheet SHA-1 and the parameters that
+affect results, and restores them before the next launch.
+
+Layout under the cache root:
+
+    index.json                      {key: {"last_used": <epoch>, "size": <bytes>}}
+    <key>/nextflow.tar              launch dir `.nextflow`
+    <key>/tasks.json                {"<xx>/<hash>": <archive bytes>}
+    <key>/work/<xx>/<hash>.tar      one archive per completed task directory
+
+Entries are evicted least recently used first once the total size exceeds
+the budget. Concurrent executions sharing a root may lose index updates,
+which only makes eviction less precise.
+"""
+
+import hashlib
+import json
+import re
+import shutil
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from .cleanup import hollowed_files, restore_hollowed
+
+# Flags that do not change task results. The samplesheet is hashed instead of
+# `input`, and `input_basedir` is only passed when the inputs are not prefetched.
+IGNORED_PARAMS = ("input", "input_basedir", "outdir", "email")
+
+INDEX = "index.json"
+
+_task_dir_re = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{30}$")
+
+
+def samplesheet_sha(samplesheet: Path) -> str:
+    # Same digest as params.samplesheet_sha in workflows/pixelator.nf
+    return hashlib.sha1(Path(samplesheet).read_bytes()).hexdigest()
+
+
+def strip_flags(flags: Sequence[str], names: Sequence[str]) -> List[str]:
+    drop = {f"--{n}" for n in names}
+    out: List[str] = []
+    skip_value = False
+    for flag in flags:
+        if skip_value:
+            skip_value = False
+            if not flag.startswith("--"):
+                continue
+        if flag in drop:
+            skip_value = True
+            continue
+        out.append(flag)
+    return out
+
+
+def cache_key(
+    samplesheet: Path, flags: Sequence[str], outdir: Optional[str] = None
+) -> str:
+    """
+    `outdir` is only part of the key when given: with eager cleanup the
+    restored outputs can be hollow and are only complete in the outdir the
+    entry was saved for.
+    """
+    sha = samplesheet_sha(samplesheet)
+    params = strip_flags(flags, IGNORED_PARAMS)
+    if outdir is not None:
+        params += ["--outdir", outdir]
+    digest = hashlib.sha1(json.dumps(params).encode()).hexdigest()
+    return f"{sha[:16]}-{digest[:16]}"
+
+
+def completed_task_dirs(work_dir: Path) -> List[str]:
+    res = []
+    for exitcode in work_dir.glob("??/*/.exitcode"):
+        rel = exitcode.parent.relative_to(work_dir).as_posix()
+        if _task_dir_re.match(rel) is None:
+            continue
+        if exitcode.read_text().strip() == "0":
+            res.append(rel)
+    return sorted(res)
+
+
+def _pack(src: Path, arcname: str, dst: Path) -> int:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    # Outputs released by the cleaner are recreated from `.hollowed.json` on restore
+    hollowed = {f"{arcname}/{rel}" for rel in hollowed_files(src)}
+
+    def skip_hollowed(info: tarfile.TarInfo) -> Optional[tarfile.TarInfo]:
+        return None if info.name in hollowed else info
+
+    # Staged inputs are symlinks into upstream task directories, keep them as is
+    with tarfile.open(dst, "w") as tar:
+        tar.add(src, arcname=arcname, filter=skip_hollowed)
+    return dst.stat().st_size
+
+
+def _unpack(src: Path, dst: Path) -> None:
+    with tarfile.open(src, "r") as tar:
+        # The archives are written by `_pack` and trusted. Task directories hold
+        # absolute symlinks to staged inputs, which the `data` filter rejects.
+        if hasattr(tarfile, "fully_trusted_filter"):
+            tar.extractall(dst, filter="fully_trusted")
+        else:
+            tar.extractall(dst)
+
+
+@dataclass
+class ResumeCache:
+    remote: object
+    key: str
+    budget_bytes: int
+    max_workers: int = 8
+
+    def _load_json(self, rel: str) -> dict:
+        text = self.remote.read_text(rel)
+        return {} if text is None else json.loads(text)
+
+    def _touch(self, size: Optional[int] = None) -> Dict[str, dict]:
+        index = self._load_json(INDEX)
+        entry = index.setdefault(self.key, {"size": 0})
+        entry["last_used"] = time.time()
+        if size is not None:
+            entry["size"] = size
+        return index
+
+    def restore(self, launch_dir: Path, work_dir: Path, staging: Path) -> bool:
+        tasks = self._load_json(f"{self.key}/tasks.json")
+        if not tasks or not self.remote.exists(f"{self.key}/nextflow.tar"):
+            return False
+
+        def fetch(rel: str) -> None:
+            archive = staging / f"{rel}.tar"
+            self.remote.download(f"{self.key}/work/{rel}.tar", archive)
+            _unpack(archive, work_dir / Path(rel).parent)
+            restore_hollowed(work_dir / rel)
+            archive.unlink()
+
+        try:
+            archive = staging / "nextflow.tar"
+            self.remote.download(f"{self.key}/nextflow.tar", archive)
+            _unpack(archive, launch_dir)
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                list(pool.map(fetch, tasks))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self.remote.write_text(INDEX, json.dumps(self._touch(), indent=2))
+        print(f"Restored {len(tasks)} cached task directories for {self.key}")
+        return True
+
+    def save(self, launch_dir: Path, work_dir: Path, staging: Path) -> None:
+        if not (launch_dir / ".nextflow").exists():
+            return
+
+        tasks: Dict[str, int] = self._load_json(f"{self.key}/tasks.json")
+        new = [rel for rel in completed_task_dirs(work_dir) if rel not in tasks]
+
+        def store(rel: str) -> int:
+            archive = staging / f"{rel}.tar"
+            size = _pack(work_dir / rel, Path(rel).name, archive)
+            self.remote.upload(archive, f"{self.key}/work/{rel}.tar")
+            archive.unlink()
+            return size
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                tasks.update(zip(new, pool.map(store, new)))
+
+            archive = staging / "nextflow.tar"
+            nextflow_size = _pack(launch_dir / ".nextflow", ".nextflow", archive)
+            self.remote.upload(archive, f"{self.key}/nextflow.tar")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self.remote.write_text(f"{self.key}/tasks.json", json.dumps(tasks))
+
+        index = self._touch(size=sum(tasks.values()) + nextflow_size)
+        self._evict(index)
+        self.remote.write_text(INDEX, json.dumps(index, indent=2))
+
+        print(f"Saved {len(new)} new task directories to resume cache {self.key}")
+
+    def _evict(self, index: Dict[str, dict]) -> None:
+        total = sum(e["size"] for e in index.values())
+        for key, entry in sorted(index.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= self.budget_bytes:
+                break
+            if key == self.key:
+                continue
+
+            print(
+                f"Evicting resume cache entry {key} ({entry['size'] / 1024**3:.1f} GiB)"
+            )
+            self.remote.remove(key)
+            total -= entry["size"]
+            del index[key]
@@ -0,0 +1,151 @@
+"""
+Read the pixelator samplesheet outside of Nextflow.
+
+Relative paths are resolved the same way as `get_data_basedir` and
+`resolve_relative_path` in `subworkflows/local/utils_nfcore_pixelator_pipeline`.
+"""
+
+import csv
+import posixpath
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+
+@dataclass
+class SamplesheetRow:
+    line: int
+    sample: Optional[str]
+    design: Optional[str] = None
+    panel: Optional[str] = None
+    panel_file: Optional[str] = None
+    fastq_1: Optional[str] = None
+    fastq_2: Optional[str] = None
+
+    @property
+    def fastqs(self) -> List[str]:
+        return [fq for fq in (self.fastq_1, self.fastq_2) if fq]
+
+    def as_dict(self) -> Dict[str, Optional[str]]:
+        return {
+            "sample": self.sample,
+            "design": self.design,
+            "panel": self.panel,
+            "panel_file": self.panel_file,
+            "fastq_1": self.fastq_1,
+            "fastq_2": self.fastq_2,
+        }
+
+
+COLUMNS = ("sample", "design", "panel", "panel_file", "fastq_1", "fastq_2")
+PATH_COLUMNS = ("panel_file", "fastq_1", "fastq_2")
+
+
+def _delimiter(path: Path) -> str:
+    return "\t" if path.suffix == ".tsv" else ","
+
+
+def read_samplesheet(path: Path) -> List[SamplesheetRow]:
+    path = Path(path)
+    rows = []
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f, delimiter=_delimiter(path))
+        for line, record in enumerate(reader, start=2):
+            values = {k: (record.get(k) or "").strip() or None for k in COLUMNS}
+            rows.append(SamplesheetRow(line=line, **values))
+
+    return rows
+
+
+def write_samplesheet(rows: Iterable[SamplesheetRow], path: Path) -> None:
+    path = Path(path)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, delimiter=_delimiter(path))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: v or "" for k, v in row.as_dict().items()})
+
+
+def group_by_sample(
+    rows: Iterable[SamplesheetRow],
+) -> "OrderedDict[str, List[SamplesheetRow]]":
+    """Group lanes by sample id, keeping the samplesheet order."""
+    groups: "OrderedDict[str, List[SamplesheetRow]]" = OrderedDict()
+    for row in rows:
+        groups.setdefault(row.sample, []).append(row)
+    return groups
+
+
+def get_data_basedir(samplesheet: str, input_basedir: Optional[str]) -> str:
+    """
+    Determine the path/url used as the root for relative samplesheet paths.
+
+    Without `input_basedir` paths are relative to the samplesheet itself.
+    """
+    if not input_basedir:
+        return samplesheet
+    if not input_basedir.endswith("/"):
+        return input_basedir + "/"
+    return input_basedir
+
+
+def resolve_path(path: Optional[str], basedir: str) -> Optional[str]:
+    if not path:
+        return path
+    if urlparse(path).scheme != "" or posixpath.isabs(path):
+        return path
+
+    # Same semantics as java.net.URI.resolve: a basedir without a trailing
+    # slash refers to a file and its last component is dropped
+    parsed = urlparse(basedir)
+    root = (
+        parsed.path if basedir.endswith("/") else posixpath.dirname(parsed.path) + "/"
+    )
+    resolved = posixpath.normpath(posixpath.join(root, path))
+
+    if parsed.scheme == "":
+        return resolved
+    return f"{parsed.scheme}://{parsed.netloc}{resolved}"
+
+
+def resolve_rows(rows: Iterable[SamplesheetRow], basedir: str) -> List[SamplesheetRow]:
+    resolved = []
+    for row in rows:
+        values = row.as_dict()
+        for k in PATH_COLUMNS:
+            values[k] = resolve_path(values[k], basedir)
+        resolved.append(SamplesheetRow(line=row.line, **values))
+    return resolved
+
+
+def path_size(path: str) -> Optional[int]:
+    """Size in bytes of a local or `latch://` path, None if unknown."""
+    parsed = urlparse(path)
+
+    if parsed.scheme == "latch":
+        from latch.ldata.path import LPath
+        from latch.ldata.type import LatchPathError
+
+        try:
+            return LPath(path).size()
+        except LatchPathError:
+            return None
+
+    if parsed.scheme in ("", "file"):
+        local = Path(parsed.path)
+        return local.stat().st_size if local.is_file() else None
+
+    return None
+
+
+def path_sizes(paths: Iterable[str], max_workers: int = 16) -> Dict[str, Optional[int]]:
+    # Remote size lookups are one network round-trip each
+    paths = list(OrderedDict.fromkeys(paths))
+    if not paths:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as pool:
+        return dict(zip(paths, pool.map(path_size, paths)))
@@ -0,0 +1,68 @@
+"""
+Cold start of a task: the time from the start of the Python process to the
+import of the entrypoint module (interpreter and task runner startup), the
+import itself (Latch SDK, flytekit, the workflow metadata and the task and
+workflow definitions) and the start of the task function.
+
+This module is imported first by the entrypoint so the import time covers
+everything after it.
+"""
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+_import_started = time.monotonic()
+_imported: Optional[float] = None
+
+
+def process_age() -> Optional[float]:
+    """Seconds since the start of this process, None where /proc is not available"""
+    try:
+        uptime = float(Path("/proc/uptime").read_text().split()[0])
+        # The command can contain spaces, the fields after it cannot
+        fields = Path("/proc/self/stat").read_text().rsplit(")", 1)[1].split()
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+    return max(0.0, uptime - started)
+
+
+_before_import = process_age()
+
+
+def imported() -> None:
+    global _imported
+    _imported = time.monotonic()
+
+
+def _seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.2f}s"
+
+
+@dataclass
+class StartupTiming:
+    before_import_seconds: Optional[float]
+    import_seconds: Optional[float]
+    # Process start to the start of the task function
+    total_seconds: Optional[float]
+
+    def summary(self) -> str:
+        return (
+            f"Task startup {_seconds(self.total_seconds)}: {_seconds(self.before_import_seconds)} before the "
+            f"entrypoint import, {_seconds(self.import_seconds)} importing it"
+        )
+
+    def write(self, path: Path) -> None:
+        path.write_text(json.dumps(asdict(self), indent=4))
+
+
+def task_started() -> StartupTiming:
+    return StartupTiming(
+        before_import_seconds=_before_import,
+        import_seconds=None if _imported is None else _imported - _import_started,
+        total_seconds=process_age(),
+    )
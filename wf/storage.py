@@ -0,0 +1,175 @@
+"""
+Size and provision the shared Nextflow volume.
+
+The volume has to hold every intermediate of every sample at once, so the
+estimate is the total input FASTQ size scaled by how much each pixelator
+step writes relative to its raw input.
+"""
+
+import json
+import math
+import os
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Dict, Optional
+
+from .samplesheet import (
+    get_data_basedir,
+    group_by_sample,
+    path_sizes,
+    read_samplesheet,
+    resolve_rows,
+)
+
+DISPATCHER_URL = os.environ.get(
+    "NF_DISPATCHER_URL", "http://nf-dispatcher-service.flyte.svc.cluster.local"
+)
+
+GiB = 1024**3
+
+
+@dataclass(frozen=True)
+class ExpansionFactors:
+    """
+    Bytes written by each step per byte of raw input FASTQ.
+
+    Calibrate by comparing the `pipeline_info` trace of a finished run against
+    the input size and dump the result with `to_json`.
+    """
+
+    # CAT_FASTQ copy, only for samples with more than one lane
+    cat_fastq: float = 1.0
+    # PIXELATOR_AMPLICON merged reads
+    amplicon: float = 0.8
+    # PIXELATOR_QC preqc + adapterqc processed/failed reads
+    qc: float = 1.4
+    # PIXELATOR_DEMUX processed/failed reads
+    demux: float = 0.7
+    # PIXELATOR_COLLAPSE parquet
+    collapse: float = 0.3
+    # PIXELATOR_GRAPH edgelist parquet
+    graph: float = 0.3
+    # Each of the ANNOTATE, ANALYSIS and LAYOUT .pxl datasets
+    pxl: float = 0.25
+
+    # Safety margin on top of the estimate
+    headroom: float = 1.3
+    min_gib: int = 50
+    max_gib: int = 4000
+    # Used for inputs whose size can not be looked up
+    fallback_fastq_bytes: int = 5 * GiB
+
+    @classmethod
+    def from_json(cls, path: Path) -> "ExpansionFactors":
+        data = json.loads(Path(path).read_text())
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"unknown expansion factors: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    @classmethod
+    def from_env(cls) -> "ExpansionFactors":
+        path = os.environ.get("PIXELATOR_STORAGE_FACTORS")
+        if path is None:
+            return cls()
+        return cls.from_json(Path(path))
+
+    def to_json(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(asdict(self), indent=4))
+
+
+@dataclass
+class StorageEstimate:
+    input_bytes: int
+    stage_bytes: Dict[str, int]
+    unknown_inputs: int
+    storage_gib: int
+
+    @property
+    def total_bytes(self) -> int:
+        return self.input_bytes + sum(self.stage_bytes.values())
+
+    def summary(self) -> str:
+        lines = [
+            f"  input FASTQ: {self.input_bytes / GiB:.1f} GiB"
+            + (f" ({self.unknown_inputs} unknown size)" if self.unknown_inputs else "")
+        ]
+        for stage, n in self.stage_bytes.items():
+            lines.append(f"  {stage}: {n / GiB:.1f} GiB")
+        lines.append(f"  => requesting {self.storage_gib} GiB")
+        return "\n".join(lines)
+
+
+def estimate_storage(
+    samplesheet: Path,
+    samplesheet_uri: str,
+    input_basedir: Optional[str],
+    factors: Optional[ExpansionFactors] = None,
+) -> StorageEstimate:
+    factors = factors or ExpansionFactors.from_env()
+
+    rows = resolve_rows(
+        read_samplesheet(samplesheet),
+        get_data_basedir(samplesheet_uri, input_basedir),
+    )
+    sizes = path_sizes(fq for row in rows for fq in row.fastqs)
+
+    input_bytes = 0
+    multi_lane_bytes = 0
+    unknown = 0
+    for lanes in group_by_sample(rows).values():
+        sample_bytes = 0
+        for row in lanes:
+            for fq in row.fastqs:
+                size = sizes.get(fq)
+                if size is None:
+                    unknown += 1
+                    size = factors.fallback_fastq_bytes
+                sample_bytes += size
+
+        input_bytes += sample_bytes
+        if len(lanes) > 1:
+            multi_lane_bytes += sample_bytes
+
+    stage_bytes = {
+        "cat_fastq": int(multi_lane_bytes * factors.cat_fastq),
+        "amplicon": int(input_bytes * factors.amplicon),
+        "qc": int(input_bytes * factors.qc),
+        "demux": int(input_bytes * factors.demux),
+        "collapse": int(input_bytes * factors.collapse),
+        "graph": int(input_bytes * factors.graph),
+        "pxl": int(input_bytes * factors.pxl * 3),
+    }
+
+    total = input_bytes + sum(stage_bytes.values())
+    gib = math.ceil(total * factors.headroom / GiB)
+    # Round up to a multiple of 10 so near-identical runs share a volume size
+    gib = int(math.ceil(gib / 10) * 10)
+    gib = max(factors.min_gib, min(factors.max_gib, gib))
+
+    return StorageEstimate(
+        input_bytes=input_bytes,
+        stage_bytes=stage_bytes,
+        unknown_inputs=unknown,
+        storage_gib=gib,
+    )
+
+
+def provision_storage(
+    token: str, storage_gib: int, dispatcher_url: str = DISPATCHER_URL
+) -> str:
+    import requests
+
+    headers = {"Authorization": f"Latch-Execution-Token {token}"}
+
+    resp = requests.post(
+        f"{dispatcher_url}/provision-storage",
+        headers=headers,
+        json={
+            "storage_gib": storage_gib,
+        },
+    )
+    resp.raise_for_status()
+
+    return resp.json()["name"]
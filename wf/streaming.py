@@ -0,0 +1,232 @@
+"""
+Stream the Nextflow log and trace to the log location while the run is going.
+
+A background thread wakes up every `interval` seconds, reads the bytes
+appended to each followed file since the previous pass and uploads only
+those as the next part, `<name>.parts/<n>`, so a pass costs the growth of
+the file and not its size. Concatenating the parts in order gives the file
+as of the last pass. At stop the whole file is uploaded once as `<name>` and
+its parts are removed, leaving one readable copy. The new bytes feed a
+progress tracker, written to `progress.json`:
+
+    {"updated": <epoch>, "samples": {"<sample>": {"completed": [...], "running": [...], "pending": [...], "failed": [...]}}}
+
+Submissions are read from the log, completions and failures from the trace.
+Pending steps are the steps in `STEPS` that have not been submitted yet,
+which includes steps that are skipped for this run.
+"""
+
+import json
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+STEPS = (
+    "PIXELATOR_AMPLICON",
+    "PIXELATOR_QC",
+    "PIXELATOR_DEMUX",
+    "PIXELATOR_COLLAPSE",
+    "PIXELATOR_GRAPH",
+    "PIXELATOR_ANNOTATE",
+    "PIXELATOR_ANALYSIS",
+    "PIXELATOR_LAYOUT",
+    "PIXELATOR_REPORT",
+)
+
+_submitted_re = re.compile(r"(?:Submitted|Cached) process > (\S+) \((.+)\)")
+
+
+class Tail:
+    """Follow a file that is only ever appended to"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.offset = 0
+
+    def read_new(self) -> bytes:
+        if not self.path.exists():
+            return b""
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        self.offset += len(data)
+        return data
+
+    def copy_read(self, dst: Path) -> None:
+        """Copy the bytes returned by `read_new` so far to `dst`"""
+        with open(self.path, "rb") as src, open(dst, "wb") as out:
+            remaining = self.offset
+            while remaining > 0:
+                data = src.read(min(remaining, 1 << 20))
+                if not data:
+                    break
+                out.write(data)
+                remaining -= len(data)
+
+
+class _Lines:
+    """Split a byte stream in complete lines"""
+
+    def __init__(self):
+        self.rest = b""
+
+    def feed(self, data: bytes) -> List[str]:
+        *lines, self.rest = (self.rest + data).split(b"\n")
+        return [line.decode(errors="replace") for line in lines]
+
+
+@dataclass
+class ProgressTracker:
+    samples: Sequence[str] = ()
+    steps: Sequence[str] = STEPS
+    running: Dict[str, set] = field(default_factory=dict)
+    completed: Dict[str, set] = field(default_factory=dict)
+    failed: Dict[str, set] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._log = _Lines()
+        self._trace = _Lines()
+        self._header: Optional[List[str]] = None
+
+    @staticmethod
+    def _add(d: Dict[str, set], sample: str, process: str) -> None:
+        d.setdefault(sample, set()).add(process.split(":")[-1])
+
+    def feed_log(self, data: bytes) -> None:
+        for line in self._log.feed(data):
+            match = _submitted_re.search(line)
+            if match is not None:
+                process, sample = match.groups()
+                self._add(self.running, sample, process)
+
+    def feed_trace(self, data: bytes) -> None:
+        for line in self._trace.feed(data):
+            cols = line.split("\t")
+            if self._header is None:
+                self._header = cols
+                continue
+
+            row = dict(zip(self._header, cols))
+            name = row.get("name", "")
+            process = row.get("process") or name.split(" (")[0]
+            sample = row.get("tag") or (
+                name.split(" (", 1)[1].rstrip(")") if " (" in name else "-"
+            )
+
+            status = row.get("status")
+            if status in ("COMPLETED", "CACHED"):
+                self._add(self.completed, sample, process)
+            elif status in ("FAILED", "ABORTED"):
+                self._add(self.failed, sample, process)
+
+    def snapshot(self) -> dict:
+        samples = list(
+            dict.fromkeys([*self.samples, *self.running, *self.completed, *self.failed])
+        )
+        res = {}
+        for sample in samples:
+            completed = self.completed.get(sample, set())
+            failed = self.failed.get(sample, set())
+            submitted = self.running.get(sample, set())
+            running = submitted - completed - failed
+            res[sample] = {
+                "completed": sorted(completed),
+                "running": sorted(running),
+                "pending": [
+                    s for s in self.steps if s not in submitted | completed | failed
+                ],
+                "failed": sorted(failed),
+            }
+        return {"updated": time.time(), "samples": res}
+
+
+class LogStreamer:
+    def __init__(
+        self,
+        remote,
+        log: Path,
+        trace: Optional[Path] = None,
+        samples: Sequence[str] = (),
+        interval: float = 60,
+    ):
+        self.remote = remote
+        self.interval = interval
+        self.tails = {"nextflow.log": Tail(log)}
+        if trace is not None:
+            self.tails[trace.name] = Tail(trace)
+        self.progress = ProgressTracker(samples=samples)
+
+        self._trace_name = trace.name if trace is not None else None
+        self._parts = {name: 0 for name in self.tails}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="log-streamer", daemon=True
+        )
+
+    def __enter__(self) -> "LogStreamer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        # Final pass and full copies so everything written before exit is
+        # uploaded. The run result does not depend on it, errors are only
+        # reported.
+        try:
+            self.flush()
+            self.upload_copies()
+        except Exception as e:
+            print(f"Failed to stream logs: {e}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Failed to stream logs: {e}")
+
+    def flush(self) -> None:
+        changed = False
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, tail in self.tails.items():
+                data = tail.read_new()
+                if not data:
+                    continue
+
+                changed = True
+                if name == self._trace_name:
+                    self.progress.feed_trace(data)
+                else:
+                    self.progress.feed_log(data)
+
+                self._parts[name] += 1
+                part = Path(tmp) / name
+                part.write_bytes(data)
+                self.remote.upload(part, f"{name}.parts/{self._parts[name]:06d}")
+
+        if changed:
+            self.remote.write_text(
+                "progress.json", json.dumps(self.progress.snapshot(), indent=2)
+            )
+
+    def upload_copies(self) -> None:
+        """Replace the parts of every followed file with one full copy"""
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, tail in self.tails.items():
+                if self._parts[name] == 0:
+                    continue
+                copy = Path(tmp) / name
+                tail.copy_read(copy)
+                self.remote.upload(copy, name)
+                self.remote.remove(f"{name}.parts")
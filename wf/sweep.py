@@ -0,0 +1,50 @@
+"""
+Analysis and layout parameter sets for `--analysis_sweep`.
+
+Unset fields fall back to the pipeline parameters of the run.
+"""
+
+import json
+import re
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional, Sequence
+
+_name_re = re.compile(r"^[\w.-]+$")
+
+
+@dataclass
+class AnalysisParameterSet:
+    name: str
+    compute_polarization: Optional[bool] = None
+    compute_colocalization: Optional[bool] = None
+    use_full_bipartite: Optional[bool] = None
+    polarization_transformation: Optional[str] = None
+    polarization_min_marker_count: Optional[int] = None
+    polarization_n_permutations: Optional[int] = None
+    colocalization_transformation: Optional[str] = None
+    colocalization_neighbourhood_size: Optional[int] = None
+    colocalization_n_permutations: Optional[int] = None
+    colocalization_min_region_count: Optional[int] = None
+    no_node_marker_counts: Optional[bool] = None
+    layout_algorithm: Optional[str] = None
+
+
+def write_sweep(parameter_sets: Sequence[AnalysisParameterSet], path: Path) -> None:
+    if not parameter_sets:
+        raise ValueError("at least one analysis parameter set is required")
+
+    names = [s.name for s in parameter_sets]
+    invalid = [n for n in names if _name_re.match(n) is None]
+    if invalid:
+        raise ValueError(
+            f"parameter set names may only contain letters, digits, '.', '_' and '-': {invalid}"
+        )
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate parameter set names: {duplicates}")
+
+    sets = [
+        {k: v for k, v in asdict(s).items() if v is not None} for s in parameter_sets
+    ]
+    Path(path).write_text(json.dumps(sets, indent=4))
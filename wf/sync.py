@@ -0,0 +1,243 @@
+"""
+Incremental sync of the workflow package onto the shared volume.
+
+A manifest of (path, size, mtime, sha256) is kept next to the synced files.
+Files whose size and mtime match the manifest are trusted without reading
+them, files that only differ in mtime are hashed and everything else is
+copied. Copies and hashes run on a thread pool since the destination is a
+network volume and latency, not bandwidth, dominates for small files.
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+MANIFEST_NAME = ".workspace-manifest.json"
+
+# Patterns are matched against the path relative to the source root.
+# A leading `**/` matches the remainder at any depth.
+DEFAULT_IGNORE = (
+    "latch",
+    ".latch",
+    "nextflow",
+    ".nextflow",
+    ".nextflow.log*",
+    "work",
+    "results",
+    "miniconda",
+    "anaconda3",
+    "mambaforge",
+    ".git",
+    MANIFEST_NAME,
+    "**/__pycache__",
+    "**/*.py[cod]",
+)
+
+
+def is_ignored(rel: str, patterns: Iterable[str]) -> bool:
+    name = rel.rsplit("/", 1)[-1]
+    for pattern in patterns:
+        if pattern.startswith("**/"):
+            if fnmatch.fnmatchcase(name, pattern[3:]) or fnmatch.fnmatchcase(
+                rel, pattern[3:]
+            ):
+                return True
+        elif fnmatch.fnmatchcase(rel, pattern):
+            return True
+    return False
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclass
+class ManifestEntry:
+    size: int
+    mtime_ns: int
+    sha256: Optional[str] = None
+
+
+@dataclass
+class SyncReport:
+    files_total: int = 0
+    files_copied: int = 0
+    bytes_copied: int = 0
+    bytes_skipped: int = 0
+    copy_seconds: float = 0
+    elapsed_seconds: float = 0
+    # Bytes per second, measured on this sync or carried over from the last one
+    throughput: Optional[float] = None
+
+    @property
+    def seconds_saved(self) -> Optional[float]:
+        if not self.throughput:
+            return None
+        return self.bytes_skipped / self.throughput
+
+    def summary(self) -> str:
+        msg = (
+            f"Synced {self.files_total} files in {self.elapsed_seconds:.1f}s: "
+            f"copied {self.files_copied} ({self.bytes_copied / 1e6:.1f} MB), "
+            f"skipped {self.bytes_skipped / 1e6:.1f} MB"
+        )
+        if self.seconds_saved is not None:
+            msg += f" (~{self.seconds_saved:.1f}s saved)"
+        return msg
+
+
+def walk(
+    src: Path, ignore: Sequence[str]
+) -> Iterator[Tuple[str, Path, os.stat_result]]:
+    for root, dirs, files in os.walk(src, followlinks=True):
+        root_path = Path(root)
+        rel_root = root_path.relative_to(src).as_posix()
+        prefix = "" if rel_root == "." else rel_root + "/"
+
+        dirs[:] = sorted(d for d in dirs if not is_ignored(prefix + d, ignore))
+
+        for name in sorted(files):
+            rel = prefix + name
+            if is_ignored(rel, ignore):
+                continue
+
+            path = root_path / name
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                # dangling symlink
+                continue
+
+            yield rel, path, st
+
+
+def load_manifest(dst: Path) -> Tuple[Dict[str, ManifestEntry], Optional[float]]:
+    path = dst / MANIFEST_NAME
+    if not path.exists():
+        return {}, None
+
+    try:
+        data = json.loads(path.read_text())
+        entries = {rel: ManifestEntry(**e) for rel, e in data["files"].items()}
+        return entries, data.get("throughput")
+    except (json.JSONDecodeError, KeyError, TypeError):
+        print(f"Ignoring unreadable sync manifest {path}")
+        return {}, None
+
+
+def write_manifest(
+    dst: Path, entries: Dict[str, ManifestEntry], throughput: Optional[float]
+) -> None:
+    data = {
+        "throughput": throughput,
+        "files": {
+            rel: {"size": e.size, "mtime_ns": e.mtime_ns, "sha256": e.sha256}
+            for rel, e in sorted(entries.items())
+        },
+    }
+    tmp = dst / (MANIFEST_NAME + ".tmp")
+    tmp.write_text(json.dumps(data))
+    tmp.replace(dst / MANIFEST_NAME)
+
+
+@dataclass
+class _Result:
+    rel: str
+    entry: ManifestEntry
+    copied: bool
+    seconds: float = 0
+
+
+def _sync_file(
+    rel: str,
+    src: Path,
+    st: os.stat_result,
+    dst: Path,
+    previous: Optional[ManifestEntry],
+) -> _Result:
+    entry = ManifestEntry(size=st.st_size, mtime_ns=st.st_mtime_ns)
+
+    try:
+        dst_st = dst.stat()
+    except FileNotFoundError:
+        dst_st = None
+
+    if dst_st is not None and dst_st.st_size == st.st_size:
+        if previous is not None and (previous.size, previous.mtime_ns) == (
+            st.st_size,
+            st.st_mtime_ns,
+        ):
+            entry.sha256 = previous.sha256
+            return _Result(rel, entry, copied=False)
+
+        entry.sha256 = file_digest(src)
+        if file_digest(dst) == entry.sha256:
+            return _Result(rel, entry, copied=False)
+
+    start = time.monotonic()
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(src, dst)
+    seconds = time.monotonic() - start
+
+    if entry.sha256 is None:
+        entry.sha256 = file_digest(dst)
+
+    return _Result(rel, entry, copied=True, seconds=seconds)
+
+
+@dataclass
+class WorkspaceSync:
+    src: Path
+    dst: Path
+    ignore: Sequence[str] = field(default_factory=lambda: DEFAULT_IGNORE)
+    max_workers: int = 16
+
+    def run(self) -> SyncReport:
+        start = time.monotonic()
+
+        self.dst.mkdir(parents=True, exist_ok=True)
+        previous, previous_throughput = load_manifest(self.dst)
+
+        report = SyncReport()
+        entries: Dict[str, ManifestEntry] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [
+                pool.submit(
+                    _sync_file, rel, path, st, self.dst / rel, previous.get(rel)
+                )
+                for rel, path, st in walk(self.src, self.ignore)
+            ]
+
+            for fut in futures:
+                res = fut.result()
+                entries[res.rel] = res.entry
+                report.files_total += 1
+
+                if res.copied:
+                    report.files_copied += 1
+                    report.bytes_copied += res.entry.size
+                    report.copy_seconds += res.seconds
+                else:
+                    report.bytes_skipped += res.entry.size
+
+        report.elapsed_seconds = time.monotonic() - start
+        if report.bytes_copied > 0 and report.copy_seconds > 0:
+            report.throughput = report.bytes_copied / report.copy_seconds
+        else:
+            report.throughput = previous_throughput
+
+        write_manifest(self.dst, entries, report.throughput)
+
+        return report
@@ -4,6 +4,9 @@
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 */
 
+import groovy.json.JsonOutput
+import groovy.json.JsonSlurper
+
 include { paramsSummaryMap       } from 'plugin/nf-validation'
 include { paramsSummaryMultiqc   } from '../subworkflows/nf-core/utils_nfcore_pipeline'
 include { softwareVersionsToYAML } from '../subworkflows/nf-core/utils_nfcore_pipeline'
@@ -50,9 +53,15 @@ include { CAT_FASTQ }                   from '../modules/nf-core/cat/fastq/main'
 //
 // MODULE: Defined locally
 //
-include { PIXELATOR_COLLECT_METADATA    } from '../modules/local/pixelator/collect_metadata'
+include { PIXELATOR_COLLECT_METADATA; mergeWorkflowMetadata } from '../modules/local/pixelator/collect_metadata'
+include { PIXELATOR_SWEEP_SUMMARY       } from '../modules/local/pixelator/sweep_summary'
+include { PIXELATOR_COHORT_INDEX; cohortIndexInput } from '../modules/local/pixelator/cohort_index'
 include { PIXELATOR_AMPLICON            } from '../modules/local/pixelator/single-cell/amplicon/main'
 include { PIXELATOR_QC                  } from '../modules/local/pixelator/single-cell/qc/main'
+include { PIXELATOR_SPLIT_READS         } from '../modules/local/pixelator/split_reads'
+include { PIXELATOR_MERGE_CHUNKS as PIXELATOR_MERGE_PREQC     } from '../modules/local/pixelator/merge_chunks'
+include { PIXELATOR_MERGE_CHUNKS as PIXELATOR_MERGE_ADAPTERQC } from '../modules/local/pixelator/merge_chunks'
+include { PIXELATOR_MERGE_CHUNKS as PIXELATOR_MERGE_DEMUX     } from '../modules/local/pixelator/merge_chunks'
 include { PIXELATOR_DEMUX               } from '../modules/local/pixelator/single-cell/demux/main'
 include { PIXELATOR_COLLAPSE            } from '../modules/local/pixelator/single-cell/collapse/main'
 include { PIXELATOR_GRAPH               } from '../modules/local/pixelator/single-cell/graph/main'
@@ -96,6 +105,10 @@ workflow PIXELATOR {
     PIXELATOR_COLLECT_METADATA ()
     ch_versions = ch_versions.mix(PIXELATOR_COLLECT_METADATA.out.versions)
 
+    PIXELATOR_COLLECT_METADATA.out.environment
+        .map { environment -> mergeWorkflowMetadata(environment) }
+        .collectFile(name: 'metadata.json', storeDir: "${params.outdir}/pixelator")
+
     //
     // MODULE: Concatenate FastQ files from the same sample if required
     //
@@ -134,6 +147,20 @@ workflow PIXELATOR {
 
     ch_input_reads = ch_merged
 
+    if (params.read_chunks > 1) {
+        //
+        // MODULE: Split merged reads in record-aligned chunks to run qc and demux in parallel
+        //
+        PIXELATOR_SPLIT_READS ( ch_merged, params.read_chunks )
+        ch_versions = ch_versions.mix(PIXELATOR_SPLIT_READS.out.versions.first())
+
+        // Inputs with fewer reads than --read_chunks are split in fewer chunks
+        ch_input_reads = PIXELATOR_SPLIT_READS.out.chunks
+            .map { meta, chunks -> [ meta + [ n_chunks: [chunks].flatten().size() ], chunks ] }
+            .transpose()
+            .map { meta, chunk -> [ meta + [ chunk: (chunk.name =~ /-(chunk\d+)/)[0][1] ], chunk ] }
+    }
+
     //
     // MODULE: Run pixelator single-cell preqc & pixelator single-cell adapterqc
     //
@@ -141,9 +168,11 @@ workflow PIXELATOR {
     ch_qc = PIXELATOR_QC.out.processed
     ch_versions = ch_versions.mix(PIXELATOR_QC.out.versions.first())
 
+    // Chunks of the same sample share the sample panel
     ch_fq_and_panel = ch_qc
-        .join(ch_cat_panel_files, failOnMismatch:true, failOnDuplicate:true)
-        .map { meta, fq, panel_file -> [meta, fq, panel_file, panel_file ? null : meta.panel ] }
+        .map { meta, fq -> [ meta.id, meta, fq ] }
+        .combine(ch_cat_panel_files.map { meta, panel_file -> [ meta.id, panel_file ] }, by: 0)
+        .map { id, meta, fq, panel_file -> [meta, fq, panel_file, panel_file ? null : meta.panel ] }
 
     //
     // MODULE: Run pixelator single-cell demux
@@ -152,6 +181,51 @@ workflow PIXELATOR {
     ch_demuxed = PIXELATOR_DEMUX.out.processed
     ch_versions = ch_versions.mix(PIXELATOR_DEMUX.out.versions.first())
 
+    ch_preqc_report_json     = PIXELATOR_QC.out.preqc_report_json
+    ch_preqc_metadata        = PIXELATOR_QC.out.preqc_metadata
+    ch_adapterqc_report_json = PIXELATOR_QC.out.adapterqc_report_json
+    ch_adapterqc_metadata    = PIXELATOR_QC.out.adapterqc_metadata
+    ch_demux_report_json     = PIXELATOR_DEMUX.out.report_json
+    ch_demux_metadata        = PIXELATOR_DEMUX.out.metadata
+
+    if (params.read_chunks > 1) {
+        //
+        // MODULE: Merge the per-chunk qc and demux outputs per sample
+        //
+        ch_preqc_chunks = gatherChunks(
+            'preqc',
+            PIXELATOR_QC.out.preqc_processed
+                .mix(PIXELATOR_QC.out.preqc_failed, PIXELATOR_QC.out.preqc_report_json, PIXELATOR_QC.out.preqc_metadata),
+            4
+        )
+        ch_adapterqc_chunks = gatherChunks(
+            'adapterqc',
+            PIXELATOR_QC.out.adapterqc_processed
+                .mix(PIXELATOR_QC.out.adapterqc_failed, PIXELATOR_QC.out.adapterqc_report_json, PIXELATOR_QC.out.adapterqc_metadata),
+            4
+        )
+        ch_demux_chunks = gatherChunks(
+            'demux',
+            PIXELATOR_DEMUX.out.processed
+                .mix(PIXELATOR_DEMUX.out.failed, PIXELATOR_DEMUX.out.report_json, PIXELATOR_DEMUX.out.metadata),
+            4
+        )
+
+        PIXELATOR_MERGE_PREQC ( ch_preqc_chunks )
+        PIXELATOR_MERGE_ADAPTERQC ( ch_adapterqc_chunks )
+        PIXELATOR_MERGE_DEMUX ( ch_demux_chunks )
+
+        ch_demuxed = PIXELATOR_MERGE_DEMUX.out.processed
+        ch_versions = ch_versions.mix(PIXELATOR_MERGE_DEMUX.out.versions.first())
+
+        ch_preqc_report_json     = PIXELATOR_MERGE_PREQC.out.report_json
+        ch_preqc_metadata        = PIXELATOR_MERGE_PREQC.out.metadata
+        ch_adapterqc_report_json = PIXELATOR_MERGE_ADAPTERQC.out.report_json
+        ch_adapterqc_metadata    = PIXELATOR_MERGE_ADAPTERQC.out.metadata
+        ch_demux_report_json     = PIXELATOR_MERGE_DEMUX.out.report_json
+        ch_demux_metadata        = PIXELATOR_MERGE_DEMUX.out.metadata
+    }
+
     ch_demuxed_and_panel = ch_demuxed
         .join(ch_cat_panel_files, failOnMismatch:true, failOnDuplicate:true)
         .map { meta, demuxed, panel_file -> [meta, demuxed, panel_file, panel_file ? null : meta.panel ] }
@@ -181,10 +255,18 @@ workflow PIXELATOR {
     ch_annotated = PIXELATOR_ANNOTATE.out.dataset
     ch_versions = ch_versions.mix( PIXELATOR_ANNOTATE.out.versions.first() )
 
+    // With --analysis_sweep analysis and layout run once per parameter set on the same annotated data
+    ch_analysis_input = ch_annotated
+    ch_sweep = Channel.empty()
+    if (params.analysis_sweep) {
+        ch_sweep = Channel.fromList(loadAnalysisSweep(params.analysis_sweep))
+        ch_analysis_input = withSweep(ch_annotated, ch_sweep)
+    }
+
     //
     // MODULE: Run pixelator single-cell analysis
     //
-    PIXELATOR_ANALYSIS ( ch_annotated )
+    PIXELATOR_ANALYSIS ( ch_analysis_input )
     ch_analysed = PIXELATOR_ANALYSIS.out.dataset
     ch_versions = ch_versions.mix(PIXELATOR_ANALYSIS.out.versions.first())
 
@@ -199,34 +281,58 @@ workflow PIXELATOR {
     // Prepare all data needed by reporting for each pixelator step
 
     ch_amplicon_data    = PIXELATOR_AMPLICON.out.report_json
-        .concat(PIXELATOR_AMPLICON.out.metadata)
+        .mix(PIXELATOR_AMPLICON.out.metadata)
         .groupTuple(size: 2)
 
-    ch_preqc_data       = PIXELATOR_QC.out.preqc_report_json
-        .concat(PIXELATOR_QC.out.preqc_metadata)
+    ch_preqc_data       = ch_preqc_report_json
+        .mix(ch_preqc_metadata)
         .groupTuple(size: 2)
 
-    ch_adapterqc_data   = PIXELATOR_QC.out.adapterqc_report_json
-        .concat(PIXELATOR_QC.out.adapterqc_metadata)
+    ch_adapterqc_data   = ch_adapterqc_report_json
+        .mix(ch_adapterqc_metadata)
         .groupTuple(size: 2)
 
-    ch_demux_data       = PIXELATOR_DEMUX.out.report_json
-        .concat(PIXELATOR_DEMUX.out.metadata)
+    ch_demux_data       = ch_demux_report_json
+        .mix(ch_demux_metadata)
         .groupTuple(size: 2)
 
     ch_collapse_data    = PIXELATOR_COLLAPSE.out.report_json
-        .concat(PIXELATOR_COLLAPSE.out.metadata)
+        .mix(PIXELATOR_COLLAPSE.out.metadata)
         .groupTuple(size: 2)
 
     ch_cluster_data     = PIXELATOR_GRAPH.out.all_results
     ch_annotate_data    = PIXELATOR_ANNOTATE.out.all_results
     ch_analysis_data    = PIXELATOR_ANALYSIS.out.all_results
     ch_layout_data      = PIXELATOR_LAYOUT.out.report_json
-        .concat(PIXELATOR_LAYOUT.out.metadata)
+        .mix(PIXELATOR_LAYOUT.out.metadata)
         .groupTuple(size: 2)
 
+    // The upstream data is shared by the reports of all parameter sets
+    ch_report_panel_files = ch_cat_panel_files
+    if (params.analysis_sweep) {
+        ch_report_panel_files = withSweep(ch_cat_panel_files, ch_sweep)
+        ch_amplicon_data      = withSweep(ch_amplicon_data, ch_sweep)
+        ch_preqc_data         = withSweep(ch_preqc_data, ch_sweep)
+        ch_adapterqc_data     = withSweep(ch_adapterqc_data, ch_sweep)
+        ch_demux_data         = withSweep(ch_demux_data, ch_sweep)
+        ch_collapse_data      = withSweep(ch_collapse_data, ch_sweep)
+        ch_cluster_data       = withSweep(ch_cluster_data, ch_sweep)
+        ch_annotate_data      = withSweep(ch_annotate_data, ch_sweep)
+
+        //
+        // MODULE: Compare the analysis and layout reports of all parameter sets
+        //
+        ch_sweep_reports = PIXELATOR_ANALYSIS.out.report_json
+            .map { meta, report -> sweepReport('analysis', meta, report) }
+            .mix(PIXELATOR_LAYOUT.out.report_json.map { meta, report -> sweepReport('layout', meta, report) })
+            .collectFile(name: 'sweep_reports.jsonl', newLine: true, sort: true)
+
+        PIXELATOR_SWEEP_SUMMARY ( ch_sweep_reports )
+        ch_versions = ch_versions.mix(PIXELATOR_SWEEP_SUMMARY.out.versions)
+    }
+
     GENERATE_REPORTS(
-        ch_cat_panel_files,
+        ch_report_panel_files,
         ch_amplicon_data,
         ch_preqc_data,
         ch_adapterqc_data,
@@ -240,6 +346,17 @@ workflow PIXELATOR {
 
     ch_versions = ch_versions.mix(GENERATE_REPORTS.out.versions)
 
+    //
+    // MODULE: Write the counts, scores and QC metrics of each sample to the cohort index
+    //
+    if (params.cohort_index) {
+        ch_cohort_index_input = GENERATE_REPORTS.out.report_data
+            .map { id, data -> cohortIndexInput(data) }
+
+        PIXELATOR_COHORT_INDEX ( ch_cohort_index_input )
+        ch_versions = ch_versions.mix(PIXELATOR_COHORT_INDEX.out.versions.first())
+    }
+
     //
     // Collate and save software versions
     //
@@ -258,6 +375,77 @@ workflow PIXELATOR {
     versions       = ch_versions                 // channel: [ path(versions.yml) ]
 }
 
+/*
+========================================================================================
+    FUNCTIONS
+========================================================================================
+*/
+
+//
+// Read and check the --analysis_sweep parameter sets
+//
+def loadAnalysisSweep(sweep_file) {
+    def allowed = [
+        'compute_polarization', 'compute_colocalization', 'use_full_bipartite',
+        'polarization_transformation', 'polarization_min_marker_count', 'polarization_n_permutations',
+        'colocalization_transformation', 'colocalization_neighbourhood_size', 'colocalization_n_permutations',
+        'colocalization_min_region_count', 'no_node_marker_counts', 'layout_algorithm',
+    ]
+
+    def sets = new JsonSlurper().parseText(file(sweep_file, checkIfExists: true).text)
+    if (!(sets instanceof List) || !sets) {
+        error("ERROR: --analysis_sweep must contain a non-empty list of parameter sets")
+    }
+
+    def names = [] as Set
+    for (set in sets) {
+        if (!(set.name instanceof String) || !(set.name ==~ /[\w.-]+/)) {
+            error("ERROR: every --analysis_sweep parameter set needs a name of letters, digits, '.', '_' or '-': ${set}")
+        }
+        if (!names.add(set.name)) {
+            error("ERROR: duplicate --analysis_sweep parameter set name: ${set.name}")
+        }
+        def unknown = set.keySet() - allowed - ['name']
+        if (unknown) {
+            error("ERROR: --analysis_sweep parameter set ${set.name} has unknown options: ${unknown.join(', ')}\nValid options: ${allowed.join(', ')}")
+        }
+    }
+    return sets
+}
+
+//
+// Repeat every item of `ch` for each parameter set of the sweep
+//
+def withSweep(ch, ch_sweep) {
+    return ch
+        .combine(ch_sweep)
+        .map { meta, data, set -> [ meta + [ sweep: set.name, sweep_params: set ], data ] }
+}
+
+//
+// One line of the sweep comparison input
+//
+def sweepReport(String stage, meta, report) {
+    return JsonOutput.toJson([
+        set: meta.sweep,
+        sample: meta.id,
+        stage: stage,
+        parameters: meta.sweep_params.findAll { it.key != 'name' },
+        report: new JsonSlurper().parseText(report.text),
+    ])
+}
+
+//
+// Group the per-chunk outputs of a stage by sample.
+// Every chunk emits `items_per_chunk` entries on `ch_outputs`, a sample has `meta.n_chunks` chunks.
+//
+def gatherChunks(String stage, ch_outputs, int items_per_chunk) {
+    return ch_outputs
+        .map { meta, files -> [ groupKey(meta.findAll { it.key != 'chunk' && it.key != 'n_chunks' }, meta.n_chunks * items_per_chunk), files ] }
+        .groupTuple()
+        .map { key, files -> [ key.getGroupTarget(), stage, files.flatten() ] }
+}
+
 /*
 ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     THE END